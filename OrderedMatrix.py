@@ -1,4 +1,4 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
 class OrderedMatrix:
     def __init__(self):
@@ -6,6 +6,22 @@ class OrderedMatrix:
         self.header = []
         self.row_headers = []
 
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Builds the matrix from flat (row_key, column) pairs, e.g. (gene_id, term_id).
+        The header is the sorted set of columns, rows are kept in order of first appearance.
+        """
+        rows = defaultdict(set)
+        for row_key, column in pairs:
+            rows[row_key].add(column)
+
+        matrix = cls()
+        matrix.set_header(sorted(set().union(*rows.values())))
+        for row_key, columns in rows.items():
+            matrix.insert_row(row_key, columns)
+        return matrix
+
     def set_header(self, columns):
         self.header = list(columns)
         self.columns = OrderedDict((col, []) for col in self.header)
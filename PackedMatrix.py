@@ -0,0 +1,111 @@
+# Maps the '0'/'1' characters of a binary string to the byte values 0/1
+_BITS_TO_VALUES = bytes.maketrans(b"01", b"\x00\x01")
+
+class PackedMatrix:
+    """
+    A drop-in alternative to OrderedMatrix for 0/1 incidence matrices.
+
+    Each row is stored as a single Python int used as a bitset (bit i is the
+    i-th header column), and rows and columns are found through dicts. At
+    PomBase scale this keeps the whole matrix in a few MB instead of one boxed
+    list slot per cell, and get_row/insert_row no longer scan the row headers.
+    """
+
+    def __init__(self):
+        self.header = []
+        self._column_index = {}
+        self._rows = {}
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Builds the matrix from flat (row_key, column) pairs, e.g. (gene_id, term_id).
+
+        Rows and columns are factorized into integer codes first, then every row
+        bitset is filled in one pass. The result does not depend on the order of
+        the pairs, and repeated pairs are counted once. The header is the sorted
+        set of columns, rows are kept in order of first appearance.
+        """
+        row_codes = {}
+        column_codes = {}
+        coded_pairs = []
+        for row_key, column in pairs:
+            row_code = row_codes.setdefault(row_key, len(row_codes))
+            column_code = column_codes.setdefault(column, len(column_codes))
+            coded_pairs.append((row_code, column_code))
+
+        # Re-code the columns so that the bit positions follow the sorted header
+        header = sorted(column_codes)
+        position = [0] * len(header)
+        for i, column in enumerate(header):
+            position[column_codes[column]] = i
+
+        row_bytes = [bytearray((len(header) + 7) // 8) for _ in range(len(row_codes))]
+        for row_code, column_code in coded_pairs:
+            bit = position[column_code]
+            row_bytes[row_code][bit >> 3] |= 1 << (bit & 7)
+
+        matrix = cls()
+        matrix.set_header(header)
+        for row_key, row_code in row_codes.items():
+            matrix._rows[row_key] = int.from_bytes(row_bytes[row_code], "little")
+        return matrix
+
+    @property
+    def row_headers(self) -> list[str]:
+        return list(self._rows)
+
+    def set_header(self, columns):
+        self.header = list(columns)
+        self._column_index = {col: i for i, col in enumerate(self.header)}
+        self._rows = {}
+
+    def insert_row(self, row_key: str, row_items: list):
+        if not self.header:
+            raise ValueError("Header not set. Use set_header() first.")
+
+        bits = 0
+        for item in row_items:
+            index = self._column_index.get(item)
+            if index is not None:
+                bits |= 1 << index
+
+        # A repeated row_key sets the new columns on top of the existing ones
+        self._rows[row_key] = self._rows.get(row_key, 0) | bits
+
+    def get_row_bits(self, row_key: str) -> int:
+        """
+        Returns the row as a bitset (bit i set if header column i is 1), or None if the row does not exist.
+        """
+        return self._rows.get(row_key)
+
+    def _expand(self, bits: int) -> list[int]:
+        """
+        Converts a row bitset into a list of 0/1 ints, one per header column.
+        """
+        if not self.header:
+            return []
+        # Reverse the binary string so that bit 0 comes first, then map the characters to ints in one pass
+        return list(format(bits, f"0{len(self.header)}b")[::-1].encode("ascii").translate(_BITS_TO_VALUES))
+
+    def get_row(self, row_key: str) -> list[str]:
+        """
+        Returns the row corresponding to the given row_key.
+        If the row_key does not exist, returns None.
+        """
+        bits = self._rows.get(row_key)
+        if bits is None:
+            return None
+        return self._expand(bits)
+
+    def as_rows(self):
+        return [tuple(self._expand(bits)) for bits in self._rows.values()]
+
+    def to_dict(self):
+        """
+        Returns a nested dict: row_header -> {col: value}
+        """
+        return {
+            row_key: dict(zip(self.header, self._expand(bits)))
+            for row_key, bits in self._rows.items()
+        }
@@ -0,0 +1,44 @@
+import unittest
+from OrderedMatrix import OrderedMatrix
+from PackedMatrix import PackedMatrix
+
+class TestPackedMatrix(unittest.TestCase):
+
+    def build(self, matrix_class):
+        matrix = matrix_class()
+        matrix.set_header(["GO:1", "GO:2", "GO:3"])
+        matrix.insert_row("SPAC1", ["GO:1", "GO:3"])
+        matrix.insert_row("SPAC2", ["GO:2", "GO:4"])
+        matrix.insert_row("SPAC1", ["GO:2"])
+        return matrix
+
+    def test_same_results_as_ordered_matrix(self):
+        """The packed backend is a drop-in replacement for OrderedMatrix."""
+        ordered = self.build(OrderedMatrix)
+        packed = self.build(PackedMatrix)
+
+        self.assertEqual(packed.get_row("SPAC1"), [1, 1, 1])
+        self.assertEqual(packed.get_row("SPAC1"), ordered.get_row("SPAC1"))
+        self.assertEqual(packed.get_row("SPAC2"), ordered.get_row("SPAC2"))
+        self.assertIsNone(packed.get_row("SPAC3"))
+        self.assertEqual(packed.row_headers, ordered.row_headers)
+        self.assertEqual(packed.as_rows(), ordered.as_rows())
+        self.assertEqual(packed.to_dict(), ordered.to_dict())
+
+    def test_from_pairs(self):
+        """Building from pairs matches row-by-row insertion, whatever the pair order."""
+        pairs = [("SPAC1", "GO:3"), ("SPAC2", "GO:2"), ("SPAC1", "GO:1"), ("SPAC2", "GO:2"), ("SPAC1", "GO:2")]
+        packed = PackedMatrix.from_pairs(pairs)
+        reversed_packed = PackedMatrix.from_pairs(reversed(pairs))
+
+        self.assertEqual(packed.header, ["GO:1", "GO:2", "GO:3"])
+        self.assertEqual(packed.to_dict(), OrderedMatrix.from_pairs(pairs).to_dict())
+        self.assertEqual(packed.to_dict(), reversed_packed.to_dict())
+        self.assertEqual(packed.get_row("SPAC2"), [0, 1, 0])
+
+    def test_header_required(self):
+        with self.assertRaises(ValueError):
+            PackedMatrix().insert_row("SPAC1", ["GO:1"])
+
+if __name__ == '__main__':
+    unittest.main()
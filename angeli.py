@@ -1,8 +1,10 @@
 import argparse
 from datetime import datetime
 import gzip
+import hashlib
 import io
 import csv
+import json
 from enum import Enum
 import os
 import requests
@@ -10,11 +12,28 @@ import logging
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 import re 
+from contextlib import contextmanager
+from functools import partial
 
 from OrderedMatrix import OrderedMatrix
+from PackedMatrix import PackedMatrix
+from annotation_delta import AnnotationDelta
+from annotation_records import GAF_COLUMNS, PHAF_COLUMNS, projector
+from column_schema import FYPO_SOURCE, GO_SOURCE, ColumnSchema, ColumnSchemaError
+from database_reader import HEADER_ROW_COUNT, AnGeLiDatabaseReader
+from download_cache import DownloadCache
 from fypo_data import FYPOData
+from gene_index import GeneIndex
 from go_data import GOData
+from http_session import SessionProvider
+from instrumentation import BYTES_WRITTEN, ROWS, Instrumentation
+from ontology import AncestorClosure, load_obo
+from packed_database import write_packed_database
+from pipeline import Pipeline
 from reference_data import ReferenceData 
+from term_cache import TermCache
+from term_registry import ORIGIN_API, ORIGIN_ONTOLOGY, ORIGIN_ORIGINAL, ORIGIN_PREVIOUS, TermRegistry
+from term_resolver import TermResolver
 
 logging.basicConfig(
     filename='angeli_output.log',  # Log file name
@@ -33,6 +52,19 @@ ALL_CHROMOSOMES_GFF3_URL = POMBE_BASE_URL + "/releases/latest/gff/Schizosaccharo
 GO_TERMS_PATTERN = ".gaf.gz"
 FYPO_TERMS_PATTERN = ".phaf.gz"
 
+# The annotation fields kept in memory when loading the GAF/PHAF files
+GO_ANNOTATION_FIELDS = ('DB_Object_ID', 'GO_ID', 'Qualifier', 'DB_Object_Symbol', 'DB_Object_Synonym')
+FYPO_ANNOTATION_FIELDS = ('GENE_ID', 'FYPO_ID', 'CONDITION')
+
+# Written next to each output, the settings it was built with, see AnGeLi.build_settings
+BUILD_SETTINGS_SUFFIX = ".build.json"
+
+# Storage backends for the GO and FYPO matrices, they share the same public API
+MATRIX_BACKENDS = {
+    "ordered": OrderedMatrix,
+    "packed": PackedMatrix,
+}
+
 class Peptide(Enum):
     SYSTEMATIC_ID = 0
     MASS = 1
@@ -62,15 +94,63 @@ class ProteinComposition(Enum):
     W = 19
     Y = 20
 
+class _DigestWriter:
+    """
+    A write-only text stream that hashes what is written to it, used to compare outputs without writing them.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self.digest = hashlib.sha256()
+
+    def write(self, text):
+        self.digest.update(text.encode(self.encoding))
+
 class AnGeLi:
-    def __init__(self):
-        """Constructor lazy loads the data, so declare values and assign them as None"""
+    def __init__(self, max_workers=8, rate_limit=None, go_obo_path=None, fypo_obo_path=None, term_cache=None,
+                 matrix_backend="packed", download_cache=None, session=None, direct_only=False, instrumentation=None):
+        """
+        Constructor lazy loads the data, so declare values and assign them as None
+
+        :param max_workers: The number of concurrent requests used to resolve new term metadata.
+        :param rate_limit: The maximum number of metadata requests per second per host, None for no limit.
+        :param go_obo_path: Optional local GO ontology file (e.g. go-basic.obo) used before the EBI API.
+        :param fypo_obo_path: Optional local FYPO ontology file (e.g. fypo.obo) used before the EBI API.
+        :param term_cache: Optional TermCache used underneath the EBI API calls.
+        :param matrix_backend: The GO/FYPO matrix storage, a key of MATRIX_BACKENDS.
+        :param download_cache: Optional DownloadCache for the PomBase release files and listings.
+        :param session: The shared SessionProvider used for every HTTP request, a default one is created if None.
+        :param direct_only: Only set the directly annotated terms, without propagating the annotations to the
+                            ancestor terms. Propagation needs the ontology files (go_obo_path, fypo_obo_path).
+        :param instrumentation: The Instrumentation recording the stages of the run, a default one is created if None.
+        """
+        if matrix_backend not in MATRIX_BACKENDS:
+            raise ValueError(f"Unknown matrix backend '{matrix_backend}'. Expected one of {list(MATRIX_BACKENDS)}.")
+
         self.peptides = None
         self.amino_acids = None
         self.chromosome = None
         self.go_terms = None
         self.fypo_terms = None
         self.original_file = None
+        self.original_reader = None
+        self.original_schema = None
+        self.term_resolver = TermResolver(max_workers=max_workers, rate_limit=rate_limit)
+        self.go_obo_path = go_obo_path
+        self.fypo_obo_path = fypo_obo_path
+        self.go_ontology = None
+        self.fypo_ontology = None
+        self.direct_only = direct_only
+        self._obo_terms = {}
+        self._ancestor_closures = {}
+        self.stage_timings = {}
+        self.term_cache = term_cache
+        self.term_registry = None
+        self.matrix_class = MATRIX_BACKENDS[matrix_backend]
+        self.download_cache = download_cache
+        self.session = session if session is not None else SessionProvider(pool_size=max_workers)
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self.session.add_response_hook(self.instrumentation.record_response)
 
     def _download_file(self, url):
         """
@@ -79,8 +159,15 @@ class AnGeLi:
         :param url: The URL of the file.
         :return: A BytesIO object containing the content.
         """
+        if self.download_cache is not None:
+            path = self.download_cache.fetch(url)
+            if path is None:
+                return None
+            with open(path, 'rb') as f:
+                return io.BytesIO(f.read())
+
         # Send a GET request to the URL
-        response = requests.get(url)
+        response = self.session.get(url)
 
         if response.status_code == 200:
             # Return the content as a BytesIO object
@@ -101,53 +188,82 @@ class AnGeLi:
         Returns:
             List[str]: A list of matching filenames or full URLs.
         """
+        return self._filter_links(self._get_links(base_url), suffix)
+
+    @staticmethod
+    def _filter_links(links, suffix):
+        return [link for link in links if link.lower().endswith(suffix.lower())]
+
+    def _get_links(self, base_url):
+        """
+        Fetches a directory listing and returns the full URLs of its links.
+        """
         if not base_url.startswith("http"):
             raise ValueError("URL must start with 'http' or 'https'.")
         
         if not base_url.endswith("/"):
             base_url += "/"
 
-        try:
-            response = requests.get(base_url)
-            response.raise_for_status()
-        except requests.RequestException as e:
-            raise RuntimeError(f"Failed to fetch URL: {e}")
+        if self.download_cache is not None:
+            # An unchanged release listing is revalidated with a single conditional request
+            path = self.download_cache.fetch(base_url)
+            if path is None:
+                raise RuntimeError(f"Failed to fetch URL: {base_url}")
+            with open(path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        else:
+            try:
+                response = self.session.get(base_url)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise RuntimeError(f"Failed to fetch URL: {e}")
+            html = response.text
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        matched_files = []
+        soup = BeautifulSoup(html, 'html.parser')
+        links = []
 
         for link in soup.find_all('a'):
             href = link.get('href')
             if href:
-                href = href.strip()
-                if href.lower().endswith(suffix.lower()):
-                    matched_files.append(urljoin(base_url, href))
+                links.append(urljoin(base_url, href.strip()))
 
-        return matched_files
+        return links
 
-    def _download_and_decompress_gzip(self, url):
+    @contextmanager
+    def _open_gzip_stream(self, url):
         """
-        Downloads a file from a URL, decompresses it using gzip, and returns the decompressed content as a BytesIO object.
+        Streams a gzip-compressed file from a URL as decoded text.
+        The response body is decompressed incrementally as it arrives, so the caller can
+        parse rows while the download is still running and no full copy is held in memory.
 
         :param url: The URL of the gzip-compressed file.
-        :return: A BytesIO object containing the decompressed content.
+        :return: A context manager yielding a text stream, or None if the download failed.
         """
-        # Send a GET request to the URL
-        response = requests.get(url, stream=True)
-        
-        # Check if the request was successful (status code 200)
-        if response.status_code == 200:
-            # Create a GzipFile object from the downloaded content
-            with gzip.GzipFile(fileobj=io.BytesIO(response.content), mode='rb') as gz:
-                # Read the decompressed content into a BytesIO object
-                decompressed_content = io.BytesIO(gz.read())
-            
-            logging.info("File successfully downloaded and decompressed.")
-            return io.TextIOWrapper(decompressed_content, encoding='utf-8')
-        else:
-            logging.error(f"Failed to download the file. Status code: {response.status_code}")
-            return None
-        
+        if self.download_cache is not None:
+            # The cache streams the download to disk, the file is then parsed from there
+            path = self.download_cache.fetch(url)
+            if path is None:
+                yield None
+                return
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+                yield f
+            return
+
+        response = self.session.get(url, stream=True)
+        try:
+            if response.status_code != 200:
+                logging.error(f"Failed to download the file. Status code: {response.status_code}")
+                yield None
+                return
+
+            # Undo any transfer encoding only, the file itself is decompressed by GzipFile
+            response.raw.decode_content = True
+            with gzip.GzipFile(fileobj=response.raw, mode='rb') as gz:
+                yield io.TextIOWrapper(gz, encoding='utf-8', newline='')
+            logging.info("File successfully streamed and decompressed.")
+        finally:
+            response.close()
+
     def _parse_tsv(self, file_obj):
         """
         Parses a TSV (Tab-Separated Values) stream and returns a list of rows.
@@ -189,10 +305,23 @@ class AnGeLi:
         
         return db
 
-    def _parse_gaf(self, file_obj):
-        annotations = []
+    def _parse_gaf(self, file_obj, fields=None):
+        return list(self._iter_gaf(file_obj, fields))
 
+    def _iter_gaf(self, file_obj, fields=None):
+        """
+        Yields one annotation per GAF line, so the file can be parsed while it is streamed.
+
+        :param file_obj: The GAF text stream.
+        :param fields: Optional GAF_COLUMNS names to keep. When given, each annotation is a compact
+                       record of just those fields (with interned values) instead of a dict of every column.
+        """
         reader = csv.reader(file_obj, delimiter='\t')
+        if fields is not None:
+            project = projector('GafRecord', GAF_COLUMNS, fields)
+            yield from project(row for row in reader if row and not row[0].startswith('!'))
+            return
+
         for row in reader:
             if not row or row[0].startswith('!'):
                 continue  
@@ -217,14 +346,25 @@ class AnGeLi:
                 'Gene_Product_Form_ID': row[16]
             }
 
-            annotations.append(annotation)
-
-        return annotations
+            yield annotation
     
-    def _parse_phaf(self, file_obj):
-        annotations = []
+    def _parse_phaf(self, file_obj, fields=None):
+        return list(self._iter_phaf(file_obj, fields))
+
+    def _iter_phaf(self, file_obj, fields=None):
+        """
+        Yields one annotation per PHAF line, so the file can be parsed while it is streamed.
 
+        :param file_obj: The PHAF text stream.
+        :param fields: Optional PHAF_COLUMNS names to keep. When given, each annotation is a compact
+                       record of just those fields (with interned values) instead of a dict of every column.
+        """
         reader = csv.reader(file_obj, delimiter='\t')
+        if fields is not None:
+            project = projector('PhafRecord', PHAF_COLUMNS, fields)
+            yield from project(row for row in reader if row and not row[0].startswith('#'))
+            return
+
         for row in reader:
             if not row or row[0].startswith('#'):
                 continue  
@@ -259,9 +399,7 @@ class AnGeLi:
                 'PLOIDY': row[20]
             }
 
-            annotations.append(annotation)
-
-        return annotations
+            yield annotation
     
     def search_protein_features(self, protein_id):
         """
@@ -317,135 +455,291 @@ class AnGeLi:
             logging.info("Loading Chromosome features")
             self.chromosome = self._parse_gff3(self._download_file(ALL_CHROMOSOMES_GFF3_URL))
 
-    def find_go_terms(self):
+    def find_go_terms(self, release_links=None):
         """
         Load the GO terms from the Pombase website and parse them.
         They will then be added to the output file
 
+        :param release_links: Optional links of the latest release listing, fetched when not given.
         :return: 
         """
         if self.go_terms is None:   
             logging.info("Loading GO Terms")
-            files = self._get_files_with_suffix(POMBASE_LATEST_URL, GO_TERMS_PATTERN)
+            if release_links is None:
+                release_links = self._get_links(POMBASE_LATEST_URL)
+            files = self._filter_links(release_links, GO_TERMS_PATTERN)
             if len(files) == 1:
-                self.go_terms = self._parse_gaf(self._download_and_decompress_gzip(files[0]))
+                with self._open_gzip_stream(files[0]) as stream:
+                    if stream is not None:
+                        self.go_terms = self._parse_gaf(stream, GO_ANNOTATION_FIELDS)
+                        self.instrumentation.count(ROWS, len(self.go_terms))
 
         
-    def find_fypo_terms(self):
+    def find_fypo_terms(self, release_links=None):
         """
         Load the FYPO terms from the Pombase website and parse them.
         They will then be added to the output file
 
+        :param release_links: Optional links of the latest release listing, fetched when not given.
         :return: 
         """
         if self.fypo_terms is None:   
             logging.info("Loading FYPO Terms")
-            files = self._get_files_with_suffix(POMBASE_LATEST_URL, FYPO_TERMS_PATTERN)
+            if release_links is None:
+                release_links = self._get_links(POMBASE_LATEST_URL)
+            files = self._filter_links(release_links, FYPO_TERMS_PATTERN)
             for file in files:
                 if re.search(r"pombase-\d{4}-\d{2}-\d{2}\.phaf\.gz", file):
-                    self.fypo_terms = self._parse_phaf(self._download_and_decompress_gzip(file))
+                    with self._open_gzip_stream(file) as stream:
+                        if stream is not None:
+                            self.fypo_terms = self._parse_phaf(stream, FYPO_ANNOTATION_FIELDS)
+                            self.instrumentation.count(ROWS, len(self.fypo_terms))
+
 
+    def acquisition_pipeline(self) -> Pipeline:
+        """
+        The stages loading and building everything the regenerated file needs. The GO and FYPO
+        chains (listing, download and parse, ontology, matrix) and the original term registry
+        do not depend on each other and run concurrently.
+
+        :return: A Pipeline whose results include 'go_matrix', 'fypo_matrix' and 'term_registry'.
+        """
+        def release_links():
+            # The release listing is shared by the GO and FYPO downloads, and skipped when both are loaded
+            if self.go_terms is not None and self.fypo_terms is not None:
+                return []
+            return self._get_links(POMBASE_LATEST_URL)
+
+        def load_obo(path):
+            return self._load_obo(path) if path else None
+
+        pipeline = Pipeline(instrumentation=self.instrumentation)
+        pipeline.add("release_links", release_links)
+        pipeline.add("go_obo", lambda: load_obo(self.go_obo_path))
+        pipeline.add("fypo_obo", lambda: load_obo(self.fypo_obo_path))
+        pipeline.add("go_terms", self.find_go_terms, requires=["release_links"])
+        pipeline.add("fypo_terms", self.find_fypo_terms, requires=["release_links"])
+        pipeline.add("go_ontology", lambda obo: self.load_go_ontology(), requires=["go_obo"])
+        pipeline.add("fypo_ontology", lambda obo: self.load_fypo_ontology(), requires=["fypo_obo"])
+        pipeline.add("go_closure", lambda obo: self.ancestor_closure("GO"), requires=["go_obo"])
+        pipeline.add("fypo_closure", lambda obo: self.ancestor_closure("FYPO"), requires=["fypo_obo"])
+        pipeline.add("go_matrix", lambda terms, closure: self.build_GO_matrix(), requires=["go_terms", "go_closure"])
+        pipeline.add("fypo_matrix", lambda terms, closure: self.build_FYPO_matrix(), requires=["fypo_terms", "fypo_closure"])
+        pipeline.add("term_registry", self.build_term_registry)
+        return pipeline
+
+    def build_gene_index(self, genes=()) -> GeneIndex:
+        """
+        Builds the index resolving gene symbols and synonyms to systematic ids from the GAF annotations.
 
-    def parse_original_AnGeLiDatabase(self, file_path='AnGeLiDatabase.txt') -> bool:
+        :param genes: Optional systematic ids to include even without GO annotations.
+        """
+        self.find_go_terms()
+        return GeneIndex.from_gaf_records(self.go_terms or [], genes)
+
+    def load_go_ontology(self) -> dict:
+        """
+        Load the GO term metadata from the local ontology file, if one was given.
+
+        :return: GO ID -> GOData, empty when no ontology file is configured.
+        """
+        if self.go_ontology is None:
+            self.go_ontology = GOData.from_obo(self.go_obo_path, self._load_obo(self.go_obo_path)) if self.go_obo_path else {}
+
+        return self.go_ontology
+
+    def load_fypo_ontology(self) -> dict:
+        """
+        Load the FYPO term metadata from the local ontology file, if one was given.
+
+        :return: FYPO ID -> FYPOData, empty when no ontology file is configured.
+        """
+        if self.fypo_ontology is None:
+            self.fypo_ontology = FYPOData.from_obo(self.fypo_obo_path, self._load_obo(self.fypo_obo_path)) if self.fypo_obo_path else {}
+
+        return self.fypo_ontology
+
+    def _load_obo(self, path) -> dict:
+        # The OBO files serve both the term metadata and the ancestor closures, they are parsed once
+        if path not in self._obo_terms:
+            self._obo_terms[path] = load_obo(path)
+        return self._obo_terms[path]
+
+    def ancestor_closure(self, ontology: str):
+        """
+        :param ontology: "GO" or "FYPO".
+        :return: The AncestorClosure used to propagate the annotations, or None when only the direct
+                 annotations are used (direct_only, or no ontology file).
+        """
+        if ontology not in self._ancestor_closures:
+            path = self.go_obo_path if ontology == "GO" else self.fypo_obo_path
+            if not self.direct_only and path is None:
+                logging.warning(f"No {ontology} ontology file given, the {ontology} annotations are not propagated to ancestor terms.")
+            use_closure = not self.direct_only and path is not None
+            self._ancestor_closures[ontology] = AncestorClosure(self._load_obo(path)) if use_closure else None
+        return self._ancestor_closures[ontology]
+
+    def resolve_new_terms(self, registry, term_ids, ontology, from_api, url_template):
+        """
+        Resolves the metadata of terms that are not in the registry yet and adds them to it.
+        The local ontology index is used first, the API is only called for ids that are not in it.
+
+        :param registry: The TermRegistry to extend.
+        :param term_ids: The ids to resolve.
+        :param ontology: id -> term metadata loaded from the local ontology file.
+        :param from_api: The API constructor, e.g. GOData.from_api.
+        :param url_template: The API URL template, used for per host rate limiting.
+        """
+        missing = registry.missing(term_ids)
+
+        from_ontology = {}
+        for term_id in missing:
+            term = ontology.get(term_id)
+            if term is not None:
+                if term.is_obsolete:
+                    logging.warning(f"Term {term_id} is obsolete, replaced by {', '.join(term.replaced_by) or 'nothing'}.")
+                from_ontology[term_id] = term
+        registry.merge(from_ontology, ORIGIN_ONTOLOGY)
+
+        missing = registry.missing(missing)
+        logging.info(f"Resolved {len(from_ontology)} new terms from the ontology file, {len(missing)} left for the API")
+        # The requests made on the resolver threads count towards the calling stage
+        fetch = self.instrumentation.bind(partial(from_api, cache=self.term_cache, session=self.session))
+        registry.merge(self.term_resolver.resolve(missing, fetch, url_template), ORIGIN_API)
+
+    def refresh_term_cache(self):
+        """
+        Refetches the stale entries of the term cache, and only those, from the EBI APIs.
+        """
+        if self.term_cache is None:
+            logging.error("No term cache configured. Nothing to refresh.")
+            return
+
+        for source, term_class in (("GO", GOData), ("FYPO", FYPOData)):
+            stale_ids = self.term_cache.stale_ids(source)
+            logging.info(f"Refreshing {len(stale_ids)} stale {source} terms in the term cache")
+            fetch = partial(term_class.from_api, cache=self.term_cache, session=self.session)
+            self.term_resolver.resolve(stale_ids, fetch, term_class._EBI_API_URL_TEMPLATE)
+
+        self.term_cache.log_stats()
+
+    def parse_original_AnGeLiDatabase(self, file_path='AnGeLiDatabase.txt', projected=True) -> bool:
         """
         :param file_path: The path to the original AnGeLiDatabase.txt file.
-        :return: True if the file was parsed successfully, False otherwise.
+        :param projected: Only parse the header rows up front and stream the gene rows, reading just the
+                          columns that are carried over (ColumnSchema.row_projection). If False the whole file is parsed.
+        :return: True if the file was parsed successfully, False otherwise, e.g. when its header rows do not
+                 have the expected column layout.
         """
         logging.info("Parsing the original AnGeLiDatabase.txt file")
         if not os.path.exists(file_path):
             logging.error(f"File not found: {file_path}")
             return None
 
-        self.original_file = self._parse_tsv(file_path)
+        if self.original_reader is not None:
+            self.original_reader.close()
+            self.original_reader = None
+
+        with self.instrumentation.stage("parse_original"):
+            if projected:
+                self.original_reader = AnGeLiDatabaseReader(file_path)
+                self.original_file = self.original_reader.header_rows()
+            else:
+                self.original_file = self._parse_tsv(file_path)
+            self.instrumentation.count(ROWS, len(self.original_file))
+
+        # The column layout is checked here rather than found out from misaligned rows at the end of the rebuild
+        try:
+            self.original_schema = ColumnSchema(self.original_file[:HEADER_ROW_COUNT])
+            static_width = ColumnSchema.width(self.original_schema.static)
+            if static_width != len(ReferenceData.ROW_1):
+                raise ColumnSchemaError(f"The file has {static_width} gene feature columns before the GO terms, "
+                                        f"the reference header describes {len(ReferenceData.ROW_1)}.")
+        except ColumnSchemaError as e:
+            logging.error(f"Unexpected column layout in {file_path}: {e}")
+            self.original_schema = None
+            return False
         return True
+
+    def _iter_original_rows(self, ranges):
+        """
+        Iterates over the gene rows of the original file, projected to the given column ranges.
+
+        :param ranges: Sorted (start, stop) column ranges, stop None means up to the end of the row.
+        :return: A generator of (row index, segments), with one list of columns per range, or (row index, None) for empty rows.
+        """
+        if self.original_reader is not None:
+            yield from self.original_reader.iter_rows(ranges)
+            return
+
+        for i in range(HEADER_ROW_COUNT, len(self.original_file)):
+            row = self.original_file[i]
+            yield i, [row[start:stop] for start, stop in ranges] if row else None
     
-    def build_GO_matrix(self) -> OrderedMatrix:
+    @staticmethod
+    def _go_pairs(records) -> list:
+        return [(term['DB_Object_ID'], term['GO_ID']) for term in records]
+
+    @staticmethod
+    def _fypo_pairs(records) -> list:
+        return [(term['GENE_ID'], term['FYPO_ID']) for term in records]
+
+    def _go_annotation_pairs(self, records) -> list:
+        """
+        The (gene, GO term) pairs of the matrix: the annotations, propagated to the ancestor terms unless direct_only.
+        A NOT annotation says the gene is not a member of the term, so it is left out of a propagated matrix.
+        The direct_only matrix keeps every annotation, as the matrices have always been built.
+        """
+        closure = self.ancestor_closure("GO")
+        if closure is None:
+            return self._go_pairs(records)
+        positive = [term for term in records if 'NOT' not in term['Qualifier'].split('|')]
+        return closure.propagate(self._go_pairs(positive))
+
+    def _fypo_annotation_pairs(self, records) -> list:
         """
-        Builds a matrix of GO terms and their associated information.
-        This is a placeholder for the actual implementation.
+        The (gene, FYPO term) pairs of the matrix: the annotations, propagated to the ancestor terms unless direct_only.
+        """
+        closure = self.ancestor_closure("FYPO")
+        pairs = self._fypo_pairs(records)
+        return closure.propagate(pairs) if closure is not None else pairs
+
+    def build_GO_matrix(self):
+        """
+        Builds the gene x GO term matrix from the (gene, GO term) annotation pairs, propagated to the ancestor terms
+        (true-path rule) unless direct_only. The result does not depend on the order of the annotations in the GAF file.
         """
         if self.go_terms is None:
             logging.error("GO terms not found. Cannot build GO matrix.")
             return None
-        
-        header_set = set()
-        # Build the GO term headers
-        for term in self.go_terms:
-            header_set.add(term['GO_ID'])
-            
-        # Sort the headers
-        header_list = sorted(header_set)
-   
-        go_matrix = OrderedMatrix()
-        go_matrix.set_header(header_list)
-        # Iterate over the GO terms, build a row and add it to the matrix
-        row = []
-        for term in self.go_terms:
-            if len(row) == 0:
-                row.append(term['DB_Object_ID'])
-                row.append(term['GO_ID'])
-            else:
-                if term['DB_Object_ID'] != row[0]:
-                    go_matrix.insert_row(row[0], row[1:])
-                    row = []
-                    row.append(term['DB_Object_ID'])
-                    row.append(term['GO_ID'])
-                else:
-                    row.append(term['GO_ID'])
-        # Add the last row
-        if len(row) > 0:
-            go_matrix.insert_row(row[0], row[1:])
-            logging.info("GO matrix built successfully.")
-        else:
+
+        pairs = self._go_annotation_pairs(self.go_terms)
+        if not pairs:
             logging.error("Failed to build GO matrix. No data found.")
             return None
-                
-        # Return the matrix
+
+        go_matrix = self.matrix_class.from_pairs(pairs)
+        self.instrumentation.count(ROWS, len(pairs))
+        logging.info("GO matrix built successfully.")
         return go_matrix
- 
-    
+
     def build_FYPO_matrix(self):
         """
-        Builds a matrix of FYPO terms and their associated information.
-        This is a placeholder for the actual implementation.
+        Builds the gene x FYPO term matrix from the (gene, FYPO term) annotation pairs, propagated to the ancestor terms
+        (true-path rule) unless direct_only. The result does not depend on the order of the annotations in the PHAF file.
         """
         if self.fypo_terms is None:
             logging.error("FYPO terms not found. Cannot build FYPO matrix.")
             return None
-        
-        header_set = set()
-        # Build the GO term headers
-        for term in self.fypo_terms:
-            header_set.add(term['FYPO_ID'])
-            
-        # Sort the headers
-        header_list = sorted(header_set)
-            
-        fypo_matrix = OrderedMatrix()
-        fypo_matrix.set_header(header_list)
-        # Iterate over the GO terms, build a row and add it to the matrix
-        row = []
-        for term in self.fypo_terms:
-            if len(row) == 0:
-                row.append(term['GENE_ID'])
-                row.append(term['FYPO_ID'])
-            else:
-                if term['GENE_ID'] != row[0]:
-                    fypo_matrix.insert_row(row[0], row[1:])
-                    row = []
-                    row.append(term['GENE_ID'])
-                    row.append(term['FYPO_ID'])
-                else:
-                    row.append(term['FYPO_ID'])
-        # Add the last row
-        if len(row) > 0:
-            fypo_matrix.insert_row(row[0], row[1:])
-            logging.info("FYPO matrix built successfully.")
-        else:
+
+        pairs = self._fypo_annotation_pairs(self.fypo_terms)
+        if not pairs:
             logging.error("Failed to build FYPO matrix. No data found.")
             return None
-                
-        # Return the matrix
+
+        fypo_matrix = self.matrix_class.from_pairs(pairs)
+        self.instrumentation.count(ROWS, len(pairs))
+        logging.info("FYPO matrix built successfully.")
         return fypo_matrix
     
     def build_headers(self) -> list[list[str]]:
@@ -460,40 +754,41 @@ class AnGeLi:
         for i in range(1, count):
             ROW_7.append(datetime.now().strftime("%d-%m-%Y"))
             
+        # Copies, as the term columns are appended to these rows
         headers = [
-            ReferenceData.ROW_1,
-            ReferenceData.ROW_2,
-            ReferenceData.ROW_3,
-            ReferenceData.ROW_4,
-            ReferenceData.ROW_5,
-            ReferenceData.ROW_6,
+            list(ReferenceData.ROW_1),
+            list(ReferenceData.ROW_2),
+            list(ReferenceData.ROW_3),
+            list(ReferenceData.ROW_4),
+            list(ReferenceData.ROW_5),
+            list(ReferenceData.ROW_6),
             ROW_7,
-            ReferenceData.ROW_8
+            list(ReferenceData.ROW_8)
         ]
         return headers
     
     def fetch_original_go_terms(self) -> list[GOData]:
         """
         Fetches the original GO terms from the original AnGeLiDatabase.txt file.
-        The MASTER files starts the GO terms at index 50, so we will start from there.
+        The GO columns are found by the column schema of the file.
         :return: A list of GOData objects containing the original GO terms.
         """
-        if self.original_file is None:
+        if self.original_schema is None:
             logging.error("Original file not parsed. Cannot fetch GO terms.")
             return None
         
         go_terms = []
         
-        for i in range(49, 6274):
+        for column in self.original_schema.columns[self.original_schema.go]:
             go_terms.append(GOData(
-                go_id=self.original_file[0][i],
-                name=self.original_file[1][i],
-                measurement=self.original_file[2][i],
-                namespace=self.original_file[3][i],
-                source=self.original_file[4][i],
-                terms_with_annotations=self.original_file[5][i],
+                go_id=column.column_id,
+                name=column.name,
+                measurement=column.scale,
+                namespace=column.group,
+                source=column.source,
+                terms_with_annotations=column.author,
                 date=datetime.now().strftime("%d-%m-%Y"),
-                link=self.original_file[7][i]
+                link=column.link
             ))
         
         return go_terms
@@ -501,186 +796,447 @@ class AnGeLi:
     def fetch_original_fypo_terms(self) -> list[FYPOData]:
         """
         Fetches the original FYPO terms from the original AnGeLiDatabase.txt file
-        The MASTER files starts the FYPO terms at index 6278, so we will start from there.
+        The FYPO columns are found by the column schema of the file.
         :return: A list of FYPOData objects containing the original FYPO terms.
         """
-        if self.original_file is None:
+        if self.original_schema is None:
             logging.error("Original file not parsed. Cannot fetch FYPO terms.")
             return None
         
         fypo_terms = []
-        for i in range(6277, 10451):
+        for column in self.original_schema.columns[self.original_schema.fypo]:
             fypo_terms.append(FYPOData(
-                fypo_id=self.original_file[0][i],
-                name=self.original_file[1][i],
-                measurement=self.original_file[2][i],
-                namespace=self.original_file[3][i],
-                source=self.original_file[4][i],
-                terms_with_annotations=self.original_file[5][i],
+                fypo_id=column.column_id,
+                name=column.name,
+                measurement=column.scale,
+                namespace=column.group,
+                source=column.source,
+                terms_with_annotations=column.author,
                 date=datetime.now().strftime("%d-%m-%Y"),
-                link=self.original_file[7][i]
+                link=column.link
             ))
         
         return fypo_terms
-                
-    
-    def regenerate_file(self, output_file='AnGeLiDatabase.txt'):
+
+    def build_term_registry(self) -> TermRegistry:
+        """
+        Builds the GO and FYPO term metadata registry from the original AnGeLiDatabase.txt file.
+        :return: A TermRegistry holding every original GO and FYPO term.
+        """
+        registry = TermRegistry()
+        for term in self.fetch_original_go_terms() + self.fetch_original_fypo_terms():
+            # Keep the first occurrence if the original file repeats a term
+            if term.term_id not in registry:
+                registry.add(term, ORIGIN_ORIGINAL)
+
+        return registry
+
+    def _append_original_columns(self, headers, columns):
+        """
+        Appends columns of the original file to the header rows, with today's update date.
+        """
+        date = datetime.now().strftime("%d-%m-%Y")
+        for column in columns:
+            headers[0].append(column.column_id)
+            headers[1].append(column.name)
+            headers[2].append(column.scale)
+            headers[3].append(column.group)
+            headers[4].append(column.source)
+            headers[5].append(column.author)
+            headers[6].append(date)
+            headers[7].append(column.link)
+
+    def _append_term_metadata(self, headers, term):
+        """
+        Appends the metadata of one GO/FYPO column to header rows 1 to 7.
+        """
+        headers[1].append(term.name)
+        headers[2].append(term.measurement)
+        headers[3].append(term.namespace)
+        headers[4].append(term.source)
+        headers[5].append(term.terms_with_annotations)
+        headers[6].append(term.date)
+        headers[7].append(term.link)
+
+    def _append_missing_term_metadata(self, headers, source):
+        """
+        Appends empty metadata to header rows 1 to 7 for a GO/FYPO column whose term could not be resolved,
+        so every header row keeps one value per column. The Source is kept, the output can then be read
+        back as an original file.
+        """
+        date = datetime.now().strftime("%d-%m-%Y")
+        for row, value in zip(headers[1:], ("", "Binary", "", source, "", date, "")):
+            row.append(value)
+
+    def _read_annotation_file(self, file_path, parse, fields):
+        """
+        Parses a local GAF/PHAF file, gzip-compressed if the name ends with .gz.
+        """
+        opener = gzip.open if file_path.endswith('.gz') else open
+        with opener(file_path, 'rt', encoding='utf-8') as f:
+            return parse(f, fields)
+
+    def compute_annotation_delta(self, previous_gaf, previous_phaf):
+        """
+        Compares the loaded GO and FYPO annotations with the GAF/PHAF files of a previous run.
+
+        :param previous_gaf: The previous GAF file (.gaf or .gaf.gz).
+        :param previous_phaf: The previous PHAF file (.phaf or .phaf.gz).
+        :return: The GO and FYPO AnnotationDelta.
+        """
+        previous_go_terms = self._read_annotation_file(previous_gaf, self._parse_gaf, GO_ANNOTATION_FIELDS)
+        previous_fypo_terms = self._read_annotation_file(previous_phaf, self._parse_phaf, FYPO_ANNOTATION_FIELDS)
+
+        go_delta = AnnotationDelta.from_pairs(self._go_annotation_pairs(previous_go_terms),
+                                              self._go_annotation_pairs(self.go_terms))
+        fypo_delta = AnnotationDelta.from_pairs(self._fypo_annotation_pairs(previous_fypo_terms),
+                                                self._fypo_annotation_pairs(self.fypo_terms))
+        logging.info(f"GO annotation changes: {go_delta.summary()}")
+        logging.info(f"FYPO annotation changes: {fypo_delta.summary()}")
+        return go_delta, fypo_delta
+
+    @staticmethod
+    def _file_digest(path) -> str:
+        if path is None:
+            return None
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(partial(f.read, 1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def build_settings(self) -> dict:
+        """
+        The settings the GO/FYPO columns depend on besides the annotations: the ontology files, which give
+        the ancestor closures and the term metadata, and direct_only. A delta rebuild is only valid from
+        a previous output built with the same settings.
+        """
+        return {
+            "direct_only": self.direct_only,
+            "go_obo_sha256": self._file_digest(self.go_obo_path),
+            "fypo_obo_sha256": self._file_digest(self.fypo_obo_path),
+        }
+
+    @staticmethod
+    def _read_build_settings(output_file) -> dict:
+        """
+        :return: The build settings written with an output, None if there are none.
+        """
+        try:
+            with open(output_file + BUILD_SETTINGS_SUFFIX, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _add_previous_term_metadata(self, header_rows, go_ids, fypo_ids):
+        """
+        Adds the metadata of the GO/FYPO columns of a previous output to the term registry,
+        for the terms that are not in the original file. These terms are not resolved again.
+        """
+        if any(len(row) != len(header_rows[0]) for row in header_rows):
+            # A term without metadata shifts the metadata rows, so the columns cannot be matched up
+            logging.warning("The header rows of the previous output have different lengths. Resolving every new term.")
+            return
+
+        date = datetime.now().strftime("%d-%m-%Y")
+        go_ids = set(go_ids)
+        fypo_ids = set(fypo_ids)
+        for i, term_id in enumerate(header_rows[0]):
+            # Terms that could not be resolved have no name, they are resolved again
+            if term_id in self.term_registry or not header_rows[1][i]:
+                continue
+            metadata = dict(
+                name=header_rows[1][i],
+                measurement=header_rows[2][i],
+                namespace=header_rows[3][i],
+                source=header_rows[4][i],
+                terms_with_annotations=header_rows[5][i],
+                date=date,
+                link=header_rows[7][i])
+            if term_id in go_ids:
+                self.term_registry.add(GOData(go_id=term_id, **metadata), ORIGIN_PREVIOUS)
+            elif term_id in fypo_ids:
+                self.term_registry.add(FYPOData(fypo_id=term_id, **metadata), ORIGIN_PREVIOUS)
+
+    def regenerate_file(self, output_file='AnGeLiDatabase.txt', previous_output=None, previous_gaf=None,
+                        previous_phaf=None, verify=False):
         """
         Regenerates the AnGeLiDatabase.txt file with updated information.
+
+        Given a previous output and the GAF/PHAF files it was built from, only the rows of the genes whose
+        annotations changed are rebuilt and every other row is copied from the previous output. If the previous
+        output was built with other settings (see build_settings) every row may change, so the file is fully rebuilt.
+        The settings are written next to the output, in output_file + BUILD_SETTINGS_SUFFIX.
+
+        :param output_file: The file to write.
+        :param previous_output: Optional AnGeLiDatabase.txt written by a previous run from the same original file.
+        :param previous_gaf: The GAF file (.gaf or .gaf.gz) the previous output was built from.
+        :param previous_phaf: The PHAF file (.phaf or .phaf.gz) the previous output was built from.
+        :param verify: With previous_output, also assemble every row like a full rebuild and check the output is identical.
         """
         logging.info("Regenerating the AnGeLiDatabase.txt file")
-        if self.original_file is None:
+        if self.original_schema is None:
             logging.error("Original file not parsed. Cannot regenerate.")
             return None
+
+        if previous_output is not None and (previous_gaf is None or previous_phaf is None):
+            raise ValueError("A delta rebuild needs the GAF and PHAF files the previous output was built from.")
+
+        settings = self.build_settings()
+        if previous_output is not None:
+            previous_settings = self._read_build_settings(previous_output)
+            if previous_settings != settings:
+                logging.warning(f"{previous_output} was built with other settings ({previous_settings}, now {settings}). "
+                                f"Running a full rebuild.")
+                previous_output = None
         
-        # Load the data from the PomBase website
-        self.find_go_terms()
-        self.find_fypo_terms()
-        
-        # Build the matrix of NEW GO terms and FYPO terms from POMBASE
-        go_matrix = self.build_GO_matrix()
-        fypo_matrix = self.build_FYPO_matrix()
-        
-        # Fetch the original GO and FYPO terms from the original file (we will use this for the metadata for the new terms)
-        original_go_terms = self.fetch_original_go_terms()
-        original_fypo_terms = self.fetch_original_fypo_terms()
+        # Load the data from the PomBase website and build the matrix of NEW GO terms and FYPO terms,
+        # the GO and FYPO stages run concurrently
+        pipeline = self.acquisition_pipeline()
+        results = pipeline.run()
+        self.stage_timings = pipeline.timings
+        go_matrix = results["go_matrix"]
+        fypo_matrix = results["fypo_matrix"]
         
+        # The metadata of the original GO and FYPO terms is reused, every other term is resolved in one concurrent pass
+        self.term_registry = results["term_registry"]
+
+        previous = None
+        if previous_output is not None:
+            # The metadata of the columns kept from the previous output is reused rather than resolved again
+            previous = AnGeLiDatabaseReader(previous_output)
+            previous_headers = previous.header_rows()
+            with self.instrumentation.stage("annotation_delta"):
+                go_delta, fypo_delta = self.compute_annotation_delta(previous_gaf, previous_phaf)
+            self._add_previous_term_metadata(previous_headers, go_delta.old_terms, fypo_delta.old_terms)
+
+        with self.instrumentation.stage("resolve_metadata"):
+            self.resolve_new_terms(
+                self.term_registry,
+                go_matrix.header,
+                self.load_go_ontology(),
+                GOData.from_api,
+                GOData._EBI_API_URL_TEMPLATE)
+            self.resolve_new_terms(
+                self.term_registry,
+                fypo_matrix.header,
+                self.load_fypo_ontology(),
+                FYPOData.from_api,
+                FYPOData._EBI_API_URL_TEMPLATE)
+        logging.info(f"Term metadata origins: {self.term_registry.origin_counts()}")
+        if self.term_cache is not None:
+            self.term_cache.log_stats()
+
         # The headers are the first 8 rows that hold metadata about the genes
-        final_data = self.build_headers()
+        headers = self.build_headers()
         
         for h in go_matrix.header:
             # Add the GO term to the final data
-            final_data[0].append(h)
-            
-            found = False
-            for oh in original_go_terms:
-                if h == oh.go_id:
-                    final_data[1].append(oh.name)
-                    final_data[2].append(oh.measurement)
-                    final_data[3].append(oh.namespace)
-                    final_data[4].append(oh.source)
-                    final_data[5].append(oh.terms_with_annotations)
-                    final_data[6].append(oh.date)
-                    final_data[7].append(oh.link)
-                    found = True
-                    break
-
-            if not found:
-                go_term = GOData.from_api(h) # GO term for 'cytosol'
-                if go_term:
-                    final_data[1].append(go_term.name)
-                    final_data[2].append(go_term.measurement)
-                    final_data[3].append(go_term.namespace)
-                    final_data[4].append(go_term.source)
-                    final_data[5].append(go_term.terms_with_annotations)
-                    final_data[6].append(go_term.date)
-                    final_data[7].append(go_term.link)
-                else:
-                    logging.warning(f"GO term {h} not found.")
+            headers[0].append(h)
+
+            go_term = self.term_registry.get(h)
+            if go_term:
+                self._append_term_metadata(headers, go_term)
+            else:
+                logging.warning(f"GO term {h} not found.")
+                self._append_missing_term_metadata(headers, GO_SOURCE)
 
         # ORDER maybe important, so we'll put in the two reference values here
-        for i in range(6275, 6277):
-           final_data[0].append(self.original_file[0][i])
-           final_data[1].append(self.original_file[1][i])
-           final_data[2].append(self.original_file[2][i])
-           final_data[3].append(self.original_file[3][i])
-           final_data[4].append(self.original_file[4][i])
-           final_data[5].append(self.original_file[5][i])
-           final_data[6].append(datetime.now().strftime("%d-%m-%Y"))
-           final_data[7].append(self.original_file[7][i])
+        self._append_original_columns(headers, self.original_schema.columns[self.original_schema.references])
             
                 
         for h in fypo_matrix.header:
             # Add the FYPO term to the final data
-            final_data[0].append(h)
+            headers[0].append(h)
             
-            found = False
-            for oh in original_fypo_terms:
-                if h == oh.fypo_id:
-                    final_data[1].append(oh.name)
-                    final_data[2].append(oh.measurement)
-                    final_data[3].append(oh.namespace)
-                    final_data[4].append(oh.source)
-                    final_data[5].append(oh.terms_with_annotations)
-                    final_data[6].append(oh.date)
-                    final_data[7].append(oh.link)
-                    found = True
-                    break
-
-            if not found:
-                fypo_term = FYPOData.from_api(h) # FYPO term for 'cytosol'
-                if fypo_term:
-                    final_data[1].append(fypo_term.name)
-                    final_data[2].append(fypo_term.measurement)
-                    final_data[3].append(fypo_term.namespace)
-                    final_data[4].append(fypo_term.source)
-                    final_data[5].append(fypo_term.terms_with_annotations)
-                    final_data[6].append(fypo_term.date)
-                    final_data[7].append(fypo_term.link)
-                else:
-                    logging.warning(f"FYPO term {h} not found.")
+            fypo_term = self.term_registry.get(h)
+            if fypo_term:
+                self._append_term_metadata(headers, fypo_term)
+            else:
+                logging.warning(f"FYPO term {h} not found.")
+                self._append_missing_term_metadata(headers, FYPO_SOURCE)
                     
         # Append the protein features after the GO and FYPO terms
-        for i in range(10451, len(self.original_file[0])):
-            final_data[0].append(self.original_file[0][i])
-            final_data[1].append(self.original_file[1][i])
-            final_data[2].append(self.original_file[2][i])
-            final_data[3].append(self.original_file[3][i])
-            final_data[4].append(self.original_file[4][i])
-            final_data[5].append(self.original_file[5][i])
-            final_data[6].append(datetime.now().strftime("%d-%m-%Y"))
-            final_data[7].append(self.original_file[7][i])
-
-        # Now add the data for each gene
-        for i in range(8, len(self.original_file)):
+        self._append_original_columns(headers, self.original_schema.columns[self.original_schema.features])
+
+        widths = [len(row) for row in headers]
+        if any(width != len(headers[0]) for width in widths):
+            if previous is not None:
+                previous.close()
+            raise ValueError(f"The header rows have different lengths: {widths}.")
+
+        if previous is not None:
+            # The previous output must have the columns of the previous annotations
+            expected_length = (len(headers[0]) - len(go_matrix.header) - len(fypo_matrix.header)
+                               + len(go_delta.old_terms) + len(fypo_delta.old_terms))
+            if len(previous_headers[0]) != expected_length:
+                previous.close()
+                raise ValueError(f"{previous_output} was not built from {previous_gaf} and {previous_phaf}: "
+                                 f"expected {expected_length} columns, found {len(previous_headers[0])}.")
+
+        # Write the 8 header rows first, then stream each gene row out as soon as it is assembled.
+        # The rows are written to a temporary file, as the output may replace the original file being streamed.
+        temp_file = output_file + '.tmp'
+        with self.instrumentation.stage("assemble_write"), open(temp_file, 'w', encoding='utf-8') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerows(headers)
+            if previous is None:
+                rows = 0
+                for row in self._iter_gene_rows(go_matrix, fypo_matrix, len(headers[0])):
+                    writer.writerow(row)
+                    rows += 1
+            else:
+                with previous:
+                    rows = self._write_delta_rows(f, writer, previous, go_delta, fypo_delta, go_matrix, fypo_matrix)
+            self.instrumentation.count(ROWS, rows)
+            self.instrumentation.count(BYTES_WRITTEN, f.tell())
+
+        if previous is not None and verify:
+            with self.instrumentation.stage("verify"):
+                if not self._matches_full_rebuild(temp_file, headers, go_matrix, fypo_matrix):
+                    os.remove(temp_file)
+                    raise RuntimeError("The delta rebuild differs from a full rebuild.")
+            logging.info("Verified the delta rebuild against a full rebuild.")
+
+        # The settings of an earlier output must not describe this one, even if writing them fails
+        settings_file = output_file + BUILD_SETTINGS_SUFFIX
+        if os.path.exists(settings_file):
+            os.remove(settings_file)
+        os.replace(temp_file, output_file)
+        with open(settings_file, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+
+        return
+
+    def _matrix_row(self, matrix, gene_id, label):
+        """
+        :return: The matrix row of a gene, all zeros if the gene has no annotations.
+        """
+        data = matrix.get_row(gene_id)
+        if data is None:
+            logging.warning(f"{label} data for gene {gene_id} not found. Using empty data.")
+            data = ["0"] * (len(matrix.header))
+        return data
+
+    def _matrix_row_text(self, matrix, gene_id, label) -> str:
+        """
+        :return: The matrix row of a gene as tab-separated text.
+        """
+        if not matrix.header:
+            return ""
+        if isinstance(matrix, PackedMatrix):
+            bits = matrix.get_row_bits(gene_id)
+            if bits is not None:
+                # Joining the characters of the bit string is much faster than formatting each value
+                return "\t".join(format(bits, f"0{len(matrix.header)}b")[::-1])
+        return "\t".join(map(str, self._matrix_row(matrix, gene_id, label)))
+
+    def _write_delta_rows(self, f, writer, previous, go_delta, fypo_delta, go_matrix, fypo_matrix):
+        """
+        Writes the gene rows of a delta rebuild. The rows of genes whose GO and FYPO annotations did not change
+        are copied from the previous output as they are. The other rows are rebuilt from the new matrices, with
+        the static, reference and protein feature columns taken from the previous row. If terms were added or
+        removed every column shifts, so every row is rebuilt.
+
+        :param f: The output file, after the header rows.
+        :param writer: The csv writer of the output file.
+        :param previous: An AnGeLiDatabaseReader of the previous output.
+        :return: The number of gene rows written.
+        """
+        static_width = ColumnSchema.width(self.original_schema.static)
+        reference_width = ColumnSchema.width(self.original_schema.references)
+        references_start = static_width + len(go_delta.old_terms)
+        features_start = references_start + reference_width + len(fypo_delta.old_terms)
+        ranges = ((0, static_width), (references_start, references_start + reference_width), (features_start, None))
+
+        rebuild_all = go_delta.columns_changed or fypo_delta.columns_changed
+        changed_genes = go_delta.changed_genes | fypo_delta.changed_genes
+        terminator = writer.dialect.lineterminator
+        encoding = previous.encoding
+        copied = 0
+        rebuilt = 0
+        for index, line, segments in previous.iter_raw_rows(ranges):
+            if not line:
+                continue
+
+            row = None
+            if segments is None:
+                row = previous.row(index)
+                gene_id = row[0]
+            else:
+                gene_id = segments[0].split(b'\t', 1)[0].decode(encoding)
+
+            if not rebuild_all and gene_id not in changed_genes:
+                f.write(line.decode(encoding) + terminator)
+                copied += 1
+                continue
+
+            if row is not None:
+                go_data = self._matrix_row(go_matrix, gene_id, "GO")
+                fypo_data = self._matrix_row(fypo_matrix, gene_id, "FYPO")
+                writer.writerow(row[:static_width] + list(go_data) + row[references_start:references_start + reference_width]
+                                + list(fypo_data) + row[features_start:])
+            else:
+                static, references, features = (segment.decode(encoding) for segment in segments)
+                fields = [static, self._matrix_row_text(go_matrix, gene_id, "GO"), references,
+                          self._matrix_row_text(fypo_matrix, gene_id, "FYPO"), features]
+                # Empty matrices add no columns
+                f.write("\t".join(field for n, field in enumerate(fields) if field or n % 2 == 0) + terminator)
+            rebuilt += 1
+
+        logging.info(f"Delta rebuild: {copied} rows copied, {rebuilt} rows rebuilt")
+        return copied + rebuilt
+
+    def _matches_full_rebuild(self, file_path, headers, go_matrix, fypo_matrix) -> bool:
+        """
+        Checks a file against the output of a full rebuild, which is hashed rather than written.
+        """
+        full_rebuild = _DigestWriter()
+        writer = csv.writer(full_rebuild, delimiter='\t')
+        writer.writerows(headers)
+        for row in self._iter_gene_rows(go_matrix, fypo_matrix, len(headers[0])):
+            writer.writerow(row)
+
+        written = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(partial(f.read, 1024 * 1024), b''):
+                written.update(chunk)
+        return written.digest() == full_rebuild.digest.digest()
+
+    def _iter_gene_rows(self, go_matrix, fypo_matrix, expected_length):
+        """
+        Assembles the output rows of the genes in the original file one at a time,
+        so only a single row is held in memory while the file is written.
+
+        :param go_matrix: The gene x GO term matrix.
+        :param fypo_matrix: The gene x FYPO term matrix.
+        :param expected_length: The number of columns in the header rows.
+        :return: A generator of output rows.
+        """
+        for i, segments in self._iter_original_rows(self.original_schema.row_projection()):
             # Get the gene ID
-            if len(self.original_file[i]) == 0:
+            if segments is None:
                 logging.warning(f"Gene ID at row {i} is empty. Skipping this row.")
                 continue
-            gene_id = self.original_file[i][0]
-            row = []
-            
-            # The first 50 columns are mostly static, so we will copy them over
-            for j in range(0, 50):
-                row.append(self.original_file[i][j])
+            static, references, features = segments
+            gene_id = static[0]
+
+            # The static gene columns before the GO terms are copied over
+            row = list(static)
             
             # Find the data in the GO matrix
-            go_data = go_matrix.get_row(gene_id)
-            if go_data is None:
-                logging.warning(f"GO data for gene {gene_id} not found. Using empty data.")
-                go_data = ["0"] * (len(go_matrix.header))
-    
-            for x in go_data:
-                row.append(x)
+            row.extend(self._matrix_row(go_matrix, gene_id, "GO"))
 
-            for k in range(6275, 6277):
-                row.append(self.original_file[i][k])
+            row.extend(references)
                 
-            fypo_data = fypo_matrix.get_row(gene_id)
-            if fypo_data is None:
-                logging.warning(f"FYPO data for gene {gene_id} not found. Using empty data.")
-                fypo_data = ["0"] * (len(fypo_matrix.header))
-                
-            for y in fypo_data:
-                row.append(y)
+            row.extend(self._matrix_row(fypo_matrix, gene_id, "FYPO"))
 
-            for l in range(10452, len(self.original_file[i])):
-                row.append(self.original_file[i][l])
+            row.extend(features)
 
-            # add the row to the final data
-            if len(row) != len(final_data[0]):
-                logging.error(f"Row length mismatch at row {i}. Expected {len(final_data[0])}, got {len(row)}. Please check the input data for gene {gene_id}.")
+            if len(row) != expected_length:
+                logging.error(f"Row length mismatch at row {i}. Expected {expected_length}, got {len(row)}. Please check the input data for gene {gene_id}.")
 
-            final_data.append(row)
-        
-        # Finally write the file to disk
-        with open(output_file, 'w', encoding='utf-8') as f:
-            writer = csv.writer(f, delimiter='\t')
-            
-            # Write all the rows at once
-            writer.writerows(final_data)
-
-        return
+            yield row
 
 def main():
     """
@@ -695,19 +1251,108 @@ def main():
     parser = argparse.ArgumentParser(description="Reconstruct the AnGeLi database")
     parser.add_argument("--path", type=str, default=None, help="Input file (incuding path)")
     parser.add_argument("--output_file", type=str, default=None, help="Output file (incuding path)")
+    parser.add_argument("--workers", type=int, default=8, help="Number of concurrent term metadata requests")
+    parser.add_argument("--rate_limit", type=float, default=None, help="Maximum term metadata requests per second per host")
+    parser.add_argument("--go_obo", type=str, default=None, help="Local GO ontology file (e.g. go-basic.obo) for term metadata")
+    parser.add_argument("--fypo_obo", type=str, default=None, help="Local FYPO ontology file (e.g. fypo.obo) for term metadata")
+    parser.add_argument("--term_cache", type=str, default=None, help="SQLite file caching term metadata between runs")
+    parser.add_argument("--term_cache_ttl_days", type=float, default=30, help="Days before a cached term is refetched")
+    parser.add_argument("--term_cache_max_entries", type=int, default=100000, help="Maximum number of cached terms")
+    parser.add_argument("--matrix_backend", choices=list(MATRIX_BACKENDS), default="packed", help="Storage used for the GO and FYPO matrices")
+    parser.add_argument("--download_cache", type=str, default=None, help="Directory caching the PomBase release files between runs")
+    parser.add_argument("--download_cache_max_mb", type=int, default=1024, help="Maximum size of the download cache in MB")
+    parser.add_argument("--retries", type=int, default=5, help="Maximum retries per HTTP request on transient errors")
+    parser.add_argument("--global_rate_limit", type=float, default=None, help="Maximum HTTP requests per second across all hosts")
+    parser.add_argument("--packed_output", type=str, default=None, help="Also write the regenerated database as a packed binary store")
+    parser.add_argument("--previous_output", type=str, default=None, help="Previous output to update incrementally instead of a full rebuild, "
+                        "ignored if it was built with other ontology files or --direct_only")
+    parser.add_argument("--previous_gaf", type=str, default=None, help="GAF file (.gaf or .gaf.gz) the previous output was built from")
+    parser.add_argument("--previous_phaf", type=str, default=None, help="PHAF file (.phaf or .phaf.gz) the previous output was built from")
+    parser.add_argument("--verify_delta", action="store_true", help="Check the incremental output is identical to a full rebuild")
+    parser.add_argument("--direct_only", action="store_true", help="Only set the directly annotated GO/FYPO terms, without their ancestors")
+    parser.add_argument("--gene_index", type=str, default=None, help="Also write the gene symbol/synonym index (JSON) to this file")
+    parser.add_argument("--url_rewrite", action="append", default=[], metavar="PREFIX=REPLACEMENT",
+                        help="Send requests for URLs starting with PREFIX to REPLACEMENT instead, e.g. to a local stand-in server")
+    parser.add_argument("--run_report", type=str, default=None, help="Write the per stage timings, memory and counters (JSON) to this file")
+    parser.add_argument("--trace_memory", action="store_true", help="Also record the Python allocation peaks of each stage (slow)")
+    parser.add_argument("--profile_stage", type=str, default=None, help="Run this stage (e.g. assemble_write, go_terms) under cProfile")
+    parser.add_argument("--profile_output", type=str, default=None, help="cProfile statistics file, PROFILE_STAGE.prof by default")
+    parser.add_argument("--refresh_stale_only", action="store_true", help="Only refresh the stale term cache entries, do not rebuild")
 
     args = parser.parse_args()
 
+    term_cache = None
+    if args.term_cache:
+        term_cache = TermCache(args.term_cache, ttl=args.term_cache_ttl_days * 24 * 60 * 60,
+                               max_entries=args.term_cache_max_entries)
+
+    # One pooled session is shared by the release downloads and the term metadata requests
+    if any("=" not in rewrite for rewrite in args.url_rewrite):
+        parser.error("--url_rewrite expects PREFIX=REPLACEMENT")
+    url_rewrites = dict(rewrite.split("=", 1) for rewrite in args.url_rewrite)
+    session = SessionProvider(pool_size=args.workers, retries=args.retries, rate_limit=args.global_rate_limit,
+                              url_rewrites=url_rewrites)
+
+    download_cache = None
+    if args.download_cache:
+        download_cache = DownloadCache(args.download_cache, max_bytes=args.download_cache_max_mb * 1024 * 1024,
+                                       http=session)
+
+    instrumentation = Instrumentation(trace_memory=args.trace_memory, profile_stage=args.profile_stage)
+    instrumentation.start()
+
     # Initialize the AnGeLi database
-    db = AnGeLi()
-    parsed = db.parse_original_AnGeLiDatabase(args.path)
-    if not parsed:
-        logging.error("Failed to parse the original database file file.")
-        return
-    
-    db.regenerate_file(args.output_file)
-    
-    logging.info("Finished AnGeLi database reconstruction at %s", datetime.now())
+    db = AnGeLi(max_workers=args.workers, rate_limit=args.rate_limit,
+                go_obo_path=args.go_obo, fypo_obo_path=args.fypo_obo, term_cache=term_cache,
+                matrix_backend=args.matrix_backend, download_cache=download_cache, session=session,
+                direct_only=args.direct_only, instrumentation=instrumentation)
+
+    # The resources are released and the run report written however the run ends
+    status = "failed"
+    try:
+        if args.refresh_stale_only:
+            db.refresh_term_cache()
+            status = "refreshed"
+            return
+
+        parsed = db.parse_original_AnGeLiDatabase(args.path)
+        if not parsed:
+            logging.error("Failed to parse the original database file file.")
+            return
+
+        db.regenerate_file(args.output_file, previous_output=args.previous_output, previous_gaf=args.previous_gaf,
+                           previous_phaf=args.previous_phaf, verify=args.verify_delta)
+        if args.packed_output:
+            with instrumentation.stage("packed_output"):
+                write_packed_database(args.output_file, args.packed_output)
+        if args.gene_index:
+            with instrumentation.stage("gene_index"):
+                with AnGeLiDatabaseReader(args.output_file) as reader:
+                    genes = [segments[0][0] for _, segments in reader.iter_rows(((0, 1),)) if segments]
+                db.build_gene_index(genes).save(args.gene_index)
+        status = "completed"
+    finally:
+        if term_cache is not None:
+            term_cache.close()
+        if download_cache is not None:
+            download_cache.log_stats()
+        session.log_stats()
+        http_stats = session.stats()
+        session.close()
+
+        instrumentation.stop()
+        if args.run_report:
+            instrumentation.write_report(
+                args.run_report,
+                status=status,
+                arguments=vars(args),
+                http=http_stats,
+                download_cache={"hits": download_cache.hits, "misses": download_cache.misses} if download_cache else None,
+                term_metadata_origins=db.term_registry.origin_counts() if db.term_registry is not None else None)
+        if args.profile_stage:
+            instrumentation.dump_profile(args.profile_output or f"{args.profile_stage}.prof")
+
+        logging.info("Finished AnGeLi database reconstruction (%s) at %s", status, datetime.now())
 
 # Example usage
 if __name__ == "__main__":
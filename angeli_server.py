@@ -0,0 +1,338 @@
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import asdict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from enrichment import EnrichmentIndex
+from gene_index import GeneIndex
+from metric_stats import MetricStatistics
+from packed_database import MAGIC, PackedDatabase, write_packed_database
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted request body
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+def packed_path_for(path: str) -> str:
+    """
+    :param path: A packed database, or an AnGeLi TSV database.
+    :return: The packed database to load. A TSV file is packed next to itself as <path>.angeli,
+             reusing an existing packed copy that is newer than the TSV.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            return path
+
+    packed_path = path + ".angeli"
+    if not os.path.exists(packed_path) or os.path.getmtime(packed_path) < os.path.getmtime(path):
+        logger.info(f"Packing {path} to {packed_path}")
+        # write_packed_database writes a temporary file and replaces packed_path with it
+        write_packed_database(path, packed_path)
+    return packed_path
+
+
+class ServerState:
+    """
+    Everything a request needs from one version of the database. A state is never
+    modified after it is built, reloading builds a new one and swaps it in.
+
+    The requests using a state are counted (see AnGeLiServer.acquire_state), so that a
+    replaced state closes its database once the last of them is done.
+    """
+
+    def __init__(self, path: str, version: int, gene_index_path: str = None):
+        self.path = path
+        self.gene_index_path = gene_index_path
+        self.version = version
+        self.loaded_at = time.time()
+        self.users = 0
+        self.retired = False
+        # Kept open for gene lookups until the state is closed
+        self.db = PackedDatabase(packed_path_for(path))
+        self.enrichment = EnrichmentIndex.from_packed_database(self.db)
+        self.enrichment.gene_postings()
+        self.metrics = MetricStatistics.from_packed_database(self.db)
+        self.gene_rows = {}
+        for r, gene in enumerate(self.db.genes):
+            self.gene_rows.setdefault(gene, r)
+        # Without a symbol index, identifiers still resolve case-insensitively to the systematic ids
+        self.gene_index = GeneIndex.load(gene_index_path) if gene_index_path else GeneIndex()
+        for gene in self.db.genes:
+            self.gene_index.add(gene)
+
+    def close(self):
+        self.db.close()
+
+    def summary(self) -> dict:
+        return {"path": self.path, "version": self.version, "loaded_at": self.loaded_at,
+                "genes": len(self.db), "columns": len(self.db.columns)}
+
+
+class AnGeLiServer(ThreadingHTTPServer):
+    """
+    A resident AnGeLi query server: the database is loaded once and requests are answered
+    from memory by a thread each.
+
+    Reloading loads the new database fully before replacing self.state, so requests in flight
+    finish on the version they started with and new requests see the new one. The old version
+    is closed when the last request using it is done.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, path: str, gene_index_path: str = None):
+        self._reload_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.state = ServerState(path, 1, gene_index_path)
+        super().__init__(address, AnGeLiRequestHandler)
+
+    def acquire_state(self) -> ServerState:
+        """
+        :return: The current state, kept open until it is given back with release_state().
+        """
+        with self._state_lock:
+            state = self.state
+            state.users += 1
+            return state
+
+    def release_state(self, state: ServerState):
+        with self._state_lock:
+            state.users -= 1
+            close = state.retired and state.users == 0
+        if close:
+            self._close_state(state)
+
+    def _retire(self, state: ServerState):
+        """
+        Closes a state that is no longer current, now or when the last request using it is done.
+        """
+        with self._state_lock:
+            state.retired = True
+            close = state.users == 0
+        if close:
+            self._close_state(state)
+
+    @staticmethod
+    def _close_state(state: ServerState):
+        state.close()
+        logger.info(f"Closed version {state.version}")
+
+    def server_close(self):
+        super().server_close()
+        self._retire(self.state)
+
+    def reload(self, path: str = None, gene_index_path: str = None) -> ServerState:
+        """
+        :param path: The database to load, by default the current one (e.g. after it was regenerated).
+        :param gene_index_path: The gene index to load, by default the current one.
+        :return: The new state.
+        """
+        with self._reload_lock:
+            current = self.state
+            state = ServerState(path or current.path, current.version + 1, gene_index_path or current.gene_index_path)
+            with self._state_lock:
+                previous = self.state
+                self.state = state
+            self._retire(previous)
+        logger.info(f"Loaded version {state.version} from {state.path}")
+        return state
+
+    def watch(self, interval: float) -> threading.Thread:
+        """
+        Starts a thread reloading the database whenever its file changes.
+        """
+        def poll():
+            last = None
+            version = None
+            while True:
+                state = self.state
+                path = state.path
+                try:
+                    stat = os.stat(path)
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    signature = last
+                # A reload through /reload is not a change of the file
+                if state.version != version:
+                    last = None
+                    version = state.version
+                if last is not None and signature != last:
+                    try:
+                        self.reload(path)
+                    except Exception:
+                        logger.exception(f"Failed to reload {path}, keeping version {self.state.version}")
+                last = signature
+                time.sleep(interval)
+
+        thread = threading.Thread(target=poll, name="angeli-watch", daemon=True)
+        thread.start()
+        return thread
+
+
+def _json_safe(value):
+    # JSON has no NaN, missing statistics are sent as null
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return value
+
+
+class AnGeLiRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health               Version and size of the loaded database.
+    GET  /genes                The gene ids.
+    GET  /gene/<id>[?columns=] The values of a gene (id, symbol or synonym), optionally only some columns.
+    POST /resolve              {"genes": [...]}, systematic ids, symbols or synonyms.
+    POST /enrich               {"genes": [...], "background": [...], "groups": [...], "max_p": 0.05}
+    POST /metrics              {"genes": [...], "columns": [...]}
+    POST /reload               {"path": "...", "gene_index": "..."}, both optional.
+
+    The gene lists of /enrich and /metrics are resolved like /resolve, and the responses list
+    the unknown and ambiguous identifiers.
+    """
+
+    server_version = "AnGeLi"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status: HTTPStatus, body: dict):
+        data = json.dumps(_json_safe(body)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_SIZE:
+            raise ValueError("Request body too large.")
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("The request body must be a JSON object.")
+        return body
+
+    def do_GET(self):
+        # One state per request, even if a reload happens meanwhile
+        state = self.server.acquire_state()
+        try:
+            self._get(state)
+        finally:
+            self.server.release_state(state)
+
+    def _get(self, state: ServerState):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send(HTTPStatus.OK, {"status": "ok", **state.summary()})
+        elif url.path == "/genes":
+            self._send(HTTPStatus.OK, {"version": state.version, "genes": state.db.genes})
+        elif url.path.startswith("/gene/"):
+            self._gene(state, unquote(url.path[len("/gene/"):]), parse_qs(url.query))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {url.path}"})
+
+    def _gene(self, state: ServerState, gene: str, query: dict):
+        r = state.gene_rows.get(gene)
+        if r is None:
+            candidates = state.gene_index.lookup(gene)
+            if len(candidates) > 1:
+                self._send(HTTPStatus.CONFLICT, {"error": f"Ambiguous gene {gene}", "candidates": candidates})
+                return
+            if not candidates or candidates[0] not in state.gene_rows:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown gene {gene}"})
+                return
+            gene = candidates[0]
+            r = state.gene_rows[gene]
+        values = dict(zip(state.db.columns[1:], state.db.row(r)[1:]))
+        if "columns" in query:
+            wanted = [column for columns in query["columns"] for column in columns.split(",") if column]
+            values = {column: values.get(column) for column in wanted}
+        self._send(HTTPStatus.OK, {"version": state.version, "gene": gene, "values": values})
+
+    def do_POST(self):
+        state = self.server.acquire_state()
+        try:
+            self._post(state)
+        finally:
+            self.server.release_state(state)
+
+    def _post(self, state: ServerState):
+        path = urlparse(self.path).path
+        try:
+            body = self._read_json()
+            if path == "/resolve":
+                self._send(HTTPStatus.OK, {"version": state.version, **asdict(self._resolve(state, body))})
+            elif path == "/enrich":
+                resolution = self._resolve(state, body)
+                background = body.get("background")
+                if background is not None:
+                    background = self._resolve(state, {"genes": background}).genes
+                results = state.enrichment.enrich(
+                    resolution.genes, background=background,
+                    groups=set(body["groups"]) if body.get("groups") else None,
+                    max_p=float(body.get("max_p", 0.05)))
+                self._send(HTTPStatus.OK, {"version": state.version, "results": [asdict(result) for result in results],
+                                           "unknown": resolution.unknown, "ambiguous": resolution.ambiguous})
+            elif path == "/metrics":
+                resolution = self._resolve(state, body)
+                results = state.metrics.compare(resolution.genes, columns=body.get("columns"))
+                self._send(HTTPStatus.OK, {"version": state.version, "results": [asdict(result) for result in results],
+                                           "unknown": resolution.unknown, "ambiguous": resolution.ambiguous})
+            elif path == "/reload":
+                state = self.server.reload(body.get("path"), body.get("gene_index"))
+                self._send(HTTPStatus.OK, {"status": "reloaded", **state.summary()})
+            else:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"})
+        except (ValueError, TypeError, KeyError) as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except OSError as e:
+            logger.exception(f"Request to {path} failed")
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+
+    @staticmethod
+    def _resolve(state: ServerState, body: dict):
+        genes = body.get("genes")
+        if not isinstance(genes, list) or not all(isinstance(gene, str) for gene in genes):
+            raise ValueError("'genes' must be a list of gene identifiers.")
+        return state.gene_index.resolve(genes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident AnGeLi query server")
+    parser.add_argument("database", type=str, help="Packed database, or AnGeLi TSV database (packed on load)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--gene_index", type=str, default=None,
+                        help="Gene symbol/synonym index written by angeli.py --gene_index")
+    parser.add_argument("--watch", type=float, default=None,
+                        help="Reload when the database file changes, checking every WATCH seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    server = AnGeLiServer((args.host, args.port), args.database, args.gene_index)
+    if args.watch:
+        server.watch(args.watch)
+    logger.info(f"Serving {args.database} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
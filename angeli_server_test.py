@@ -0,0 +1,107 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from angeli_server import AnGeLiServer
+from load_test import percentile
+
+HEADERS = [
+    ['Short name', 'Mass', 'GO:0005634', 'GO:0005737'],
+    ['Long name', 'Molecular weight', 'nucleus', 'cytoplasm'],
+    ['Scale of measurement', 'Metric', 'Binary', 'Binary'],
+    ['Group', 'Protein Features', 'GO Cellular Component', 'GO Cellular Component'],
+    ['Source', 'Pombase', 'GO', 'GO'],
+    ['Author', 'DB', 'Terms with >1 annotation', 'Terms with >1 annotation'],
+    ['Update', '16-10-2026', '16-10-2026', '16-10-2026'],
+    ['Link', 'http://www.pombase.org', 'http://www.ebi.ac.uk', 'http://www.ebi.ac.uk'],
+]
+
+GENES = ['SPAC1F8.01', 'SPAC31A2.12', 'SPAC22F3.10c', 'SPAC1687.21', 'SPAC222.06', 'SPAC56F8.03']
+
+def write_database(path, genes):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerows(HEADERS)
+        writer.writerows([gene, str(10 + 5 * r), '1' if r < 3 else '0', '0' if r < 3 else '1']
+                         for r, gene in enumerate(genes))
+
+class TestAnGeLiServer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'AnGeLiDatabase.txt')
+        write_database(self.path, GENES)
+        self.server = AnGeLiServer(('127.0.0.1', 0), self.path)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def request(self, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        with urllib.request.urlopen(urllib.request.Request(self.url + path, data=data)) as response:
+            return json.loads(response.read())
+
+    def test_gene(self):
+        self.assertEqual(self.request('/gene/SPAC31A2.12')['values'], {'Mass': '15', 'GO:0005634': '1', 'GO:0005737': '0'})
+        self.assertEqual(self.request('/gene/SPAC31A2.12?columns=Mass')['values'], {'Mass': '15'})
+        self.assertEqual(self.request('/gene/spac31a2.12')['gene'], 'SPAC31A2.12')
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request('/gene/SPXXX.01')
+        self.assertEqual(context.exception.code, 404)
+
+    def test_queries(self):
+        results = self.request('/enrich', {'genes': GENES[:3], 'max_p': 1})['results']
+        self.assertEqual([result['column'] for result in results], ['GO:0005634'])
+        response = self.request('/enrich', {'genes': GENES[:3] + ['SPXXX.01'], 'max_p': 1})
+        self.assertEqual(response['unknown'], ['SPXXX.01'])
+        results = self.request('/metrics', {'genes': GENES[:3]})['results']
+        self.assertEqual((results[0]['column'], results[0]['list_mean']), ('Mass', 15.0))
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.request('/enrich', {'genes': 'SPAC1F8.01'})
+        self.assertEqual(context.exception.code, 400)
+
+    def test_reload(self):
+        """A regenerated database is packed again and swapped in with a new version."""
+        self.assertEqual(self.request('/health')['genes'], len(GENES))
+        write_database(self.path, GENES + ['SPAC9G1.12'])
+        os.utime(self.path, (os.path.getmtime(self.path) + 10,) * 2)
+        summary = self.request('/reload', {})
+        self.assertEqual((summary['version'], summary['genes']), (2, len(GENES) + 1))
+        self.assertEqual(self.request('/gene/SPAC9G1.12')['version'], 2)
+
+    def test_reload_closes_old_version(self):
+        """A replaced version is closed once the requests still using it are done."""
+        in_flight = self.server.acquire_state()
+        self.server.reload()
+        self.assertFalse(in_flight.db._map.closed)
+        self.assertEqual(in_flight.db.row(0)[0], GENES[0])
+        self.server.release_state(in_flight)
+        self.assertTrue(in_flight.db._map.closed)
+
+        unused = self.server.state
+        self.server.reload()
+        self.assertTrue(unused.db._map.closed)
+        self.assertFalse(os.path.exists(self.path + '.angeli.tmp'))
+
+class TestLoadTest(unittest.TestCase):
+
+    def test_percentile(self):
+        """Nearest rank: the smallest value with at least the fraction of the values at or below it."""
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+        self.assertEqual(percentile(list(range(1, 101)), 0.50), 50)
+        self.assertEqual(percentile(list(range(1, 11)), 0.50), 5)
+        self.assertEqual(percentile(list(range(1, 11)), 0.99), 10)
+        self.assertEqual(percentile(list(range(1, 101)), 0.07), 7)
+        self.assertEqual(percentile([7], 0.0), 7)
+
+if __name__ == '__main__':
+    unittest.main()
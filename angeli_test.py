@@ -1,7 +1,42 @@
 # Test the files to make sure we have the enums correct.
 # All files are located in /test_data
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
-from angeli import AnGeLi, Peptide
+from angeli import BUILD_SETTINGS_SUFFIX, FYPO_ANNOTATION_FIELDS, GO_ANNOTATION_FIELDS, AnGeLi, Peptide
+from column_schema import ColumnSchema
+from http_session import SessionProvider
+from synthetic_data import SyntheticConfig, generate
+
+GO_OBO = """[Term]
+id: GO:0000001
+is_a: GO:0048308
+
+[Term]
+id: GO:0048308
+relationship: part_of GO:0008150
+
+[Term]
+id: GO:0008150
+"""
+
+def synthetic_db(paths, gaf=None, **kwargs):
+    """An AnGeLi loaded from a synthetic data set, without network access."""
+    db = AnGeLi(**kwargs)
+    db.parse_original_AnGeLiDatabase(paths['master'])
+    with open(gaf or paths['gaf'], encoding='utf-8') as f:
+        db.go_terms = db._parse_gaf(f, GO_ANNOTATION_FIELDS)
+    with open(paths['phaf'], encoding='utf-8') as f:
+        db.fypo_terms = db._parse_phaf(f, FYPO_ANNOTATION_FIELDS)
+    return db
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
 
 class TestAnGeLi(unittest.TestCase):
 
@@ -28,5 +63,151 @@ class TestAnGeLi(unittest.TestCase):
         # Assert that the actual greeting matches the expected greeting
         self.assertEqual(data[0][Peptide.MASS.value], expected_mass)
 
+    def test_go_propagation(self):
+        """The GO matrix counts a gene for the ancestors of its terms, except with direct_only or for NOT annotations."""
+        handle, obo_path = tempfile.mkstemp(suffix='.obo')
+        with os.fdopen(handle, 'w') as f:
+            f.write(GO_OBO)
+        records = [{'DB_Object_ID': 'SPAC1F8.01', 'GO_ID': 'GO:0000001', 'Qualifier': 'involved_in'},
+                   {'DB_Object_ID': 'SPAC31A2.12', 'GO_ID': 'GO:0048308', 'Qualifier': 'NOT|involved_in'}]
+        try:
+            db = AnGeLi(go_obo_path=obo_path)
+            db.go_terms = records
+            matrix = db.build_GO_matrix()
+            direct = AnGeLi(go_obo_path=obo_path, direct_only=True)
+            direct.go_terms = records
+            direct_matrix = direct.build_GO_matrix()
+        finally:
+            os.remove(obo_path)
+
+        self.assertEqual(matrix.header, ['GO:0000001', 'GO:0008150', 'GO:0048308'])
+        self.assertEqual(matrix.get_row('SPAC1F8.01'), [1, 1, 1])
+        # The NOT annotation does not make the gene a member of GO:0048308
+        self.assertIsNone(matrix.get_row('SPAC31A2.12'))
+        self.assertEqual(direct_matrix.header, ['GO:0000001', 'GO:0048308'])
+        self.assertEqual(direct_matrix.get_row('SPAC31A2.12'), [0, 1])
+
+    def test_regenerate_alignment(self):
+        """Every value of the regenerated file is under its own column, whatever the size of the term blocks."""
+        config = SyntheticConfig(genes=30, go_terms=40, fypo_terms=30, go_columns=60, fypo_columns=45, domain_columns=7)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = generate(directory, config)
+            db = AnGeLi(direct_only=True)
+            self.assertTrue(db.parse_original_AnGeLiDatabase(paths['master']))
+            with open(paths['gaf'], encoding='utf-8') as f:
+                db.go_terms = db._parse_gaf(f, ('DB_Object_ID', 'GO_ID', 'Qualifier'))
+            with open(paths['phaf'], encoding='utf-8') as f:
+                db.fypo_terms = db._parse_phaf(f, ('GENE_ID', 'FYPO_ID', 'CONDITION'))
+            output = os.path.join(directory, 'AnGeLiDatabase.txt')
+            db.regenerate_file(output)
+            with open(paths['master'], encoding='utf-8', newline='') as f:
+                original = list(csv.reader(f, delimiter='\t'))
+            with open(output, encoding='utf-8', newline='') as f:
+                regenerated = list(csv.reader(f, delimiter='\t'))
+
+        header = {column: i for i, column in enumerate(regenerated[0])}
+        original_rows = {row[0]: row for row in original[8:]}
+        annotated = {(record.DB_Object_ID, record.GO_ID) for record in db.go_terms}
+        self.assertEqual({len(row) for row in regenerated}, {len(regenerated[0])})
+        self.assertNotIn('FYPO:0000045', regenerated[0][header['Ortholog1']:header['PF00001']])
+        for row in regenerated[8:]:
+            original_row = original_rows[row[0]]
+            self.assertEqual(row[:49], original_row[:49])
+            for i in list(range(109, 111)) + list(range(156, len(original_row))):
+                self.assertEqual(row[header[original[0][i]]], original_row[i])
+            for term in db.build_GO_matrix().header:
+                self.assertEqual(row[header[term]], '1' if (row[0], term) in annotated else '0')
+
+    def test_delta_rebuild(self):
+        """A delta rebuild is byte-identical to a full rebuild, and falls back to one when the settings changed."""
+        config = SyntheticConfig(genes=40, go_terms=40, fypo_terms=30, go_columns=20, fypo_columns=15, domain_columns=5)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = generate(directory, config)
+            ontologies = dict(go_obo_path=paths['go_obo'], fypo_obo_path=paths['fypo_obo'])
+            output = lambda name: os.path.join(directory, name)
+
+            # Swap the genes of a few annotations, the set of terms stays the same
+            with open(paths['gaf'], encoding='utf-8') as f:
+                lines = f.readlines()
+            records = [i for i, line in enumerate(lines) if not line.startswith('!')]
+            changed = lines[:]
+            for i, j in zip(records[:3], records[-3:]):
+                a, b = changed[i].split('\t'), changed[j].split('\t')
+                a[1], b[1] = b[1], a[1]
+                changed[i], changed[j] = '\t'.join(a), '\t'.join(b)
+            new_gaf = output('new.gaf')
+            with open(new_gaf, 'w', encoding='utf-8') as f:
+                f.writelines(changed)
+            partial_gaf = output('partial.gaf')
+            with open(partial_gaf, 'w', encoding='utf-8') as f:
+                f.writelines(lines[:records[0] + 3])
+
+            synthetic_db(paths, **ontologies).regenerate_file(output('previous.txt'))
+            synthetic_db(paths, new_gaf, **ontologies).regenerate_file(output('full.txt'))
+            synthetic_db(paths, new_gaf, direct_only=True, **ontologies).regenerate_file(output('direct.txt'))
+            self.assertTrue(os.path.exists(output('previous.txt') + BUILD_SETTINGS_SUFFIX))
+
+            delta = synthetic_db(paths, new_gaf, **ontologies)
+            with self.assertLogs(level='INFO') as logs:
+                delta.regenerate_file(output('delta.txt'), output('previous.txt'), paths['gaf'], paths['phaf'], verify=True)
+            self.assertTrue(any('rows copied' in line and '0 rows copied' not in line for line in logs.output))
+            self.assertEqual(read_bytes(output('delta.txt')), read_bytes(output('full.txt')))
+            # The metadata of the new terms was taken from the previous output
+            self.assertIn('previous', delta.term_registry.origin_counts())
+
+            with self.assertLogs(level='WARNING') as logs:
+                synthetic_db(paths, new_gaf, direct_only=True, **ontologies).regenerate_file(
+                    output('fallback.txt'), output('previous.txt'), paths['gaf'], paths['phaf'])
+            self.assertIn('Running a full rebuild', logs.output[0])
+            self.assertEqual(read_bytes(output('fallback.txt')), read_bytes(output('direct.txt')))
+
+            with self.assertRaisesRegex(ValueError, 'was not built from'):
+                synthetic_db(paths, new_gaf, **ontologies).regenerate_file(
+                    output('wrong.txt'), output('previous.txt'), partial_gaf, paths['phaf'])
+
+    def test_unresolved_term(self):
+        """A term whose metadata cannot be resolved still gets a value in every header row."""
+        config = SyntheticConfig(genes=10, go_terms=10, fypo_terms=10, go_columns=10, fypo_columns=10, domain_columns=3)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = generate(directory, config)
+            with open(paths['gaf'], encoding='utf-8') as f:
+                lines = f.readlines()
+            fields = next(line for line in lines if not line.startswith('!')).split('\t')
+            fields[4] = 'GO:9999999'
+            gaf = os.path.join(directory, 'unknown.gaf')
+            with open(gaf, 'w', encoding='utf-8') as f:
+                f.writelines(lines + ['\t'.join(fields)])
+
+            # The EBI API is sent to a closed port, so the lookup fails at once
+            session = SessionProvider(retries=0, url_rewrites={'https://www.ebi.ac.uk': 'http://127.0.0.1:9'})
+            db = synthetic_db(paths, gaf, direct_only=True, session=session)
+            output = os.path.join(directory, 'AnGeLiDatabase.txt')
+            db.regenerate_file(output)
+            with open(output, encoding='utf-8', newline='') as f:
+                rows = list(csv.reader(f, delimiter='\t'))
+            schema = ColumnSchema.from_file(output)
+
+        self.assertEqual({len(row) for row in rows}, {len(rows[0])})
+        column = schema.column('GO:9999999')
+        self.assertEqual((column.name, column.source), ('', 'GO'))
+        self.assertEqual(schema.width(schema.go), 11)
+
+    def test_failed_run_report(self):
+        """A run that cannot parse the original file still writes its run report."""
+        with tempfile.TemporaryDirectory() as directory:
+            # 10 gene feature columns where the reference header describes 49
+            paths = generate(directory, SyntheticConfig(genes=5, go_terms=5, fypo_terms=5, go_columns=5, fypo_columns=5,
+                                                        domain_columns=2, feature_columns=10))
+            report = os.path.join(directory, 'report.json')
+            script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'angeli.py')
+            subprocess.run([sys.executable, script, '--path', paths['master'], '--run_report', report],
+                           cwd=directory, check=True)
+            with open(report, encoding='utf-8') as f:
+                run = json.load(f)
+
+        self.assertEqual(run['status'], 'failed')
+        self.assertIn('parse_original', run['stages'])
+        self.assertIsNone(run['term_metadata_origins'])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+def annotation_sets(pairs) -> dict:
+    """
+    :param pairs: (gene id, term id) annotation pairs.
+    :return: gene id -> frozenset of the gene's term ids.
+    """
+    terms = defaultdict(set)
+    for gene_id, term_id in pairs:
+        terms[gene_id].add(term_id)
+    return {gene_id: frozenset(gene_terms) for gene_id, gene_terms in terms.items()}
+
+
+@dataclass
+class AnnotationDelta:
+    """
+    The changes between two annotation snapshots of one ontology (a GAF or a PHAF release).
+
+    The matrix columns are the sorted term ids, so the columns only move when
+    terms are added or removed. A gene row only changes when the gene's set of
+    terms changes, or when the columns move.
+    """
+    old_terms: list
+    new_terms: list
+    added_terms: set
+    removed_terms: set
+    changed_genes: set
+
+    @classmethod
+    def from_pairs(cls, old_pairs, new_pairs) -> "AnnotationDelta":
+        """
+        :param old_pairs: The (gene id, term id) pairs of the previous snapshot.
+        :param new_pairs: The (gene id, term id) pairs of the new snapshot.
+        """
+        old_sets = annotation_sets(old_pairs)
+        new_sets = annotation_sets(new_pairs)
+        old_terms = set().union(*old_sets.values())
+        new_terms = set().union(*new_sets.values())
+        changed_genes = {gene_id for gene_id in old_sets.keys() | new_sets.keys()
+                         if old_sets.get(gene_id) != new_sets.get(gene_id)}
+
+        return cls(
+            old_terms=sorted(old_terms),
+            new_terms=sorted(new_terms),
+            added_terms=new_terms - old_terms,
+            removed_terms=old_terms - new_terms,
+            changed_genes=changed_genes)
+
+    @property
+    def columns_changed(self) -> bool:
+        return bool(self.added_terms or self.removed_terms)
+
+    def summary(self) -> str:
+        return (f"{len(self.added_terms)} terms added, {len(self.removed_terms)} removed, "
+                f"{len(self.changed_genes)} genes changed")
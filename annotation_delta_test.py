@@ -0,0 +1,40 @@
+import unittest
+from annotation_delta import AnnotationDelta, annotation_sets
+
+OLD_PAIRS = [
+    ('SPAC1F8.01', 'GO:0005634'),
+    ('SPAC1F8.01', 'GO:0005737'),
+    ('SPAC31A2.12', 'GO:0005634'),
+    ('SPAC22F3.10c', 'GO:0006281'),
+]
+
+class TestAnnotationDelta(unittest.TestCase):
+
+    def test_annotation_sets(self):
+        sets = annotation_sets(OLD_PAIRS + [('SPAC1F8.01', 'GO:0005634')])
+        self.assertEqual(sets['SPAC1F8.01'], frozenset({'GO:0005634', 'GO:0005737'}))
+
+    def test_unchanged(self):
+        """The order of the annotations does not matter."""
+        delta = AnnotationDelta.from_pairs(OLD_PAIRS, list(reversed(OLD_PAIRS)))
+        self.assertFalse(delta.columns_changed)
+        self.assertEqual(delta.changed_genes, set())
+        self.assertEqual(delta.old_terms, ['GO:0005634', 'GO:0005737', 'GO:0006281'])
+
+    def test_changed_genes(self):
+        new_pairs = OLD_PAIRS[1:] + [('SPAC31A2.12', 'GO:0005737'), ('SPAC1687.21', 'GO:0005634')]
+        delta = AnnotationDelta.from_pairs(OLD_PAIRS, new_pairs)
+        self.assertFalse(delta.columns_changed)
+        self.assertEqual(delta.changed_genes, {'SPAC1F8.01', 'SPAC31A2.12', 'SPAC1687.21'})
+
+    def test_added_and_removed_terms(self):
+        new_pairs = OLD_PAIRS[:3] + [('SPAC22F3.10c', 'GO:0000785')]
+        delta = AnnotationDelta.from_pairs(OLD_PAIRS, new_pairs)
+        self.assertTrue(delta.columns_changed)
+        self.assertEqual(delta.added_terms, {'GO:0000785'})
+        self.assertEqual(delta.removed_terms, {'GO:0006281'})
+        self.assertEqual(delta.new_terms, ['GO:0000785', 'GO:0005634', 'GO:0005737'])
+        self.assertEqual(delta.changed_genes, {'SPAC22F3.10c'})
+
+if __name__ == '__main__':
+    unittest.main()
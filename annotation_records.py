@@ -0,0 +1,68 @@
+import sys
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+
+# The columns of a GAF 2.2 line, in file order
+GAF_COLUMNS = (
+    'DB', 'DB_Object_ID', 'DB_Object_Symbol', 'Qualifier', 'GO_ID', 'DB_Reference',
+    'Evidence_Code', 'With_From', 'Aspect', 'DB_Object_Name', 'DB_Object_Synonym',
+    'DB_Object_Type', 'Taxon', 'Date', 'Assigned_By', 'Annotation_Extension',
+    'Gene_Product_Form_ID'
+)
+
+# The columns of a PomBase PHAF line, in file order
+PHAF_COLUMNS = (
+    'DB', 'GENE_ID', 'FYPO_ID', 'ALLELE_DESC', 'EXPRESSION', 'PARENT_STRAIN',
+    'STRAIN_NAME', 'GENOTYPE_DESC', 'GENE_SYMBOL', 'ALLELE_NAME', 'ALLELE_SYNON',
+    'ALLELE_TYPE', 'EVIDENCE', 'CONDITION', 'PENETRANCE', 'SEVERITY', 'EXTENSION',
+    'REFERENCE', 'TAXON', 'DATE', 'PLOIDY'
+)
+
+
+@lru_cache(maxsize=None)
+def record_type(name: str, fields: tuple):
+    """
+    Returns a compact record class holding only `fields`.
+
+    The records are namedtuples, so they take a fraction of the memory of a
+    dict per line, and they also accept the dict-style access used by the
+    matrix builders (record['GO_ID']).
+    """
+    base = namedtuple(name, fields)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    return type(name, (base,), {'__slots__': (), '__getitem__': __getitem__})
+
+
+def projector(name: str, columns: tuple, fields):
+    """
+    Builds a generator function that turns split file rows into records of the requested fields.
+    Values are interned, so the gene and term ids repeated on many lines are stored once.
+
+    :param name: The record class name, e.g. 'GafRecord'.
+    :param columns: All the columns of the file format, e.g. GAF_COLUMNS.
+    :param fields: The fields to keep, in the order they should appear in the record.
+    :return: A function rows -> iterator of records.
+    """
+    fields = tuple(fields)
+    unknown = [field for field in fields if field not in columns]
+    if unknown:
+        raise ValueError(f"Unknown {name} fields: {unknown}")
+
+    cls = record_type(name, fields)
+    indexes = [columns.index(field) for field in fields]
+    get = itemgetter(*indexes) if len(indexes) > 1 else lambda row: (row[indexes[0]],)
+    intern = sys.intern
+    new = tuple.__new__
+
+    def project(rows):
+        # tuple.__new__ skips the Python-level namedtuple._make wrapper on the hot path
+        for row in rows:
+            yield new(cls, map(intern, get(row)))
+
+    return project
@@ -0,0 +1,23 @@
+import unittest
+from annotation_records import GAF_COLUMNS, projector
+
+ROW = ['PomBase', 'SPAC6G10.12c', 'ace2', '', 'GO:0000978', 'PMID:40015273', 'HDA', '', 'F',
+       '', '', 'protein', 'taxon:4896', '20250225', 'PomBase', '', '']
+
+class TestAnnotationRecords(unittest.TestCase):
+
+    def test_projection(self):
+        """Projected records keep only the requested fields and support attribute and key access."""
+        project = projector('GafRecord', GAF_COLUMNS, ('DB_Object_ID', 'GO_ID'))
+        record = next(project([ROW]))
+        self.assertEqual(tuple(record), ('SPAC6G10.12c', 'GO:0000978'))
+        self.assertEqual(record.GO_ID, 'GO:0000978')
+        self.assertEqual(record['DB_Object_ID'], 'SPAC6G10.12c')
+        self.assertEqual(record[1], 'GO:0000978')
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            projector('GafRecord', GAF_COLUMNS, ('FYPO_ID',))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import argparse
+import csv
+import gzip
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from enrichment import EnrichmentIndex
+
+logger = logging.getLogger(__name__)
+
+# The columns of the batch output, one row per (gene list, enriched column)
+RESULT_COLUMNS = ('list', 'column', 'name', 'group', 'overlap', 'column_size', 'list_size',
+                  'background_size', 'p_value', 'p_bonferroni', 'p_bh')
+
+# The index loaded once by each worker process
+_worker_index = None
+
+
+def _open_text(path: str, mode: str):
+    # Output paths ending in .gz are written gzip-compressed
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def read_gene_lists(path: str) -> list[tuple[str, list[str]]]:
+    """
+    Reads gene lists, one per line: the list name followed by its genes, tab-separated.
+    Blank lines and lines starting with # are skipped.
+
+    :param path: The gene list file, optionally gzip-compressed.
+    :return: A list of (list name, genes).
+    """
+    gene_lists = []
+    with _open_text(path, 'r') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('#'):
+                continue
+            name, *genes = line.split('\t')
+            gene_lists.append((name, [gene for gene in genes if gene]))
+    return gene_lists
+
+
+def read_genes(path: str) -> list[str]:
+    """
+    Reads a background gene list, one gene per line.
+    """
+    with _open_text(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _result_rows(name, results) -> list[tuple]:
+    return [(name, result.column, result.name, result.group, result.overlap, result.column_size,
+             result.list_size, result.background_size, result.p_value, result.p_bonferroni, result.p_bh)
+            for result in results]
+
+
+def _init_worker(packed_path: str):
+    global _worker_index
+    _worker_index = EnrichmentIndex.load(packed_path)
+
+
+def _enrich_chunk(gene_lists, background, groups, max_p) -> list[tuple]:
+    rows = []
+    for name, results in _worker_index.enrich_many(gene_lists, background=background, groups=groups, max_p=max_p):
+        rows.extend(_result_rows(name, results))
+    return rows
+
+
+def run_batch(packed_path: str, gene_lists, output_path: str, background=None, groups=None, max_p: float = 1.0,
+              workers: int = 1, chunk_size: int = 100) -> int:
+    """
+    Tests many gene lists against a packed database and streams the results to a TSV file.
+
+    The database is loaded once, or once per worker process. With more than one
+    worker the lists are split into chunks of chunk_size lists, and the results
+    are written in the order of the lists as the chunks complete.
+
+    :param packed_path: The packed database file (see packed_database.py).
+    :param gene_lists: A list of (list name, genes).
+    :param output_path: The TSV output file, gzip-compressed if the name ends with .gz.
+    :param background: Optional background gene list shared by every list.
+    :param groups: Optional column groups to test.
+    :param max_p: Only write the columns with a p-value up to max_p.
+    :param workers: The number of worker processes, 1 runs in this process.
+    :param chunk_size: The number of lists sent to a worker at a time.
+    :return: The number of result rows written.
+    """
+    written = 0
+    with _open_text(output_path, 'w') as f:
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(RESULT_COLUMNS)
+
+        if workers <= 1:
+            index = EnrichmentIndex.load(packed_path)
+            for name, results in index.enrich_many(gene_lists, background=background, groups=groups, max_p=max_p):
+                rows = _result_rows(name, results)
+                writer.writerows(rows)
+                written += len(rows)
+        else:
+            chunks = [gene_lists[i:i + chunk_size] for i in range(0, len(gene_lists), chunk_size)]
+            enrich_chunk = partial(_enrich_chunk, background=background, groups=groups, max_p=max_p)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(packed_path,)) as executor:
+                # map() yields in submission order, which keeps the output deterministic
+                for rows in executor.map(enrich_chunk, chunks):
+                    writer.writerows(rows)
+                    written += len(rows)
+
+    logger.info(f"Tested {len(gene_lists)} gene lists, wrote {written} results to {output_path}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gene-list enrichment for many lists against a packed AnGeLi database")
+    parser.add_argument("database", type=str, help="Packed database file (see packed_database.py)")
+    parser.add_argument("gene_lists", type=str, help="Gene lists, one per line: name<TAB>gene<TAB>gene...")
+    parser.add_argument("output_file", type=str, help="Output TSV file, gzip-compressed if it ends with .gz")
+    parser.add_argument("--background", type=str, default=None, help="Background genes, one per line")
+    parser.add_argument("--group", action="append", default=None, help="Column group to test, can be repeated")
+    parser.add_argument("--max_p", type=float, default=0.05, help="Only write the columns with a p-value up to this")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--chunk_size", type=int, default=100, help="Number of lists sent to a worker at a time")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    background = read_genes(args.background) if args.background else None
+    groups = set(args.group) if args.group else None
+    run_batch(args.database, read_gene_lists(args.gene_lists), args.output_file, background=background,
+              groups=groups, max_p=args.max_p, workers=args.workers, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
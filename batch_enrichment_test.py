@@ -0,0 +1,90 @@
+import csv
+import gzip
+import os
+import tempfile
+import unittest
+from batch_enrichment import RESULT_COLUMNS, read_gene_lists, run_batch
+from enrichment import EnrichmentIndex
+from packed_database import write_packed_database
+
+HEADERS = [
+    ['Short name', 'GO:0005634', 'GO:0005737', 'GO:0006281'],
+    ['Long name', 'nucleus', 'cytoplasm', 'DNA repair'],
+    ['Scale of measurement', 'Binary', 'Binary', 'Binary'],
+    ['Group', 'GO Cellular Component', 'GO Cellular Component', 'GO Biological Process'],
+    ['Source', 'GO', 'GO', 'GO'],
+    ['Author', 'Terms with >1 annotation', 'Terms with >1 annotation', 'Terms with >1 annotation'],
+    ['Update', '16-10-2026', '16-10-2026', '16-10-2026'],
+    ['Link', 'http://www.ebi.ac.uk', 'http://www.ebi.ac.uk', 'http://www.ebi.ac.uk'],
+]
+
+GENES = ['SPAC1F8.01', 'SPAC31A2.12', 'SPAC22F3.10c', 'SPAC1687.21', 'SPAC222.06', 'SPAC56F8.03',
+         'SPAC56F8.11', 'SPAC17A5.14', 'SPAC9G1.12', 'SPAC688.11']
+
+ROWS = [[gene, '1' if r < 4 else '0', '0' if r < 4 else '1', '1' if r in (0, 5) else '0']
+        for r, gene in enumerate(GENES)]
+
+GENE_LISTS = """# name<TAB>genes
+nuclear\tSPAC1F8.01\tSPAC31A2.12\tSPAC22F3.10c\tSPXXX.01
+
+mixed\tSPAC1F8.01\tSPAC56F8.03\tSPAC9G1.12\t
+empty
+"""
+
+class TestBatchEnrichment(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        tsv_path = os.path.join(self.directory.name, 'AnGeLiDatabase.txt')
+        self.packed_path = os.path.join(self.directory.name, 'AnGeLiDatabase.angeli')
+        self.lists_path = os.path.join(self.directory.name, 'lists.txt')
+        with open(tsv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerows(HEADERS)
+            writer.writerows(ROWS)
+        write_packed_database(tsv_path, self.packed_path)
+        with open(self.lists_path, 'w', encoding='utf-8') as f:
+            f.write(GENE_LISTS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_gene_lists(self):
+        self.assertEqual(read_gene_lists(self.lists_path), [
+            ('nuclear', ['SPAC1F8.01', 'SPAC31A2.12', 'SPAC22F3.10c', 'SPXXX.01']),
+            ('mixed', ['SPAC1F8.01', 'SPAC56F8.03', 'SPAC9G1.12']),
+            ('empty', [])])
+
+    def test_enrich_many(self):
+        """Batch results are the same as testing each list on its own."""
+        index = EnrichmentIndex.load(self.packed_path)
+        gene_lists = read_gene_lists(self.lists_path) + [('nuclear again', GENES[:3])]
+        for background in (None, GENES[:6]):
+            expected = [(name, index.enrich(genes, background=background)) for name, genes in gene_lists]
+            self.assertEqual(list(index.enrich_many(gene_lists, background=background)), expected)
+
+    def test_run_batch(self):
+        output_path = os.path.join(self.directory.name, 'results.tsv.gz')
+        written = run_batch(self.packed_path, read_gene_lists(self.lists_path), output_path, max_p=0.5)
+
+        with gzip.open(output_path, 'rt', encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f, delimiter='\t'))
+        self.assertEqual(rows[0], list(RESULT_COLUMNS))
+        self.assertEqual(len(rows), written + 1)
+        self.assertEqual(rows[1][:7], ['nuclear', 'GO:0005634', 'nucleus', 'GO Cellular Component', '3', '4', '3'])
+        self.assertTrue(all(float(row[8]) <= 0.5 for row in rows[1:]))
+
+    def test_run_batch_workers(self):
+        """The worker processes write the same file as a single process, chunks in list order."""
+        gene_lists = read_gene_lists(self.lists_path) + [(f'list {i}', GENES[i:i + 4]) for i in range(7)]
+        outputs = []
+        for workers in (1, 2):
+            output_path = os.path.join(self.directory.name, f'results_{workers}.tsv')
+            run_batch(self.packed_path, gene_lists, output_path, background=GENES[:8], workers=workers, chunk_size=3)
+            with open(output_path, 'rb') as f:
+                outputs.append(f.read())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertGreater(outputs[0].count(b'\n'), len(gene_lists))
+
+if __name__ == '__main__':
+    unittest.main()
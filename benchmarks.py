@@ -0,0 +1,325 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime
+
+from OrderedMatrix import OrderedMatrix
+from PackedMatrix import PackedMatrix
+from angeli import FYPO_ANNOTATION_FIELDS, GO_ANNOTATION_FIELDS, POMBASE_LATEST_URL, AnGeLi
+from column_schema import ColumnSchema
+from database_reader import AnGeLiDatabaseReader
+from fypo_data import FYPOData
+from go_data import GOData
+from http_session import SessionProvider
+from pombase_standin import FaultProfile, PomBaseStandIn
+from synthetic_data import SyntheticConfig, config_arguments, config_from_arguments, generate
+from term_registry import TermRegistry
+
+logger = logging.getLogger(__name__)
+
+# 2: parse_tsv reads the master file instead of the peptide statistics
+BENCHMARK_FORMAT_VERSION = 2
+
+# The number of GO and FYPO terms fetched from the stand-in APIs by resolve_terms_network
+NETWORK_TERMS = 200
+
+
+class Benchmark:
+    """
+    A named measurement: setup() builds fresh inputs outside the timing, run(inputs) is timed.
+    """
+
+    def __init__(self, name: str, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+
+def measure(benchmark: Benchmark, repeat: int, memory: bool = True) -> dict:
+    """
+    Times a benchmark `repeat` times, then runs it once more under tracemalloc for the peak
+    memory, so the tracing overhead does not count in the timings.
+
+    :param memory: Whether to measure the peak memory. Tracing every allocation makes the run
+                   much slower, up to 40x for regenerate_file which allocates a string per cell.
+    :return: The fastest and median seconds, and the peak bytes (None without memory).
+    """
+    times = []
+    for _ in range(repeat):
+        inputs = benchmark.setup()
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run(inputs)
+        times.append(time.perf_counter() - start)
+        del inputs
+
+    peak = None
+    if memory:
+        inputs = benchmark.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            benchmark.run(inputs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {"seconds_min": min(times), "seconds_median": statistics.median(times), "repeat": repeat,
+            "peak_bytes": peak}
+
+
+def _offline_angeli(**kwargs) -> AnGeLi:
+    # No retries, so a request that slips through fails at once instead of waiting on backoff
+    return AnGeLi(session=SessionProvider(retries=0), **kwargs)
+
+
+def _read_gaf(db: AnGeLi, path: str, fields=GO_ANNOTATION_FIELDS):
+    with open(path, encoding="utf-8", newline="") as f:
+        return db._parse_gaf(f, fields)
+
+
+def _read_phaf(db: AnGeLi, path: str, fields=FYPO_ANNOTATION_FIELDS):
+    with open(path, encoding="utf-8", newline="") as f:
+        return db._parse_phaf(f, fields)
+
+
+def _read_master_projected(path: str) -> int:
+    """
+    Streams the gene rows of a master file projected to the columns a rebuild carries over,
+    the parse_original_AnGeLiDatabase(projected=True) path.
+    """
+    schema = ColumnSchema.from_file(path)
+    rows = 0
+    with AnGeLiDatabaseReader(path) as reader:
+        for _ in reader.iter_rows(schema.row_projection()):
+            rows += 1
+    return rows
+
+
+def benchmarks(paths: dict, directory: str, url_rewrites: dict = None) -> list[Benchmark]:
+    """
+    The benchmarks over a generated data set (see synthetic_data.generate).
+
+    :param url_rewrites: Sends the PomBase and EBI requests of the network benchmarks to a stand-in
+                         server (see pombase_standin.py), the network benchmarks are left out without it.
+    """
+    db = _offline_angeli()
+    go_terms = _read_gaf(db, paths["gaf"])
+    fypo_terms = _read_phaf(db, paths["phaf"])
+    gene_terms = {}
+    for record in go_terms:
+        gene_terms.setdefault(record["DB_Object_ID"], set()).add(record["GO_ID"])
+    header = sorted({term for terms in gene_terms.values() for term in terms})
+
+    def annotated(direct_only):
+        def setup():
+            instance = _offline_angeli(direct_only=direct_only, go_obo_path=paths["go_obo"],
+                                       fypo_obo_path=paths["fypo_obo"])
+            instance.go_terms = go_terms
+            instance.fypo_terms = fypo_terms
+            if not direct_only:
+                # The ontology files are parsed outside the timing, the closure itself is timed
+                instance._load_obo(paths["go_obo"])
+                instance._load_obo(paths["fypo_obo"])
+            return instance
+        return setup
+
+    def filled(matrix_class):
+        def setup():
+            matrix = matrix_class()
+            matrix.set_header(header)
+            for gene, terms in gene_terms.items():
+                matrix.insert_row(gene, terms)
+            return matrix
+        return setup
+
+    def empty(matrix_class):
+        def setup():
+            matrix = matrix_class()
+            matrix.set_header(header)
+            return matrix
+        return setup
+
+    def insert_rows(matrix):
+        for gene, terms in gene_terms.items():
+            matrix.insert_row(gene, terms)
+
+    def get_rows(matrix):
+        for gene in gene_terms:
+            matrix.get_row(gene)
+
+    def regenerate(instance):
+        instance.parse_original_AnGeLiDatabase(paths["master"])
+        instance.regenerate_file(os.path.join(directory, "AnGeLiDatabase.txt"))
+
+    def online():
+        return AnGeLi(session=SessionProvider(url_rewrites=url_rewrites))
+
+    def download_annotations(instance):
+        release_links = instance._get_links(POMBASE_LATEST_URL)
+        instance.find_go_terms(release_links)
+        instance.find_fypo_terms(release_links)
+
+    network_terms = ((header[:NETWORK_TERMS], GOData),
+                     (sorted({record["FYPO_ID"] for record in fypo_terms})[:NETWORK_TERMS], FYPOData))
+
+    def resolve_terms(instance):
+        for term_ids, term_class in network_terms:
+            instance.resolve_new_terms(TermRegistry(), term_ids, {}, term_class.from_api,
+                                       term_class._EBI_API_URL_TEMPLATE)
+
+    network = [
+        Benchmark("download_annotations_network", download_annotations, online),
+        Benchmark("resolve_terms_network", resolve_terms, online),
+    ] if url_rewrites else []
+
+    return network + [
+        # The whole master file, the parse_original_AnGeLiDatabase(projected=False) path
+        Benchmark("parse_tsv", lambda _: db._parse_tsv(paths["master"])),
+        Benchmark("parse_master_projected", lambda _: _read_master_projected(paths["master"])),
+        Benchmark("parse_gaf", lambda _: _read_gaf(db, paths["gaf"])),
+        Benchmark("parse_gaf_all_fields", lambda _: _read_gaf(db, paths["gaf"], None)),
+        Benchmark("parse_phaf", lambda _: _read_phaf(db, paths["phaf"])),
+        Benchmark("parse_phaf_all_fields", lambda _: _read_phaf(db, paths["phaf"], None)),
+        Benchmark("build_GO_matrix", lambda instance: instance.build_GO_matrix(), annotated(True)),
+        Benchmark("build_GO_matrix_propagated", lambda instance: instance.build_GO_matrix(), annotated(False)),
+        Benchmark("build_FYPO_matrix", lambda instance: instance.build_FYPO_matrix(), annotated(True)),
+        Benchmark("build_FYPO_matrix_propagated", lambda instance: instance.build_FYPO_matrix(), annotated(False)),
+        Benchmark("OrderedMatrix.insert_row", insert_rows, empty(OrderedMatrix)),
+        Benchmark("OrderedMatrix.get_row", get_rows, filled(OrderedMatrix)),
+        Benchmark("PackedMatrix.insert_row", insert_rows, empty(PackedMatrix)),
+        Benchmark("PackedMatrix.get_row", get_rows, filled(PackedMatrix)),
+        Benchmark("regenerate_file", regenerate, annotated(True)),
+        Benchmark("regenerate_file_propagated", regenerate, annotated(False)),
+    ]
+
+
+def _git_commit() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmarks(config: SyntheticConfig, repeat: int = 3, only=None, directory: str = None,
+                   memory: bool = True, network: FaultProfile = None) -> dict:
+    """
+    Generates a data set and runs the benchmarks on it.
+
+    :param config: The scale of the generated data.
+    :param repeat: The number of timed runs per benchmark.
+    :param only: Optional benchmark names to run.
+    :param directory: Where to generate the data, a temporary directory by default.
+    :param memory: Whether to measure the peak memory of each benchmark.
+    :param network: The conditions of the stand-in server used by the network benchmarks.
+    :return: The JSON report: environment, config and one entry per benchmark.
+    """
+    network = network or FaultProfile()
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = directory or temporary
+        start = time.perf_counter()
+        paths = generate(directory, config)
+        generation = time.perf_counter() - start
+
+        standin = PomBaseStandIn.from_synthetic(("127.0.0.1", 0), paths, faults=network)
+        threading.Thread(target=standin.serve_forever, daemon=True).start()
+        results = {}
+        try:
+            for benchmark in benchmarks(paths, directory, standin.url_rewrites()):
+                if only and benchmark.name not in only:
+                    continue
+                logger.info(f"Running {benchmark.name}")
+                results[benchmark.name] = measure(benchmark, repeat, memory)
+                logger.info(f"{benchmark.name}: {results[benchmark.name]}")
+        finally:
+            standin.shutdown()
+            standin.server_close()
+
+    return {
+        "version": BENCHMARK_FORMAT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": asdict(config),
+        "network": asdict(network),
+        "generation_seconds": generation,
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.2) -> list[tuple]:
+    """
+    :return: (name, baseline seconds, current seconds, ratio, regressed) for the benchmarks in both
+             reports, comparing the fastest runs. A benchmark regressed when it is more than
+             `tolerance` slower.
+    """
+    if baseline.get("version") != current.get("version"):
+        logger.warning("The reports have different formats, some benchmarks may measure different things.")
+    if baseline.get("config") != current.get("config"):
+        logger.warning("The reports were run at different scales, the timings are not comparable.")
+    if baseline.get("network") != current.get("network"):
+        logger.warning("The reports were run under different network conditions, the network timings are not comparable.")
+    rows = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratio = result["seconds_min"] / previous["seconds_min"] if previous["seconds_min"] else float("inf")
+        rows.append((name, previous["seconds_min"], result["seconds_min"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the AnGeLi regeneration on synthetic data")
+    parser.add_argument("--output", type=str, default="benchmark.json", help="JSON report to write")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--only", action="append", default=None, help="Benchmark to run, can be repeated")
+    parser.add_argument("--data_directory", type=str, default=None, help="Keep the generated data in this directory")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown over the baseline counted as a regression")
+    parser.add_argument("--no_memory", action="store_true", help="Skip the slow peak memory measurement")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each stand-in server response")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second of each stand-in server response")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of stand-in server requests failing with a 503")
+    config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+    report = run_benchmarks(config_from_arguments(args), repeat=args.repeat, only=args.only,
+                            directory=args.data_directory, memory=not args.no_memory,
+                            network=FaultProfile(latency=args.latency, bandwidth=args.bandwidth, error_rate=args.error_rate))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["results"].items():
+        peak = "" if result["peak_bytes"] is None else f"{result['peak_bytes'] / 2 ** 20:10.1f} MB"
+        print(f"{name:32s} {result['seconds_min']:10.4f}s {peak}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = 0
+        for name, before, after, ratio, regressed in compare(baseline, report, args.tolerance):
+            regressions += regressed
+            print(f"{name:32s} {before:10.4f}s -> {after:10.4f}s  x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
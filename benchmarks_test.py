@@ -0,0 +1,29 @@
+import unittest
+from benchmarks import compare, run_benchmarks
+from synthetic_data import SyntheticConfig
+
+SMALL = SyntheticConfig(genes=20, go_terms=40, fypo_terms=30, go_columns=50, fypo_columns=40, domain_columns=5)
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_report(self):
+        report = run_benchmarks(SMALL, repeat=2, only=['parse_gaf', 'build_GO_matrix_propagated'])
+        self.assertEqual(sorted(report['results']), ['build_GO_matrix_propagated', 'parse_gaf'])
+        result = report['results']['parse_gaf']
+        self.assertEqual(result['repeat'], 2)
+        self.assertLessEqual(result['seconds_min'], result['seconds_median'])
+        self.assertGreater(result['peak_bytes'], 0)
+        self.assertEqual(report['config']['genes'], 20)
+
+        report = run_benchmarks(SMALL, repeat=1, only=['parse_phaf', 'parse_tsv', 'parse_master_projected'], memory=False)
+        self.assertIsNone(report['results']['parse_phaf']['peak_bytes'])
+        self.assertIn('parse_master_projected', report['results'])
+
+    def test_compare(self):
+        baseline = {'config': {}, 'results': {'a': {'seconds_min': 1.0}, 'b': {'seconds_min': 1.0}}}
+        current = {'config': {}, 'results': {'a': {'seconds_min': 1.1}, 'b': {'seconds_min': 1.5}, 'c': {'seconds_min': 1.0}}}
+        rows = compare(baseline, current, tolerance=0.2)
+        self.assertEqual([(name, regressed) for name, _, _, _, regressed in rows], [('a', False), ('b', True)])
+
+if __name__ == '__main__':
+    unittest.main()
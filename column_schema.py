@@ -0,0 +1,113 @@
+import logging
+from dataclasses import dataclass
+
+from database_reader import HEADER_ROW_COUNT, AnGeLiDatabaseReader
+
+logger = logging.getLogger(__name__)
+
+# The Source (header row 4) of the GO and FYPO term columns
+GO_SOURCE = "GO"
+FYPO_SOURCE = "FYPO"
+
+
+class ColumnSchemaError(ValueError):
+    """
+    The header rows do not have the layout of an AnGeLi database.
+    """
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    One column of an AnGeLi database, described by the 8 header rows.
+    """
+    position: int
+    column_id: str
+    name: str
+    scale: str
+    group: str
+    source: str
+    author: str
+    update: str
+    link: str
+
+
+class ColumnSchema:
+    """
+    The column layout of an AnGeLi database, derived from its header rows:
+
+        static      The gene id and the gene feature columns.
+        go          The GO term columns (Source GO).
+        references  The ortholog reference columns between the GO and FYPO terms.
+        fypo        The FYPO term columns (Source FYPO).
+        features    The protein domain, localisation, expression... columns after the FYPO terms.
+
+    Each block is a slice of the row, so a block of a header or gene row is row[schema.go].
+    The GO and FYPO blocks must be contiguous, a column out of place raises a ColumnSchemaError
+    when the file is opened instead of misaligning the regenerated rows.
+    """
+
+    def __init__(self, header_rows: list[list[str]]):
+        if len(header_rows) != HEADER_ROW_COUNT:
+            raise ColumnSchemaError(f"Expected {HEADER_ROW_COUNT} header rows, found {len(header_rows)}.")
+        lengths = [len(row) for row in header_rows]
+        if len(set(lengths)) != 1:
+            raise ColumnSchemaError(f"The header rows have different lengths: {lengths}.")
+
+        self.columns = [Column(position, *values) for position, values in enumerate(zip(*header_rows))]
+        self.positions = {}
+        for column in self.columns:
+            if self.positions.setdefault(column.column_id, column.position) != column.position:
+                logger.warning(f"Column {column.column_id} is repeated at {column.position}, using the first one.")
+
+        self.go = self._block(GO_SOURCE)
+        self.fypo = self._block(FYPO_SOURCE)
+        if self.fypo.start <= self.go.start:
+            raise ColumnSchemaError("The FYPO columns come before the GO columns.")
+        if self.go.start == 0:
+            raise ColumnSchemaError("The first column must be the gene id, not a GO term.")
+        if self.fypo.start == self.go.stop:
+            raise ColumnSchemaError("There are no ortholog reference columns between the GO and FYPO columns.")
+        self.static = slice(0, self.go.start)
+        self.references = slice(self.go.stop, self.fypo.start)
+        self.features = slice(self.fypo.stop, len(self.columns))
+
+    @classmethod
+    def from_file(cls, path: str) -> "ColumnSchema":
+        with AnGeLiDatabaseReader(path) as reader:
+            return cls(reader.header_rows())
+
+    def _block(self, source: str) -> slice:
+        positions = [column.position for column in self.columns if column.source == source]
+        if not positions:
+            raise ColumnSchemaError(f"The header has no {source} columns.")
+        start, stop = positions[0], positions[-1] + 1
+        if stop - start != len(positions):
+            stray = next(column for column in self.columns[start:stop] if column.source != source)
+            raise ColumnSchemaError(f"The {source} columns are not contiguous: column {stray.position} "
+                                    f"({stray.column_id}, source {stray.source}) is between them.")
+        return slice(start, stop)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def position(self, column_id: str) -> int:
+        """
+        :raises KeyError: For an unknown column.
+        """
+        return self.positions[column_id]
+
+    def column(self, column_id: str) -> Column:
+        return self.columns[self.positions[column_id]]
+
+    @staticmethod
+    def width(block: slice) -> int:
+        return block.stop - block.start
+
+    def row_projection(self) -> tuple:
+        """
+        :return: The column ranges of the gene rows carried over to a regenerated file (the static,
+                 reference and feature blocks), for AnGeLiDatabaseReader.iter_rows.
+        """
+        return ((self.static.start, self.static.stop), (self.references.start, self.references.stop),
+                (self.features.start, None))
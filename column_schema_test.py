@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from column_schema import ColumnSchema, ColumnSchemaError
+from synthetic_data import SyntheticConfig, _master_columns, write_master
+
+SMALL = SyntheticConfig(genes=5, go_columns=6, reference_columns=2, fypo_columns=4, domain_columns=3)
+
+def header_rows(config):
+    return [list(row) for row in zip(*_master_columns(config))]
+
+class TestColumnSchema(unittest.TestCase):
+
+    def test_blocks(self):
+        schema = ColumnSchema(header_rows(SMALL))
+        self.assertEqual(len(schema), SMALL.columns)
+        self.assertEqual(schema.static, slice(0, 49))
+        self.assertEqual(schema.go, slice(49, 55))
+        self.assertEqual(schema.references, slice(55, 57))
+        self.assertEqual(schema.fypo, slice(57, 61))
+        self.assertEqual(schema.features, slice(61, 64))
+        self.assertEqual(schema.row_projection(), ((0, 49), (55, 57), (61, None)))
+        self.assertEqual(schema.position('FYPO:0000004'), 60)
+        self.assertEqual(schema.column('GO:0000001').group, 'GO Biological Process')
+
+    def test_from_file(self):
+        handle, path = tempfile.mkstemp(suffix='.txt')
+        os.close(handle)
+        try:
+            write_master(path, SMALL)
+            self.assertEqual(ColumnSchema.from_file(path).fypo, slice(57, 61))
+        finally:
+            os.remove(path)
+
+    def test_bad_layouts(self):
+        rows = header_rows(SMALL)
+        rows[4][52] = 'Pombase'
+        with self.assertRaisesRegex(ColumnSchemaError, 'GO columns are not contiguous: column 52'):
+            ColumnSchema(rows)
+
+        rows = header_rows(SMALL)
+        rows[7].pop()
+        with self.assertRaisesRegex(ColumnSchemaError, 'different lengths'):
+            ColumnSchema(rows)
+
+        with self.assertRaisesRegex(ColumnSchemaError, 'no ortholog reference columns'):
+            ColumnSchema(header_rows(SyntheticConfig(go_columns=3, reference_columns=0, fypo_columns=2, domain_columns=1)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import csv
+import mmap
+from array import array
+
+# The AnGeLiDatabase.txt files start with 8 rows of column metadata
+HEADER_ROW_COUNT = 8
+
+
+def _check_ranges(ranges):
+    position = 0
+    for n, (start, stop) in enumerate(ranges):
+        if start < position or (stop is not None and stop <= start):
+            raise ValueError(f"Column ranges must be sorted and non-overlapping: {ranges}")
+        if stop is None and n != len(ranges) - 1:
+            raise ValueError("Only the last column range can be open ended.")
+        position = stop
+
+
+class _RowProjector:
+    """
+    Cuts the requested column ranges out of raw rows without splitting the columns in between.
+
+    The GO/FYPO columns are single "0"/"1" values, so the byte width of a skipped
+    block is usually the same on every row. The width seen on the previous row is
+    tried first and confirmed by counting the tabs in it, which is done in C and
+    is much cheaper than splitting thousands of columns. Rows where it does not
+    hold fall back to a bounded split.
+    """
+
+    def __init__(self, ranges):
+        _check_ranges(ranges)
+        self.ranges = ranges
+        # Last seen byte width of each skipped block and each captured range
+        self._widths = {}
+
+    def _skip(self, line: bytes, position: int, count: int, key) -> int:
+        """
+        :return: The offset just past the tab ending the `count` columns that start at `position`,
+                 or -1 if the row is too short.
+        """
+        width = self._widths.get(key)
+        if width is not None:
+            end = position + width
+            if line[end - 1:end] == b"\t" and line.count(b"\t", position, end) == count:
+                return end
+
+        parts = line[position:].split(b"\t", count)
+        if len(parts) <= count:
+            return -1
+        end = len(line) - len(parts[-1])
+        self._widths[key] = end - position
+        return end
+
+    def project(self, line: bytes):
+        """
+        :return: The raw tab-separated bytes of each range, or None if the row is too short.
+        """
+        segments = []
+        position = 0
+        column = 0
+        for n, (start, stop) in enumerate(self.ranges):
+            if start > column:
+                position = self._skip(line, position, start - column, ("skip", n))
+                if position < 0:
+                    return None
+
+            if stop is None:
+                segments.append(line[position:])
+                break
+
+            end = self._skip(line, position, stop - start, ("range", n))
+            if end < 0:
+                # The range may run up to the last column of the row, which has no trailing tab
+                if line.count(b"\t", position) != stop - start - 1:
+                    return None
+                end = len(line) + 1
+            segments.append(line[position:end - 1])
+            position = end
+            column = stop
+        return segments
+
+
+class AnGeLiDatabaseReader:
+    """
+    Reads an AnGeLiDatabase.txt file through mmap and a precomputed line-offset index.
+
+    Rows can be read one at a time, and each row can be projected to a set of
+    column ranges. Columns outside the ranges are skipped without being decoded
+    or split, so the ~10k GO/FYPO columns that are rebuilt anyway are never
+    materialized.
+    """
+
+    def __init__(self, path: str, encoding: str = "utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            self._map = b""
+        self._offsets = self._index_lines()
+
+    def _index_lines(self) -> array:
+        """
+        Records the start offset of every line, plus the end of the file.
+        """
+        offsets = array("Q", [0])
+        find = self._map.find
+        size = len(self._map)
+        position = find(b"\n")
+        while position != -1:
+            offsets.append(position + 1)
+            position = find(b"\n", position + 1)
+
+        if offsets[-1] != size:
+            offsets.append(size)
+        return offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def line_terminator(self) -> str:
+        """
+        The line ending of the file, "\\r\\n" as written by csv.writer or "\\n".
+        """
+        end = self._offsets[1] if len(self) else 0
+        return "\r\n" if self._map[max(0, end - 2):end] == b"\r\n" else "\n"
+
+    @property
+    def final_newline(self) -> bool:
+        """
+        True if the last row of the file is terminated by a newline.
+        """
+        return self._map[-1:] == b"\n"
+
+    def _line(self, index: int) -> bytes:
+        return self._map[self._offsets[index]:self._offsets[index + 1]].rstrip(b"\r\n")
+
+    def _split(self, line: bytes) -> list[str]:
+        text = line.decode(self.encoding)
+        if '"' in text:
+            # Quoted fields can contain tabs, leave those lines to the csv module
+            return next(csv.reader([text], delimiter="\t"))
+        return text.split("\t")
+
+    def row(self, index: int) -> list[str]:
+        """
+        :return: Every column of the row at `index` (0 is the first header row).
+        """
+        line = self._line(index)
+        return self._split(line) if line else []
+
+    def header_rows(self) -> list[list[str]]:
+        """
+        :return: The 8 metadata rows at the top of the file, with every column.
+        """
+        return [self.row(i) for i in range(min(HEADER_ROW_COUNT, len(self)))]
+
+    def iter_rows(self, ranges, start: int = HEADER_ROW_COUNT):
+        """
+        Streams the rows from `start`, projected to the given column ranges.
+
+        :param ranges: Sorted, non-overlapping (start, stop) column ranges, stop None means up to the end of the row.
+        :param start: The first row to read, by default the first gene row.
+        :return: A generator of (row index, segments), with one list of columns per range,
+                 or (row index, None) for empty lines.
+        """
+        ranges = [tuple(r) for r in ranges]
+        projector = _RowProjector(ranges)
+        encoding = self.encoding
+        for index in range(start, len(self)):
+            line = self._line(index)
+            if not line:
+                yield index, None
+                continue
+
+            segments = None if b'"' in line else projector.project(line)
+            if segments is None:
+                # Quoted or short rows are split in full, short rows give short segments
+                row = self._split(line)
+                yield index, [row[a:b] for a, b in ranges]
+                continue
+
+            yield index, [segment.decode(encoding).split("\t") for segment in segments]
+
+    def iter_raw_rows(self, ranges, start: int = HEADER_ROW_COUNT):
+        """
+        Streams the undecoded rows from `start`, with the raw bytes of the given column ranges.
+
+        :param ranges: Sorted, non-overlapping (start, stop) column ranges, stop None means up to the end of the row.
+        :param start: The first row to read, by default the first gene row.
+        :return: A generator of (row index, line, segments), where line is the row without its line ending and
+                 segments hold the tab-separated bytes of each range. Segments is None for empty, quoted
+                 or short rows, which should be read with row().
+        """
+        projector = _RowProjector([tuple(r) for r in ranges])
+        for index in range(start, len(self)):
+            line = self._line(index)
+            segments = projector.project(line) if line and b'"' not in line else None
+            yield index, line, segments
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
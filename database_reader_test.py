@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from database_reader import HEADER_ROW_COUNT, AnGeLiDatabaseReader
+
+RANGES = ((0, 2), (4, 6), (8, None))
+
+def make_row(gene, width=12):
+    return [gene] + [f'{gene}_{c}' for c in range(1, width)]
+
+class TestAnGeLiDatabaseReader(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [[f'H{r}_{c}' for c in range(12)] for r in range(HEADER_ROW_COUNT)]
+        self.rows += [make_row('SPAC1.01'), make_row('SPAC1.02c'), [], make_row('SPBC2.03'),
+                      make_row('SPBC2.04', width=9), make_row('SPCC3.05')]
+        handle, self.path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(handle, 'w', encoding='utf-8', newline='') as f:
+            f.write('\r\n'.join('\t'.join(row) for row in self.rows) + '\r\n')
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_header_rows(self):
+        with AnGeLiDatabaseReader(self.path) as reader:
+            self.assertEqual(len(reader), len(self.rows))
+            self.assertEqual(reader.header_rows(), self.rows[:HEADER_ROW_COUNT])
+
+    def test_projection(self):
+        """Projected rows match slicing the fully split rows, including empty and short rows."""
+        with AnGeLiDatabaseReader(self.path) as reader:
+            result = list(reader.iter_rows(RANGES))
+
+        expected = []
+        for i in range(HEADER_ROW_COUNT, len(self.rows)):
+            row = self.rows[i]
+            expected.append((i, [row[start:stop] for start, stop in RANGES] if row else None))
+        self.assertEqual(result, expected)
+
+    def test_raw_projection(self):
+        """Raw rows keep the undecoded line and give the bytes of each range, or None when the row is too short."""
+        with AnGeLiDatabaseReader(self.path) as reader:
+            result = list(reader.iter_raw_rows(RANGES))
+
+        index, line, segments = result[0]
+        self.assertEqual(line, '\t'.join(self.rows[index]).encode())
+        self.assertEqual(segments, [b'SPAC1.01\tSPAC1.01_1', b'SPAC1.01_4\tSPAC1.01_5',
+                                    b'SPAC1.01_8\tSPAC1.01_9\tSPAC1.01_10\tSPAC1.01_11'])
+        self.assertEqual(result[2][1:], (b'', None))
+
+        with AnGeLiDatabaseReader(self.path) as reader:
+            short = dict((index, segments) for index, line, segments in reader.iter_raw_rows(((0, 1), (10, None))))
+        self.assertIsNone(short[HEADER_ROW_COUNT + 4])
+        self.assertEqual(short[HEADER_ROW_COUNT + 5], [b'SPCC3.05', b'SPCC3.05_10\tSPCC3.05_11'])
+
+    def test_range_to_last_column(self):
+        with AnGeLiDatabaseReader(self.path) as reader:
+            segments = dict(reader.iter_rows(((1, 2), (10, 12))))
+        self.assertEqual(segments[HEADER_ROW_COUNT], [['SPAC1.01_1'], ['SPAC1.01_10', 'SPAC1.01_11']])
+
+    def test_invalid_ranges(self):
+        with AnGeLiDatabaseReader(self.path) as reader:
+            with self.assertRaises(ValueError):
+                list(reader.iter_rows(((4, 6), (0, 2))))
+            with self.assertRaises(ValueError):
+                list(reader.iter_rows(((0, None), (4, 6))))
+
+if __name__ == '__main__':
+    unittest.main()
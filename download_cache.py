@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Room for a few GAF/PHAF releases and their directory listings
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+INDEX_FILE = "index.json"
+CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadCache:
+    """
+    A local cache of downloaded PomBase files.
+
+    Each URL is revalidated with a conditional request (If-None-Match /
+    If-Modified-Since), so an unchanged release costs a single 304 round-trip.
+    Files are stored under the SHA-256 of their content and the least recently
+    used entries are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, directory: str = "download_cache", max_bytes: int = DEFAULT_MAX_BYTES, http=requests):
+        """
+        :param directory: The cache directory, created if it does not exist.
+        :param max_bytes: The maximum total size of the cached files.
+        :param http: The object used for HTTP GET requests (requests or a requests.Session).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.http = http
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+
+    def _path(self, entry: dict) -> str:
+        return os.path.join(self.directory, entry["file"])
+
+    def fetch(self, url: str) -> str:
+        """
+        Returns the path of the local copy of a URL, downloading it only if it changed.
+        If the server cannot be reached, the previous copy is returned if there is one.
+
+        :param url: The URL of the file.
+        :return: The path of the cached file, or None if the file could not be downloaded.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None and not os.path.exists(self._path(entry)):
+                entry = None
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = self.http.get(url, headers=headers, stream=True, timeout=60)
+        except requests.RequestException as e:
+            logger.error(f"Failed to download {url}: {e}")
+            return self._fallback(url, entry)
+
+        with response:
+            if response.status_code == 304 and entry is not None:
+                path = self._touch(url)
+                if path is not None:
+                    self.hits += 1
+                    logger.info(f"{url} not modified, using the cached copy")
+                return path
+
+            if response.status_code != 200:
+                logger.error(f"Failed to download {url}. Status code: {response.status_code}")
+                return self._fallback(url, entry)
+
+            self.misses += 1
+            return self._store(url, response)
+
+    def _fallback(self, url: str, entry: dict) -> str:
+        if entry is None:
+            return None
+
+        logger.warning(f"Using the previously cached copy of {url}")
+        return self._touch(url)
+
+    def _touch(self, url: str) -> str:
+        """
+        :return: The path of the cached copy of a URL, None if it was evicted since fetch() looked it up,
+                 e.g. by a concurrent download.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None or not os.path.exists(self._path(entry)):
+                logger.error(f"The cached copy of {url} was evicted")
+                return None
+            entry["accessed_at"] = time.time()
+            self._save_index()
+            return self._path(entry)
+
+    def _store(self, url: str, response) -> str:
+        """
+        Streams the response body into the cache under its content hash.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        suffix = "".join(os.path.basename(urlparse(url).path).partition(".")[1:]) or ".html"
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+
+            file_name = digest.hexdigest() + suffix
+            os.replace(temp_path, os.path.join(self.directory, file_name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        logger.info(f"Downloaded {url} ({size} bytes) into the cache")
+        with self._lock:
+            previous = self._index.get(url)
+            self._index[url] = {
+                "file": file_name,
+                "size": size,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "accessed_at": time.time(),
+            }
+            if previous is not None and previous["file"] != file_name:
+                self._remove_file(previous["file"])
+            self._evict(keep=url)
+            self._save_index()
+            return os.path.join(self.directory, file_name)
+
+    def _remove_file(self, file_name: str) -> bool:
+        """
+        Deletes a cached file unless another URL still points at the same content. The caller holds the lock.
+
+        :return: True if the file is no longer used.
+        """
+        if any(entry["file"] == file_name for entry in self._index.values()):
+            return False
+        path = os.path.join(self.directory, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+        return True
+
+    def _total_size(self) -> int:
+        """
+        The size of the cached files, each file counted once however many URLs point at it. The caller holds the lock.
+        """
+        return sum({entry["file"]: entry["size"] for entry in self._index.values()}.values())
+
+    def _evict(self, keep: str):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes. The caller holds the lock.
+        """
+        total = self._total_size()
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            if url == keep:
+                continue
+            del self._index[url]
+            if self._remove_file(entry["file"]):
+                total -= entry["size"]
+            logger.info(f"Evicted {url} from the download cache")
+
+    def _save_index(self):
+        temp_path = self._index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=1)
+        os.replace(temp_path, self._index_path)
+
+    def size(self) -> int:
+        """
+        :return: The total size of the cached files in bytes.
+        """
+        with self._lock:
+            return self._total_size()
+
+    def log_stats(self):
+        logger.info(f"Download cache {self.directory}: {self.hits} not modified, {self.misses} downloaded, {self.size()} bytes")
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from download_cache import DownloadCache
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    """A local stand-in for the PomBase release server, answering conditional requests."""
+    files = {}
+    requests_seen = []
+
+    def do_GET(self):
+        body = self.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestDownloadCache(unittest.TestCase):
+
+    def setUp(self):
+        ReleaseHandler.files = {"/latest/pombase-2025-01-01.gaf.gz": b"release one"}
+        ReleaseHandler.requests_seen = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ReleaseHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def test_unchanged_file_is_revalidated(self):
+        """A second fetch of an unchanged file is a 304 and returns the same content-addressed copy."""
+        url = self.base_url + "/latest/pombase-2025-01-01.gaf.gz"
+        cache = DownloadCache(self.directory.name)
+        first = cache.fetch(url)
+        second = DownloadCache(self.directory.name).fetch(url)
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(hashlib.sha256(b"release one").hexdigest() + ".gaf.gz"))
+        self.assertIsNone(ReleaseHandler.requests_seen[0][1])
+        self.assertIsNotNone(ReleaseHandler.requests_seen[1][1])
+
+    def test_changed_file_is_downloaded(self):
+        url = self.base_url + "/latest/pombase-2025-01-01.gaf.gz"
+        cache = DownloadCache(self.directory.name)
+        first = cache.fetch(url)
+        ReleaseHandler.files["/latest/pombase-2025-01-01.gaf.gz"] = b"release two"
+        second = cache.fetch(url)
+
+        self.assertNotEqual(first, second)
+        self.assertFalse(os.path.exists(first))
+        with open(second, "rb") as f:
+            self.assertEqual(f.read(), b"release two")
+
+    def test_eviction(self):
+        """Least recently used files are removed once the cache is over its size limit."""
+        ReleaseHandler.files["/a.tsv"] = b"a" * 10
+        ReleaseHandler.files["/b.tsv"] = b"b" * 10
+        cache = DownloadCache(self.directory.name, max_bytes=15)
+        first = cache.fetch(self.base_url + "/a.tsv")
+        cache.fetch(self.base_url + "/b.tsv")
+
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(cache.size(), 10)
+
+    def test_shared_content(self):
+        """URLs with the same content share one file, which is counted once and does not cause an eviction."""
+        ReleaseHandler.files["/a.tsv"] = b"a" * 10
+        ReleaseHandler.files["/copy/a.tsv"] = b"a" * 10
+        cache = DownloadCache(self.directory.name, max_bytes=15)
+        first = cache.fetch(self.base_url + "/a.tsv")
+        second = cache.fetch(self.base_url + "/copy/a.tsv")
+
+        self.assertEqual(first, second)
+        self.assertTrue(os.path.exists(first))
+        self.assertEqual(cache.size(), 10)
+        self.assertEqual(len(cache._index), 2)
+
+    def test_evicted_before_touch(self):
+        """An entry evicted by a concurrent download after fetch() looked it up is not returned."""
+        url = self.base_url + "/latest/pombase-2025-01-01.gaf.gz"
+        cache = DownloadCache(self.directory.name)
+        path = cache.fetch(url)
+        entry = cache._index.pop(url)
+        os.remove(path)
+        self.assertIsNone(cache._fallback(url, entry))
+
+    def test_missing_file(self):
+        self.assertIsNone(DownloadCache(self.directory.name).fetch(self.base_url + "/missing.gaf.gz"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,354 @@
+import logging
+import math
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from itertools import chain
+
+from packed_database import KIND_BITS, PackedDatabase
+
+logger = logging.getLogger(__name__)
+
+# The header rows holding the long name and the group of each column
+NAME_ROW = 1
+GROUP_ROW = 3
+
+# The number of p-values kept between the lists of a batch
+_P_VALUE_CACHE_LIMIT = 500000
+
+# Relative size below which the remaining terms of a tail sum are dropped
+_TAIL_EPSILON = 1e-17
+
+
+class LogFactorials:
+    """
+    A growing table of log(n!), so hypergeometric probabilities are a few additions instead of lgamma calls.
+    """
+
+    def __init__(self, size: int = 0):
+        self._table = [0.0]
+        self.extend(size)
+
+    def extend(self, size: int):
+        table = self._table
+        total = table[-1]
+        for n in range(len(table), size + 1):
+            total += math.log(n)
+            table.append(total)
+
+    def __getitem__(self, n: int) -> float:
+        if n >= len(self._table):
+            self.extend(n)
+        return self._table[n]
+
+    def upto(self, size: int) -> list[float]:
+        """
+        :return: The table as a list covering 0..size, for fast indexing in loops.
+        """
+        self.extend(size)
+        return self._table
+
+
+def hypergeometric_sf(k: int, population: int, successes: int, draws: int, log_factorials) -> float:
+    """
+    P(X >= k) for X ~ Hypergeometric(population, successes, draws), the one-sided Fisher's exact test p-value
+    for an overlap of k genes between a list of `draws` genes and a column with `successes` genes.
+
+    :param log_factorials: A LogFactorials table, or the list from LogFactorials.upto(population).
+    """
+    upper = min(successes, draws)
+    if k > upper:
+        return 0.0
+    if k <= max(0, draws + successes - population):
+        return 1.0
+
+    lf = log_factorials
+    failures = population - successes
+    mode = (draws + 1) * (successes + 1) // (population + 2)
+    # Below the mode the p-value is large, and 1 - P(X < k) needs far fewer terms than the upper tail
+    first = k if k > mode else k - 1
+    log_term = (lf[successes] - lf[first] - lf[successes - first]
+                + lf[failures] - lf[draws - first] - lf[failures - draws + first]
+                - lf[population] + lf[draws] + lf[population - draws])
+    term = math.exp(log_term)
+    total = term
+
+    # Sum with the ratio of consecutive terms, which only shrink away from the mode
+    if k > mode:
+        for i in range(k, upper):
+            term *= (successes - i) * (draws - i) / ((i + 1) * (failures - draws + i + 1))
+            total += term
+            if term < total * _TAIL_EPSILON:
+                break
+        return min(1.0, total)
+
+    for i in range(first, max(0, draws - failures), -1):
+        term *= i * (failures - draws + i) / ((successes - i + 1) * (draws - i + 1))
+        total += term
+        if term < total * _TAIL_EPSILON:
+            break
+    return max(0.0, 1.0 - total)
+
+
+def bonferroni(p_values, tests: int = None) -> list[float]:
+    """
+    :param p_values: The p-values to correct.
+    :param tests: The number of tests performed, by default len(p_values).
+    """
+    tests = len(p_values) if tests is None else tests
+    return [min(1.0, p * tests) for p in p_values]
+
+
+def benjamini_hochberg(p_values, tests: int = None) -> list[float]:
+    """
+    Benjamini-Hochberg adjusted p-values (false discovery rate).
+
+    :param p_values: The p-values to correct.
+    :param tests: The number of tests performed, by default len(p_values). Tests that are not
+                  listed are taken to have a p-value of 1, which ranks them after every listed one.
+    """
+    tests = len(p_values) if tests is None else tests
+    order = sorted(range(len(p_values)), key=p_values.__getitem__)
+    adjusted = [1.0] * len(p_values)
+    running = 1.0
+    for rank in range(len(order), 0, -1):
+        i = order[rank - 1]
+        running = min(running, p_values[i] * tests / rank)
+        adjusted[i] = running
+    return adjusted
+
+
+@dataclass
+class EnrichmentResult:
+    """
+    The enrichment of one binary column in a gene list.
+    """
+    column: str
+    name: str
+    group: str
+    overlap: int
+    column_size: int
+    list_size: int
+    background_size: int
+    p_value: float
+    p_bonferroni: float
+    p_bh: float
+
+    @property
+    def fold_enrichment(self) -> float:
+        expected = self.list_size * self.column_size / self.background_size
+        return self.overlap / expected if expected else math.inf
+
+
+class EnrichmentIndex:
+    """
+    Gene-list enrichment over the binary columns of an AnGeLi database.
+
+    Each column is held as an int bitset over the genes, so the overlap with a
+    gene list is a single AND and bit_count per column, and the column sizes
+    over the whole database are computed once.
+    """
+
+    def __init__(self, genes, columns, bitsets, names=None, groups=None):
+        """
+        :param genes: The gene ids, bit r of every bitset is genes[r].
+        :param columns: The column short names (e.g. GO ids).
+        :param bitsets: One int bitset per column.
+        :param names: Optional long names of the columns.
+        :param groups: Optional groups of the columns (e.g. 'GO Biological Process').
+        """
+        if len(columns) != len(bitsets):
+            raise ValueError("There must be one bitset per column.")
+
+        self.genes = list(genes)
+        self.columns = list(columns)
+        self.names = list(names) if names is not None else list(columns)
+        self.groups = list(groups) if groups is not None else [""] * len(columns)
+        self._bitsets = list(bitsets)
+        self._gene_index = {}
+        for r, gene in enumerate(self.genes):
+            self._gene_index.setdefault(gene, r)
+
+        self.all_genes = (1 << len(self.genes)) - 1
+        self.column_sizes = [bits.bit_count() for bits in self._bitsets]
+        self.log_factorials = LogFactorials(len(self.genes))
+        self._postings = None
+
+    @classmethod
+    def from_packed_database(cls, db: PackedDatabase) -> "EnrichmentIndex":
+        """
+        Indexes every binary column of a packed database.
+        """
+        header = db.header_rows
+        columns = [c for c in range(len(db.columns)) if db.kind(c) == KIND_BITS]
+        return cls(
+            db.genes,
+            [header[0][c] for c in columns],
+            [db.bit_int(c) for c in columns],
+            names=[header[NAME_ROW][c] for c in columns],
+            groups=[header[GROUP_ROW][c] for c in columns])
+
+    @classmethod
+    def load(cls, path: str) -> "EnrichmentIndex":
+        """
+        Loads the index from a packed database file (see packed_database.py).
+        """
+        with PackedDatabase(path) as db:
+            return cls.from_packed_database(db)
+
+    def gene_rows(self, genes) -> tuple[list, list]:
+        """
+        :param genes: Gene ids.
+        :return: The sorted rows of the known genes, and the genes that are not in the database.
+        """
+        rows = set()
+        unknown = []
+        for gene in genes:
+            r = self._gene_index.get(gene)
+            if r is None:
+                unknown.append(gene)
+            else:
+                rows.add(r)
+        return sorted(rows), unknown
+
+    def gene_mask(self, genes) -> tuple[int, list]:
+        """
+        :param genes: Gene ids.
+        :return: The bitset of the known genes, and the genes that are not in the database.
+        """
+        rows, unknown = self.gene_rows(genes)
+        mask = bytearray((len(self.genes) + 7) // 8)
+        for r in rows:
+            mask[r >> 3] |= 1 << (r & 7)
+        return int.from_bytes(mask, "little"), unknown
+
+    def gene_postings(self) -> list:
+        """
+        :return: For every gene row, the array of the columns the gene is in. Built on first use.
+        """
+        if self._postings is None:
+            postings = [array("I") for _ in self.genes]
+            for c, bits in enumerate(self._bitsets):
+                text = format(bits, "b")[::-1]
+                r = text.find("1")
+                while r != -1:
+                    postings[r].append(c)
+                    r = text.find("1", r + 1)
+            self._postings = postings
+        return self._postings
+
+    def overlap_genes(self, column: str, genes) -> list[str]:
+        """
+        :return: The genes of the list that are in a column.
+        """
+        bits = self._bitsets[self.columns.index(column)] & self.gene_mask(genes)[0]
+        return [gene for r, gene in enumerate(self.genes) if bits >> r & 1]
+
+    def _universe(self, background, groups) -> tuple[int, list, int]:
+        """
+        :return: The background bitset, the size of each column within the background (0 for the
+                 columns that are not tested) and the number of tested columns.
+        """
+        if background is None:
+            background_mask = self.all_genes
+            sizes = self.column_sizes
+        else:
+            background_mask, _ = self.gene_mask(background)
+            sizes = [(bits & background_mask).bit_count() for bits in self._bitsets]
+
+        if groups is not None:
+            sizes = [size if group in groups else 0 for size, group in zip(sizes, self.groups)]
+        tests = len(sizes) - sizes.count(0)
+        return background_mask, sizes, tests
+
+    def _score(self, overlaps, sizes, tests, list_size, background_size, max_p, cache=None) -> list[EnrichmentResult]:
+        """
+        Computes the p-values and corrections of the (column, overlap) pairs of one gene list.
+
+        :param cache: Optional (overlap, column size) -> p-value dict shared by lists of the same size.
+        """
+        # Columns often share the same overlap and size, each distinct pair is computed once
+        lf = self.log_factorials.upto(background_size)
+        cache = {} if cache is None else cache
+        p_values = []
+        for c, overlap in overlaps:
+            size = sizes[c]
+            p = cache.get((overlap, size))
+            if p is None:
+                p = cache[overlap, size] = hypergeometric_sf(overlap, background_size, size, list_size, lf)
+            p_values.append(p)
+        p_bonferroni = bonferroni(p_values, tests)
+        p_bh = benjamini_hochberg(p_values, tests)
+
+        results = [
+            EnrichmentResult(
+                column=self.columns[c], name=self.names[c], group=self.groups[c], overlap=overlap,
+                column_size=sizes[c], list_size=list_size, background_size=background_size,
+                p_value=p, p_bonferroni=bonferroni_p, p_bh=bh_p)
+            for (c, overlap), p, bonferroni_p, bh_p in zip(overlaps, p_values, p_bonferroni, p_bh)
+            if p <= max_p
+        ]
+        results.sort(key=lambda result: (result.p_value, result.column))
+        return results
+
+    def enrich(self, genes, background=None, groups=None, max_p: float = 1.0) -> list[EnrichmentResult]:
+        """
+        Tests every binary column for enrichment in a gene list (one-sided Fisher's exact test).
+
+        :param genes: The gene list.
+        :param background: Optional background gene list, by default every gene in the database.
+                           The gene list is restricted to the background.
+        :param groups: Optional column groups to test, e.g. {'GO Biological Process'}.
+        :param max_p: Only return the columns with a p-value up to max_p.
+        :return: The columns with at least one gene of the list, ordered by p-value. Corrections count
+                 every tested column that has a gene in the background.
+        """
+        selection, unknown = self.gene_mask(genes)
+        if unknown:
+            logger.warning(f"{len(unknown)} genes are not in the database: {unknown[:10]}")
+
+        background_mask, sizes, tests = self._universe(background, groups)
+        selection &= background_mask
+
+        overlaps = []
+        for c, bits in enumerate(self._bitsets):
+            if sizes[c]:
+                overlap = (bits & selection).bit_count()
+                if overlap:
+                    overlaps.append((c, overlap))
+        return self._score(overlaps, sizes, tests, selection.bit_count(), background_mask.bit_count(), max_p)
+
+    def enrich_many(self, gene_lists, background=None, groups=None, max_p: float = 1.0):
+        """
+        Tests many gene lists against one background, see enrich().
+
+        The overlaps are counted from the columns of each gene in the list rather than
+        by intersecting every column, so the cost of a list grows with its size.
+
+        :param gene_lists: An iterable of (list name, genes).
+        :return: A generator of (list name, results).
+        """
+        background_mask, sizes, tests = self._universe(background, groups)
+        background_size = background_mask.bit_count()
+        postings = self.gene_postings()
+        # p-values only depend on the overlap, the column size and the list size, so lists of the same size share them
+        caches = {}
+        cached = 0
+        for name, genes in gene_lists:
+            rows, unknown = self.gene_rows(genes)
+            if unknown:
+                logger.warning(f"{name}: {len(unknown)} genes are not in the database: {unknown[:10]}")
+            if background is not None:
+                rows = [r for r in rows if background_mask >> r & 1]
+
+            counts = Counter(chain.from_iterable(postings[r] for r in rows))
+            overlaps = sorted((c, overlap) for c, overlap in counts.items() if sizes[c])
+
+            if cached > _P_VALUE_CACHE_LIMIT:
+                caches.clear()
+                cached = 0
+            cache = caches.setdefault(len(rows), {})
+            cached -= len(cache)
+            results = self._score(overlaps, sizes, tests, len(rows), background_size, max_p, cache)
+            cached += len(cache)
+            yield name, results
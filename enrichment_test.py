@@ -0,0 +1,61 @@
+import math
+import unittest
+from fractions import Fraction
+from enrichment import EnrichmentIndex, LogFactorials, benjamini_hochberg, bonferroni, hypergeometric_sf
+
+GENES = ['SPAC1F8.01', 'SPAC31A2.12', 'SPAC22F3.10c', 'SPAC1687.21', 'SPAC222.06', 'SPAC56F8.03',
+         'SPAC56F8.11', 'SPAC17A5.14', 'SPAC9G1.12', 'SPAC688.11']
+
+def exact_sf(k, population, successes, draws):
+    total = sum(math.comb(successes, i) * math.comb(population - successes, draws - i)
+                for i in range(k, min(successes, draws) + 1))
+    return float(Fraction(total, math.comb(population, draws)))
+
+def bitset(rows):
+    return sum(1 << r for r in rows)
+
+class TestEnrichment(unittest.TestCase):
+
+    def test_hypergeometric_sf(self):
+        """The tail sums match the exact probabilities computed with integer arithmetic."""
+        log_factorials = LogFactorials()
+        for k, population, successes, draws in [(1, 10, 3, 4), (3, 10, 3, 4), (0, 10, 3, 4), (4, 10, 3, 4),
+                                                (2, 50, 20, 40), (12, 7005, 40, 500), (111, 7005, 297, 494)]:
+            expected = exact_sf(k, population, successes, draws)
+            self.assertAlmostEqual(hypergeometric_sf(k, population, successes, draws, log_factorials) / max(expected, 1e-300),
+                                   1.0 if expected else 0.0, places=9)
+
+    def test_corrections(self):
+        p_values = [0.01, 0.04, 0.03, 0.5]
+        self.assertEqual(bonferroni(p_values), [0.04, 0.16, 0.12, 1.0])
+        adjusted = benjamini_hochberg(p_values)
+        for value, expected in zip(adjusted, [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.5]):
+            self.assertAlmostEqual(value, expected)
+        # Untested columns count towards the number of tests
+        self.assertAlmostEqual(benjamini_hochberg([0.01], tests=10)[0], 0.1)
+
+    def test_enrich(self):
+        index = EnrichmentIndex(
+            GENES,
+            ['GO:0005634', 'GO:0005737', 'GO:0006281'],
+            [bitset([0, 1, 2, 3]), bitset([4, 5, 6, 7, 8, 9]), 0],
+            groups=['GO Cellular Component', 'GO Cellular Component', 'GO Biological Process'])
+        results = index.enrich(GENES[:3] + ['SPXXX.01'])
+
+        self.assertEqual(len(results), 1)
+        result = results[0]
+        self.assertEqual(result.column, 'GO:0005634')
+        self.assertEqual((result.overlap, result.column_size, result.list_size, result.background_size), (3, 4, 3, 10))
+        self.assertAlmostEqual(result.p_value, exact_sf(3, 10, 4, 3))
+        # The empty column is not tested
+        self.assertAlmostEqual(result.p_bonferroni, 2 * result.p_value)
+        self.assertEqual(index.overlap_genes('GO:0005634', GENES[2:5]), GENES[2:4])
+
+    def test_background(self):
+        index = EnrichmentIndex(GENES, ['GO:0005634'], [bitset([0, 1, 2, 3])])
+        result = index.enrich(GENES[:2] + GENES[8:], background=GENES[:5])[0]
+        self.assertEqual((result.overlap, result.column_size, result.list_size, result.background_size), (2, 4, 2, 5))
+        self.assertEqual(index.enrich(GENES[:2], groups={'GO Biological Process'}), [])
+
+if __name__ == '__main__':
+    unittest.main()
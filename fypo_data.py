@@ -1,11 +1,16 @@
 import logging
 import requests
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from urllib.parse import quote
 
+from ontology import load_obo
+
 logger = logging.getLogger(__name__)
 
+# The Group header of the FYPO columns in the original file
+FYPO_GROUP = "Phenotypes (FYPO)"
+
 @dataclass
 class FYPOData:
     """
@@ -24,6 +29,8 @@ class FYPOData:
     terms_with_annotations: str
     date: str
     link: str
+    is_obsolete: bool = False
+    replaced_by: list[str] = field(default_factory=list)
 
     # --- Private Class Constant ---
     # The EBI OLS API requires the FYPO ID to be URL-encoded.
@@ -37,6 +44,13 @@ class FYPOData:
         return asdict(self)
 
     # --- Properties ---
+    @property
+    def term_id(self) -> str:
+        """
+        Returns the term id, the common key for GO and FYPO terms.
+        """
+        return self.fypo_id
+
     @property
     def ebi_api_url(self) -> str:
         """
@@ -49,17 +63,25 @@ class FYPOData:
 
     # --- Class Methods (Alternative Constructors) ---
     @classmethod
-    def from_api(cls, fypo_id: str):
+    def from_api(cls, fypo_id: str, cache=None, session=None):
         """
         An alternative constructor that fetches data from the EBI OLS API
         and creates a FYPOData instance.
 
         Args:
             fypo_id (str): The FYPO ID to fetch (e.g., "FYPO:0000001").
+            cache (TermCache): Optional persistent cache, consulted before the API and
+                updated with the fetched record. A stale entry is used if the API fails.
+            session (SessionProvider): Optional shared HTTP session, the requests module is used if None.
 
         Returns:
             FYPOData: An instance of the class, or None if the request fails.
         """
+        if cache is not None:
+            record = cache.get(fypo_id)
+            if record is not None:
+                return cls._from_cached_record(record)
+
         logger.info(f"Fetching data for {fypo_id} from EBI OLS API...")
         
         # The API requires the colon in the ID to be encoded (e.g., FYPO_0000001)
@@ -67,16 +89,16 @@ class FYPOData:
         url = cls._EBI_API_URL_TEMPLATE.format(fypo_id=encoded_id)
         
         try:
-            response = requests.get(url, timeout=10)
+            response = (session or requests).get(url, timeout=10)
             response.raise_for_status()  # Raise an exception for bad status codes
             data = response.json()
             
-            # Create and return an instance of the class using the fetched data
-            return cls(
+            # Create an instance of the class using the fetched data
+            term = cls(
                 fypo_id=data.get('obo_id', fypo_id),
                 name=data.get('label', 'N/A'),
                 measurement="Binary",  # This info isn't in the API response
-                namespace=data.get('ontology_prefix', 'N/A'),
+                namespace=FYPO_GROUP,
                 source="FYPO",
                 terms_with_annotations="Terms with >1 annotation", # This info isn't in the API response
                 date=datetime.now().strftime("%d-%m-%Y"),
@@ -84,11 +106,71 @@ class FYPOData:
             )
         except requests.RequestException as e:
             logger.error(f"API request failed: {e}")
-            return None
+            return cls._from_stale_cache(fypo_id, cache)
         except (KeyError, IndexError) as e:
             logger.error(f"Failed to parse API response. Unexpected format. Error: {e}")
+            return cls._from_stale_cache(fypo_id, cache)
+
+        if cache is not None:
+            cache.put(fypo_id, term.to_dict())
+        return term
+
+    @classmethod
+    def _from_stale_cache(cls, fypo_id: str, cache):
+        """
+        Falls back to an expired cache entry when the API cannot be used.
+        Returns None if there is no cache or no entry for the term.
+        """
+        if cache is None:
+            return None
+
+        record = cache.get(fypo_id, allow_stale=True)
+        if record is None:
             return None
 
+        logger.warning(f"Using stale cached data for {fypo_id}")
+        return cls._from_cached_record(record)
+
+    @classmethod
+    def _from_cached_record(cls, record: dict):
+        """
+        Creates an instance from a cached record. The date is the Update date of the column, so it is
+        set to today like for a fetched term, not kept from the fetch that filled the cache.
+        """
+        return cls(**dict(record, date=datetime.now().strftime("%d-%m-%Y")))
+
+    @classmethod
+    def from_obo(cls, obo_path: str, obo_terms: dict = None) -> dict:
+        """
+        A bulk alternative constructor that parses a local FYPO ontology file
+        (e.g. fypo.obo or the PomBase release copy) once and creates a
+        FYPOData instance for every term in it. No HTTP calls are made.
+
+        Args:
+            obo_path (str): The path to the OBO file, optionally gzip-compressed.
+            obo_terms (dict): Optional load_obo() result of the same file, to avoid parsing it again.
+
+        Returns:
+            dict[str, FYPOData]: The terms keyed by FYPO ID (alternative ids included).
+        """
+        date = datetime.now().strftime("%d-%m-%Y")
+        terms = {}
+        obo_terms = obo_terms if obo_terms is not None else load_obo(obo_path)
+        for term_id, term in obo_terms.items():
+            terms[term_id] = cls(
+                fypo_id=term.term_id,
+                name=term.name,
+                measurement="Binary",
+                namespace=FYPO_GROUP,
+                source="FYPO",
+                terms_with_annotations="Terms with >1 annotation",
+                date=date,
+                link=f"http://www.pombase.org/term/{term.term_id}",
+                is_obsolete=term.is_obsolete,
+                replaced_by=list(term.replaced_by)
+            )
+        return terms
+
 # --- Example Usage ---
 if __name__ == "__main__":
     # Example 1: Creating an instance directly
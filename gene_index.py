@@ -0,0 +1,149 @@
+import json
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Kinds of identifier, in order of precedence when the same text names different genes
+KIND_ID = 0
+KIND_SYMBOL = 1
+KIND_SYNONYM = 2
+
+# The separator of the GAF DB_Object_Synonym column
+SYNONYM_SEPARATOR = '|'
+
+GENE_INDEX_VERSION = 1
+
+
+def normalize_identifier(identifier: str) -> str:
+    return identifier.strip().casefold()
+
+
+@dataclass
+class Resolution:
+    """
+    The outcome of resolving a list of user identifiers.
+    """
+    # The resolved systematic ids, in input order without repeats
+    genes: list = field(default_factory=list)
+    # Input identifier -> systematic id, for every resolved identifier
+    mapping: dict = field(default_factory=dict)
+    # Identifiers matching no gene, in input order
+    unknown: list = field(default_factory=list)
+    # Identifier -> sorted candidate systematic ids, for identifiers naming more than one gene
+    ambiguous: dict = field(default_factory=dict)
+
+
+class GeneIndex:
+    """
+    Case-insensitive lookup of systematic gene ids (e.g. SPAC6G10.12c) from the identifiers users
+    paste: systematic ids, gene symbols (ace2) and synonyms, as found in the GAF
+    DB_Object_Symbol/DB_Object_Synonym columns.
+
+    An identifier resolves to the genes matching it with the strongest kind: a systematic id
+    beats a symbol, which beats a synonym. It is ambiguous when several genes match with that kind.
+    """
+
+    def __init__(self):
+        self.symbols = {}
+        self.synonyms = {}
+        # Normalized identifier -> (kind, set of systematic ids)
+        self._lookup = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _add_key(self, identifier: str, kind: int, gene_id: str):
+        key = normalize_identifier(identifier)
+        if not key:
+            return
+        current = self._lookup.get(key)
+        if current is None or kind < current[0]:
+            self._lookup[key] = (kind, {gene_id})
+        elif kind == current[0]:
+            current[1].add(gene_id)
+
+    def add(self, gene_id: str, symbol: str = None, synonyms=()):
+        """
+        Adds a gene, or more symbols and synonyms of a known gene.
+        """
+        if gene_id not in self.symbols:
+            self.symbols[gene_id] = None
+            self.synonyms[gene_id] = []
+            self._add_key(gene_id, KIND_ID, gene_id)
+        if symbol and not self.symbols[gene_id]:
+            self.symbols[gene_id] = symbol
+            self._add_key(symbol, KIND_SYMBOL, gene_id)
+        for synonym in synonyms:
+            if synonym and synonym not in self.synonyms[gene_id]:
+                self.synonyms[gene_id].append(synonym)
+                self._add_key(synonym, KIND_SYNONYM, gene_id)
+
+    @classmethod
+    def from_gaf_records(cls, records, genes=()) -> "GeneIndex":
+        """
+        :param records: GAF annotations with the DB_Object_ID, DB_Object_Symbol and DB_Object_Synonym fields.
+        :param genes: Optional systematic ids to include even without annotations (e.g. the database rows).
+        """
+        index = cls()
+        for gene_id in genes:
+            index.add(gene_id)
+        seen = set()
+        for record in records:
+            entry = (record['DB_Object_ID'], record['DB_Object_Symbol'], record['DB_Object_Synonym'])
+            # Every annotation line repeats the names of its gene
+            if entry in seen:
+                continue
+            seen.add(entry)
+            gene_id, symbol, synonyms = entry
+            index.add(gene_id, symbol, synonyms.split(SYNONYM_SEPARATOR) if synonyms else ())
+        return index
+
+    def lookup(self, identifier: str) -> list[str]:
+        """
+        :return: The sorted systematic ids an identifier names, empty if it is unknown.
+        """
+        entry = self._lookup.get(normalize_identifier(identifier))
+        return sorted(entry[1]) if entry else []
+
+    def resolve(self, identifiers) -> Resolution:
+        """
+        Resolves a whole list of identifiers at once.
+        """
+        resolution = Resolution()
+        lookup = self._lookup
+        seen = set()
+        for identifier in identifiers:
+            entry = lookup.get(identifier.strip().casefold())
+            if entry is None:
+                if identifier.strip():
+                    resolution.unknown.append(identifier)
+                continue
+            candidates = entry[1]
+            if len(candidates) > 1:
+                resolution.ambiguous[identifier] = sorted(candidates)
+                continue
+            gene_id, = candidates
+            resolution.mapping[identifier] = gene_id
+            if gene_id not in seen:
+                seen.add(gene_id)
+                resolution.genes.append(gene_id)
+        return resolution
+
+    def save(self, path: str):
+        """
+        Writes the index as JSON, e.g. next to the database it was built for.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': GENE_INDEX_VERSION, 'symbols': self.symbols, 'synonyms': self.synonyms}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "GeneIndex":
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != GENE_INDEX_VERSION:
+            raise ValueError(f"Unsupported gene index version {data.get('version')} in {path}.")
+        index = cls()
+        for gene_id, symbol in data['symbols'].items():
+            index.add(gene_id, symbol, data['synonyms'].get(gene_id, ()))
+        return index
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from gene_index import GeneIndex
+
+RECORDS = [
+    {'DB_Object_ID': 'SPAC6G10.12c', 'DB_Object_Symbol': 'ace2', 'DB_Object_Synonym': ''},
+    {'DB_Object_ID': 'SPAC6G10.12c', 'DB_Object_Symbol': 'ace2', 'DB_Object_Synonym': ''},
+    {'DB_Object_ID': 'SPBC2G2.06c', 'DB_Object_Symbol': 'apl1', 'DB_Object_Synonym': 'ace2|ap-2'},
+    {'DB_Object_ID': 'SPAC1F8.01', 'DB_Object_Symbol': 'ght3', 'DB_Object_Synonym': 'ap-2'},
+    {'DB_Object_ID': 'SPAC31A2.12', 'DB_Object_Symbol': 'SPAC31A2.12', 'DB_Object_Synonym': 'spac1f8.01'},
+]
+
+class TestGeneIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = GeneIndex.from_gaf_records(RECORDS, genes=['SPAC1687.21'])
+
+    def test_lookup(self):
+        """Ids beat symbols, which beat synonyms, whatever the case."""
+        self.assertEqual(self.index.lookup('ACE2'), ['SPAC6G10.12c'])
+        self.assertEqual(self.index.lookup(' spac1f8.01 '), ['SPAC1F8.01'])
+        self.assertEqual(self.index.lookup('AP-2'), ['SPAC1F8.01', 'SPBC2G2.06c'])
+        self.assertEqual(self.index.lookup('spac1687.21'), ['SPAC1687.21'])
+        self.assertEqual(self.index.lookup('pom1'), [])
+
+    def test_resolve(self):
+        resolution = self.index.resolve(['ace2', 'SPAC6G10.12C', 'Apl1', 'ap-2', 'pom1', '', 'ght3'])
+        self.assertEqual(resolution.genes, ['SPAC6G10.12c', 'SPBC2G2.06c', 'SPAC1F8.01'])
+        self.assertEqual(resolution.mapping['SPAC6G10.12C'], 'SPAC6G10.12c')
+        self.assertEqual(resolution.unknown, ['pom1'])
+        self.assertEqual(resolution.ambiguous, {'ap-2': ['SPAC1F8.01', 'SPBC2G2.06c']})
+
+    def test_save_and_load(self):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            self.index.save(path)
+            loaded = GeneIndex.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(len(loaded), len(self.index))
+        for identifier in ('ace2', 'ap-2', 'SPAC1687.21', 'spac1f8.01'):
+            self.assertEqual(loaded.lookup(identifier), self.index.lookup(identifier))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,21 @@
 import logging
 import requests
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 
+from ontology import load_obo
+
 logger = logging.getLogger(__name__)
 
+def go_group(aspect: str) -> str:
+    """
+    The Group header of a GO column, as in the original file, e.g. biological_process -> GO Biological Process.
+    The QuickGO aspect and the OBO namespace use the same names.
+    """
+    if not aspect:
+        return "N/A"
+    return "GO " + aspect.replace('_', ' ').title()
+
 @dataclass
 class GOData:
     """
@@ -22,6 +33,8 @@ class GOData:
     terms_with_annotations: str
     date: str
     link: str
+    is_obsolete: bool = False
+    replaced_by: list[str] = field(default_factory=list)
 
     # --- Private Class Constant ---
     _EBI_API_URL_TEMPLATE = "https://www.ebi.ac.uk/QuickGO/services/ontology/go/terms/{GO_ID}"
@@ -35,6 +48,13 @@ class GOData:
         return asdict(self)
 
     # --- Properties ---
+    @property
+    def term_id(self) -> str:
+        """
+        Returns the term id, the common key for GO and FYPO terms.
+        """
+        return self.go_id
+
     @property
     def ebi_api_url(self) -> str:
         """
@@ -44,31 +64,39 @@ class GOData:
 
     # --- Class Methods (Alternative Constructors) ---
     @classmethod
-    def from_api(cls, go_id: str):
+    def from_api(cls, go_id: str, cache=None, session=None):
         """
         An alternative constructor that fetches data from the EBI API
         and creates a GOData instance.
 
         Args:
             go_id (str): The Gene Ontology ID to fetch (e.g., "GO:0000001").
+            cache (TermCache): Optional persistent cache, consulted before the API and
+                updated with the fetched record. A stale entry is used if the API fails.
+            session (SessionProvider): Optional shared HTTP session, the requests module is used if None.
 
         Returns:
             GOData: An instance of the class, or None if the request fails.
         """
+        if cache is not None:
+            record = cache.get(go_id)
+            if record is not None:
+                return cls._from_cached_record(record)
+
         logger.info(f"Fetching data for {go_id} from EBI API...")
         url = cls._EBI_API_URL_TEMPLATE.format(GO_ID=go_id)
         
         try:
-            response = requests.get(url, timeout=10)
+            response = (session or requests).get(url, timeout=10)
             response.raise_for_status()  # Raise an exception for bad status codes
             data = response.json()['results'][0]
             
-            # Create and return an instance of the class using the fetched data
-            return cls(
+            # Create an instance of the class using the fetched data
+            term = cls(
                 go_id=data.get('id'),
                 name=data.get('name'),
                 measurement="Binary",  
-                namespace=data.get('aspect', 'N/A').replace('_', ' ').title(),
+                namespace=go_group(data.get('aspect')),
                 source="GO",
                 terms_with_annotations="Terms with >1 annotation", 
                 date=datetime.now().strftime("%d-%m-%Y"),
@@ -76,11 +104,71 @@ class GOData:
             )
         except requests.RequestException as e:
             logger.error(f"API request failed: {e}")
-            return None
+            return cls._from_stale_cache(go_id, cache)
         except (KeyError, IndexError) as e:
             logger.error(f"Failed to parse API response. Unexpected format. Error: {e}")
+            return cls._from_stale_cache(go_id, cache)
+
+        if cache is not None:
+            cache.put(go_id, term.to_dict())
+        return term
+
+    @classmethod
+    def _from_stale_cache(cls, go_id: str, cache):
+        """
+        Falls back to an expired cache entry when the API cannot be used.
+        Returns None if there is no cache or no entry for the term.
+        """
+        if cache is None:
+            return None
+
+        record = cache.get(go_id, allow_stale=True)
+        if record is None:
             return None
 
+        logger.warning(f"Using stale cached data for {go_id}")
+        return cls._from_cached_record(record)
+
+    @classmethod
+    def _from_cached_record(cls, record: dict):
+        """
+        Creates an instance from a cached record. The date is the Update date of the column, so it is
+        set to today like for a fetched term, not kept from the fetch that filled the cache.
+        """
+        return cls(**dict(record, date=datetime.now().strftime("%d-%m-%Y")))
+
+    @classmethod
+    def from_obo(cls, obo_path: str, obo_terms: dict = None) -> dict:
+        """
+        A bulk alternative constructor that parses a local GO ontology file
+        (e.g. go-basic.obo or the PomBase release copy) once and creates a
+        GOData instance for every term in it. No HTTP calls are made.
+
+        Args:
+            obo_path (str): The path to the OBO file, optionally gzip-compressed.
+            obo_terms (dict): Optional load_obo() result of the same file, to avoid parsing it again.
+
+        Returns:
+            dict[str, GOData]: The terms keyed by GO ID (alternative ids included).
+        """
+        date = datetime.now().strftime("%d-%m-%Y")
+        terms = {}
+        obo_terms = obo_terms if obo_terms is not None else load_obo(obo_path)
+        for term_id, term in obo_terms.items():
+            terms[term_id] = cls(
+                go_id=term.term_id,
+                name=term.name,
+                measurement="Binary",
+                namespace=go_group(term.namespace),
+                source="GO",
+                terms_with_annotations="Terms with >1 annotation",
+                date=date,
+                link=f"http://www.ebi.ac.uk/QuickGO/GTerm?id={term.term_id}",
+                is_obsolete=term.is_obsolete,
+                replaced_by=list(term.replaced_by)
+            )
+        return terms
+
 # --- Example Usage ---
 if __name__ == "__main__":
     # Example 1: Creating an instance directly (like the original code)
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    """
+    Spaces out calls to the same host so that no more than `rate`
+    requests per second are started against it. A rate of None disables
+    the limit.
+    """
+
+    def __init__(self, rate: float = None):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host: str):
+        """
+        Blocks the calling thread until it is allowed to call `host`.
+        """
+        if not self.rate:
+            return
+
+        interval = 1.0 / self.rate
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CountingRetry(Retry):
+    """
+    A urllib3 Retry that reports every retry to a callback, so retries can be counted.
+    Redirects are not retries and are not reported.
+    """
+
+    def __init__(self, *args, on_retry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_retry = on_retry
+
+    def new(self, **kwargs):
+        # urllib3 creates a new Retry object for every attempt, keep the callback on it
+        retry = super().new(**kwargs)
+        retry.on_retry = self.on_retry
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        # Raises MaxRetryError when the retries are used up, so the last attempt is not counted
+        retry = super().increment(method, url, response, error, *args, **kwargs)
+        redirect = error is None and response is not None and response.get_redirect_location()
+        if self.on_retry is not None and not redirect:
+            self.on_retry()
+        return retry
+
+
+class SessionProvider:
+    """
+    The shared HTTP client for AnGeLi, GOData and FYPOData.
+
+    It keeps one requests.Session with a keep-alive connection pool per host,
+    retries retryable statuses and connection errors with exponential backoff
+    and jitter, applies a global rate limit, and counts requests, connection
+    reuses and retries. It exposes get() like the requests module, so it can be
+    passed wherever requests was used.
+    """
+
+    def __init__(self, pool_size: int = 10, retries: int = 5, backoff_factor: float = 0.5,
+                 backoff_jitter: float = 0.5, rate_limit: float = None, timeout: float = 30,
+                 url_rewrites: dict = None):
+        """
+        :param pool_size: The number of keep-alive connections kept per host.
+        :param retries: The maximum number of retries per request.
+        :param backoff_factor: The base of the exponential backoff between retries, in seconds.
+        :param backoff_jitter: The maximum random delay added to each backoff, in seconds.
+        :param rate_limit: The maximum number of requests per second across all hosts, None for no limit.
+        :param timeout: The default request timeout in seconds.
+        :param url_rewrites: URL prefix -> replacement applied to every request, e.g. to send the PomBase
+                             and EBI requests to a local stand-in server (see pombase_standin.py).
+        """
+        self.timeout = timeout
+        self.url_rewrites = dict(url_rewrites or {})
+        self._response_hooks = []
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._rate_limiter = HostRateLimiter(rate_limit)
+
+        retry = CountingRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            # Hand the last response back instead of raising, callers check the status themselves
+            raise_on_status=False,
+            on_retry=self._count_retry)
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+    def _count_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request through the pooled session, see requests.get.
+        """
+        # A single key makes the limit global rather than per host
+        self._rate_limiter.wait("*")
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.requests += 1
+        response = self.session.get(self._rewrite(url), **kwargs)
+        for hook in self._response_hooks:
+            hook(response)
+        return response
+
+    def add_response_hook(self, hook):
+        """
+        Calls hook(response) on every response, before a streamed body is read.
+        """
+        self._response_hooks.append(hook)
+
+    def _rewrite(self, url: str) -> str:
+        for prefix, replacement in self.url_rewrites.items():
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        return url
+
+    def stats(self) -> dict:
+        """
+        :return: The number of requests, new connections, connection reuses and retries so far.
+        """
+        pools = self._adapter.poolmanager.pools
+        connections = 0
+        pool_requests = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+
+        return {
+            "requests": self.requests,
+            "connections": connections,
+            "reuses": max(0, pool_requests - connections),
+            "retries": self.retries,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(f"HTTP session: {stats['requests']} requests, {stats['connections']} connections, "
+                    f"{stats['reuses']} reuses, {stats['retries']} retries")
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,78 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_session import SessionProvider
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Fails the first request to /flaky and every request to /down with a 503, redirects /moved to /term
+    and answers everything else with 200."""
+    protocol_version = "HTTP/1.1"
+    failures = {}
+
+    def do_GET(self):
+        if self.path == "/moved":
+            self.send_response(301)
+            self.send_header("Location", "/term")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/down" or (self.path == "/flaky" and not self.failures.get(self.path)):
+            self.failures[self.path] = True
+            status = 503
+        else:
+            status = 200
+
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestSessionProvider(unittest.TestCase):
+
+    def setUp(self):
+        FlakyHandler.failures = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.session = SessionProvider(backoff_factor=0, backoff_jitter=0)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_on_server_error(self):
+        response = self.session.get(self.base_url + "/flaky")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.stats()["retries"], 1)
+
+    def test_retry_count(self):
+        """Only the attempts that are retried count, not the last failed one or redirects."""
+        session = SessionProvider(retries=2, backoff_factor=0, backoff_jitter=0)
+        self.assertEqual(session.get(self.base_url + "/down").status_code, 503)
+        self.assertEqual(session.stats()["retries"], 2)
+        self.assertEqual(session.get(self.base_url + "/moved").status_code, 200)
+        self.assertEqual(session.stats()["retries"], 2)
+        session.close()
+
+    def test_connection_reuse(self):
+        for _ in range(3):
+            self.assertEqual(self.session.get(self.base_url + "/term").status_code, 200)
+
+        stats = self.session.stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["reuses"], 2)
+
+    def test_url_rewrite(self):
+        session = SessionProvider(url_rewrites={"https://www.pombase.org": self.base_url})
+        self.assertEqual(session.get("https://www.pombase.org/term").status_code, 200)
+        self.assertEqual(session.stats()["connections"], 1)
+        session.close()
+
+if __name__ == '__main__':
+    unittest.main()
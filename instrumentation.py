@@ -0,0 +1,301 @@
+import argparse
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+RUN_REPORT_VERSION = 1
+
+# Counters kept per stage
+HTTP_REQUESTS = "http_requests"
+BYTES_DOWNLOADED = "bytes_downloaded"
+ROWS = "rows"
+BYTES_WRITTEN = "bytes_written"
+
+
+def rss_bytes() -> int:
+    """
+    :return: The resident set size of the process, or its high-water mark where the current size
+             cannot be read (no /proc), None if neither is available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class StageMetrics:
+    """
+    What a stage used, summed over its calls.
+
+    cpu_seconds is the CPU time of the thread running the stage, work the stage hands to other
+    threads (e.g. the term resolver workers) is not included. The peaks are of the whole process
+    while the stage ran, so stages running concurrently share them.
+    """
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = None
+    peak_traced_bytes: int = None
+    counters: dict = field(default_factory=dict)
+
+
+class _Interval:
+    """
+    The peaks seen during one call of a stage.
+    """
+
+    def __init__(self):
+        self.rss = None
+        self.traced = None
+
+    def update(self, rss, traced):
+        if rss is not None:
+            self.rss = rss if self.rss is None else max(self.rss, rss)
+        if traced is not None:
+            self.traced = traced if self.traced is None else max(self.traced, traced)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+class Instrumentation:
+    """
+    Records the wall time, CPU time, memory peaks and counters of the named stages of a run.
+
+    Stages may nest and run concurrently on several threads. Counters are added to the innermost
+    stage of the calling thread, see bind() for work handed to other threads.
+
+    Without start() the memory is only sampled when stages start and end. start() adds a sampling
+    thread and, with trace_memory, tracemalloc, which makes allocation heavy stages such as
+    assemble_write tens of times slower.
+    """
+
+    def __init__(self, trace_memory: bool = False, sample_interval: float = 0.05, profile_stage: str = None):
+        """
+        :param trace_memory: Also record the peak memory allocated by Python objects (tracemalloc).
+        :param sample_interval: Seconds between the memory samples taken after start().
+        :param profile_stage: The name of a stage to run under cProfile, see dump_profile().
+        """
+        self.trace_memory = trace_memory
+        self.sample_interval = sample_interval
+        self.profile_stage = profile_stage
+        self.profile = cProfile.Profile() if profile_stage else None
+        self.stages = {}
+        self.counters = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+
+    def start(self):
+        self._started = (datetime.now(), time.perf_counter(), time.process_time())
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="instrumentation", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            self._sample()
+
+    def _sample(self, starting: _Interval = None):
+        """
+        Adds the current memory use to the peaks of the running stages. A starting stage only gets
+        the current traced size, not the peak reached before it started.
+        """
+        rss = rss_bytes()
+        current = peak = None
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        with self._lock:
+            for interval in self._active:
+                interval.update(rss, peak)
+            if starting is not None:
+                starting.update(rss, current)
+                self._active.add(starting)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Records a call of a stage around the body of the with statement.
+        """
+        interval = _Interval()
+        with self._lock:
+            metrics = self.stages.setdefault(name, StageMetrics())
+        self._sample(interval)
+        stack = self._stack()
+        stack.append(name)
+        profile = self.profile if name == self.profile_stage else None
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield metrics
+        finally:
+            if profile is not None:
+                profile.disable()
+            cpu = time.thread_time() - cpu
+            wall = time.perf_counter() - wall
+            stack.pop()
+            self._sample()
+            with self._lock:
+                self._active.discard(interval)
+                metrics.calls += 1
+                metrics.wall_seconds += wall
+                metrics.cpu_seconds += cpu
+                metrics.peak_rss_bytes = _max(metrics.peak_rss_bytes, interval.rss)
+                metrics.peak_traced_bytes = _max(metrics.peak_traced_bytes, interval.traced)
+
+    def count(self, counter: str, amount: int = 1):
+        """
+        Adds to a counter of the innermost stage of the calling thread, and to the run total.
+        """
+        stack = self._stack()
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+            if stack:
+                counters = self.stages[stack[-1]].counters
+                counters[counter] = counters.get(counter, 0) + amount
+
+    def bind(self, function):
+        """
+        :return: The function, counting into the current stage of the calling thread wherever it runs,
+                 e.g. on a thread pool.
+        """
+        stack = self._stack()
+        name = stack[-1] if stack else None
+
+        def bound(*args, **kwargs):
+            worker_stack = self._stack()
+            if name is not None:
+                worker_stack.append(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                if name is not None:
+                    worker_stack.pop()
+        return bound
+
+    def record_response(self, response):
+        """
+        A SessionProvider response hook counting the requests and the bytes received. The bytes are
+        taken from the Content-Length, as streamed bodies are read after the hook runs, so chunked
+        responses without one are not counted.
+        """
+        self.count(HTTP_REQUESTS)
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit():
+            self.count(BYTES_DOWNLOADED, int(length))
+
+    def report(self, **extra) -> dict:
+        """
+        :param extra: More entries for the report, e.g. the HTTP session statistics.
+        :return: The JSON run report.
+        """
+        report = {"version": RUN_REPORT_VERSION}
+        if self._started is not None:
+            started, wall, cpu = self._started
+            report.update(started=started.isoformat(timespec="seconds"),
+                          wall_seconds=time.perf_counter() - wall,
+                          cpu_seconds=time.process_time() - cpu)
+        with self._lock:
+            report.update(trace_memory=self.trace_memory, profile_stage=self.profile_stage,
+                          peak_rss_bytes=max((m.peak_rss_bytes for m in self.stages.values()
+                                              if m.peak_rss_bytes is not None), default=None),
+                          counters=dict(self.counters),
+                          stages={name: asdict(metrics) for name, metrics in self.stages.items()})
+        report.update(extra)
+        return report
+
+    def write_report(self, path: str, **extra):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**extra), f, indent=2)
+        logger.info(f"Wrote the run report to {path}")
+
+    def dump_profile(self, path: str):
+        """
+        Writes the cProfile statistics of the profiled stage, readable with pstats or snakeviz.
+        """
+        if self.profile is None:
+            raise ValueError("No stage is profiled.")
+        self.profile.dump_stats(path)
+        logger.info(f"Wrote the profile of stage {self.profile_stage} to {path}")
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float = 0.2) -> list[tuple]:
+    """
+    :return: (stage, baseline seconds, current seconds, ratio, regressed) for the stages in both
+             run reports. A stage regressed when its wall time is more than `tolerance` longer.
+    """
+    rows = []
+    for name, metrics in current["stages"].items():
+        previous = baseline["stages"].get(name)
+        if previous is None:
+            continue
+        before = previous["wall_seconds"]
+        after = metrics["wall_seconds"]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the stage timings of two AnGeLi run reports")
+    parser.add_argument("baseline", type=str, help="Run report of an earlier rebuild")
+    parser.add_argument("current", type=str, help="Run report of the rebuild to check")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = 0
+    for name, before, after, ratio, regressed in compare_reports(baseline, current, args.tolerance):
+        regressions += regressed
+        print(f"{name:24s} {before:10.2f}s -> {after:10.2f}s  x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from instrumentation import BYTES_DOWNLOADED, HTTP_REQUESTS, ROWS, Instrumentation, compare_reports
+from pipeline import Pipeline
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_stages_and_counters(self):
+        """Counters go to the innermost stage of the thread, or of the stage that bound the function."""
+        instrumentation = Instrumentation()
+        with instrumentation.stage('outer'):
+            instrumentation.count(ROWS, 2)
+            with instrumentation.stage('inner'):
+                instrumentation.count(ROWS, 3)
+                count = instrumentation.bind(instrumentation.count)
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(lambda _: count(HTTP_REQUESTS), range(4)))
+        with instrumentation.stage('outer'):
+            instrumentation.record_response(SimpleNamespace(headers={'Content-Length': '100'}))
+        instrumentation.count(ROWS)
+
+        stages = instrumentation.stages
+        self.assertEqual(stages['outer'].calls, 2)
+        self.assertEqual(stages['outer'].counters, {ROWS: 2, HTTP_REQUESTS: 1, BYTES_DOWNLOADED: 100})
+        self.assertEqual(stages['inner'].counters, {ROWS: 3, HTTP_REQUESTS: 4})
+        self.assertEqual(instrumentation.counters, {ROWS: 6, HTTP_REQUESTS: 5, BYTES_DOWNLOADED: 100})
+        self.assertGreaterEqual(stages['outer'].wall_seconds, stages['inner'].wall_seconds)
+
+    def test_pipeline_report(self):
+        """Pipeline stages are recorded on their threads, with the traced memory and a profile when asked."""
+        instrumentation = Instrumentation(trace_memory=True, sample_interval=0.01, profile_stage='build')
+        instrumentation.start()
+        try:
+            pipeline = Pipeline(instrumentation=instrumentation)
+            pipeline.add('load', lambda: list(range(100000)))
+            pipeline.add('build', lambda values: {value: str(value) for value in values}, requires=['load'])
+            pipeline.run()
+        finally:
+            instrumentation.stop()
+
+        report = instrumentation.report(extra='value')
+        self.assertEqual(sorted(report['stages']), ['build', 'load'])
+        self.assertGreater(report['stages']['build']['peak_traced_bytes'], report['stages']['load']['peak_traced_bytes'])
+        self.assertIsNotNone(report['peak_rss_bytes'])
+        self.assertEqual(report['extra'], 'value')
+
+        handle, path = tempfile.mkstemp(suffix='.prof')
+        os.close(handle)
+        try:
+            instrumentation.dump_profile(path)
+            self.assertGreater(os.path.getsize(path), 0)
+        finally:
+            os.remove(path)
+
+    def test_compare_reports(self):
+        baseline = {'stages': {'a': {'wall_seconds': 1.0}, 'b': {'wall_seconds': 2.0}}}
+        current = {'stages': {'a': {'wall_seconds': 1.5}, 'b': {'wall_seconds': 2.1}, 'c': {'wall_seconds': 1.0}}}
+        self.assertEqual([(name, regressed) for name, _, _, _, regressed in compare_reports(baseline, current)],
+                         [('a', True), ('b', False)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import math
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(url: str, body: dict = None) -> dict:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """
+    :return: The nearest-rank percentile of already sorted values.
+    """
+    if not sorted_values:
+        return float("nan")
+    # Rounded first, as e.g. 0.07 * 100 is 7.000000000000001 and would take the next rank
+    rank = max(1, math.ceil(round(fraction * len(sorted_values), 9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_load_test(url: str, requests: int, concurrency: int, mix: dict, list_size: int, seed: int = 0) -> dict:
+    """
+    Sends requests to an AnGeLi server (see angeli_server.py) from concurrent clients.
+
+    :param url: The server base URL, e.g. http://127.0.0.1:8000.
+    :param requests: The total number of requests.
+    :param concurrency: The number of concurrent clients.
+    :param mix: The relative weight of each request kind: 'gene', 'enrich' and 'metrics'.
+    :param list_size: The number of genes in the enrichment and metrics gene lists.
+    :return: Throughput and latency percentiles (in ms), overall and per request kind.
+    """
+    url = url.rstrip("/")
+    genes = _request(url + "/genes")["genes"]
+    generator = random.Random(seed)
+    kinds = generator.choices(list(mix), weights=list(mix.values()), k=requests)
+    jobs = []
+    for kind in kinds:
+        if kind == "gene":
+            jobs.append((kind, f"{url}/gene/{generator.choice(genes)}", None))
+        else:
+            jobs.append((kind, f"{url}/{kind}", {"genes": generator.sample(genes, min(list_size, len(genes)))}))
+
+    def send(job):
+        kind, job_url, body = job
+        start = time.perf_counter()
+        try:
+            _request(job_url, body)
+            ok = True
+        except OSError:
+            ok = False
+        return kind, time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, jobs))
+    elapsed = time.perf_counter() - start
+
+    def latency(kind_results):
+        times = sorted(seconds * 1000 for _, seconds, ok in kind_results if ok)
+        return {"requests": len(kind_results), "errors": sum(1 for _, _, ok in kind_results if not ok),
+                "p50_ms": percentile(times, 0.50), "p99_ms": percentile(times, 0.99),
+                "max_ms": times[-1] if times else float("nan")}
+
+    report = {"requests": requests, "concurrency": concurrency, "seconds": elapsed,
+              "throughput_per_s": requests / elapsed if elapsed else float("nan"), **latency(results)}
+    report["by_kind"] = {kind: latency([result for result in results if result[0] == kind]) for kind in mix}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the AnGeLi query server")
+    parser.add_argument("url", type=str, nargs="?", default="http://127.0.0.1:8000", help="Server base URL")
+    parser.add_argument("--requests", type=int, default=1000, help="Total number of requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--gene_weight", type=float, default=6, help="Relative weight of gene lookups")
+    parser.add_argument("--enrich_weight", type=float, default=3, help="Relative weight of enrichment requests")
+    parser.add_argument("--metrics_weight", type=float, default=1, help="Relative weight of metrics requests")
+    parser.add_argument("--list_size", type=int, default=200, help="Number of genes per gene list")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the request mix")
+    args = parser.parse_args()
+
+    mix = {"gene": args.gene_weight, "enrich": args.enrich_weight, "metrics": args.metrics_weight}
+    report = run_load_test(args.url, args.requests, args.concurrency,
+                           {kind: weight for kind, weight in mix.items() if weight > 0}, args.list_size, args.seed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
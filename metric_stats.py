@@ -0,0 +1,263 @@
+import logging
+import math
+from array import array
+from dataclasses import dataclass
+
+from enrichment import GROUP_ROW, NAME_ROW
+from packed_database import KIND_FLOAT, PackedDatabase
+
+logger = logging.getLogger(__name__)
+
+# Iteration limit and precision of the incomplete beta continued fraction
+_BETA_ITERATIONS = 300
+_BETA_EPSILON = 1e-15
+_BETA_TINY = 1e-300
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    # Continued fraction of the incomplete beta function (modified Lentz's method)
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > _BETA_TINY else _BETA_TINY)
+    h = d
+    for m in range(1, _BETA_ITERATIONS + 1):
+        m2 = 2 * m
+        for numerator in (m * (b - m) * x / ((a + m2 - 1.0) * (a + m2)),
+                          -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > _BETA_TINY else _BETA_TINY)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > _BETA_TINY else _BETA_TINY
+            h *= d * c
+        if abs(d * c - 1.0) < _BETA_EPSILON:
+            break
+    return h
+
+
+def regularized_beta(a: float, b: float, x: float) -> float:
+    """
+    The regularized incomplete beta function I_x(a, b).
+    """
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    # The continued fraction converges quickly on the side of the mean
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _betacf(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _betacf(b, a, 1.0 - x) / b
+
+
+def student_t_two_sided(t: float, df: float) -> float:
+    """
+    :return: P(|T| >= |t|) for T ~ Student's t with df degrees of freedom.
+    """
+    if math.isnan(t) or math.isnan(df):
+        return math.nan
+    return regularized_beta(df / 2.0, 0.5, df / (df + t * t))
+
+
+def normal_two_sided(z: float) -> float:
+    """
+    :return: P(|Z| >= |z|) for a standard normal Z.
+    """
+    return math.erfc(abs(z) / math.sqrt(2.0))
+
+
+@dataclass
+class MetricResult:
+    """
+    A gene list against the rest of the genes for one metric column.
+    """
+    column: str
+    name: str
+    group: str
+    list_size: int
+    rest_size: int
+    list_mean: float
+    rest_mean: float
+    u_statistic: float
+    mann_whitney_p: float
+    t_statistic: float
+    t_test_p: float
+
+
+class MetricStatistics:
+    """
+    Two-sample tests of a gene list against the rest of the genes over the metric columns
+    of an AnGeLi database (mass, pI, amino-acid fractions, intron counts, ...).
+
+    The mid-ranks, centred values and tie corrections of every column are computed once,
+    so a query sums precomputed values over the rows of the list: O(list size x columns)
+    without sorting. Missing values (NaN, 'NA' in the TSV) are left out of both samples.
+    """
+
+    def __init__(self, genes, columns, values, names=None, groups=None):
+        """
+        :param genes: The gene ids, values[c][r] belongs to genes[r].
+        :param columns: The column short names (e.g. 'Mass').
+        :param values: One sequence of floats per column, NaN where the value is missing.
+        :param names: Optional long names of the columns.
+        :param groups: Optional groups of the columns.
+        """
+        if len(columns) != len(values):
+            raise ValueError("There must be one list of values per column.")
+
+        self.genes = list(genes)
+        self.columns = list(columns)
+        self.names = list(names) if names is not None else list(columns)
+        self.groups = list(groups) if groups is not None else [""] * len(columns)
+        self._gene_index = {}
+        for r, gene in enumerate(self.genes):
+            self._gene_index.setdefault(gene, r)
+
+        # Per column: mid-ranks and values centred on the column mean, both 0.0 where missing so
+        # they drop out of the sums, the missing rows, and the column totals
+        self._ranks = []
+        self._centred = []
+        self._missing = []
+        self._counts = []
+        self._means = []
+        self._sums_of_squares = []
+        self._tie_terms = []
+        for column, column_values in zip(self.columns, values):
+            if len(column_values) != len(self.genes):
+                raise ValueError(f"Column {column} has {len(column_values)} values for {len(self.genes)} genes.")
+            self._add_column(column_values)
+
+    def _add_column(self, values):
+        present = [r for r, value in enumerate(values) if not math.isnan(value)]
+        missing = frozenset(r for r, value in enumerate(values) if math.isnan(value))
+        order = sorted(present, key=values.__getitem__)
+
+        ranks = array("d", bytes(8 * len(values)))
+        tie_term = 0
+        i = 0
+        while i < len(order):
+            j = i + 1
+            while j < len(order) and values[order[j]] == values[order[i]]:
+                j += 1
+            rank = (i + j + 1) / 2
+            for r in order[i:j]:
+                ranks[r] = rank
+            ties = j - i
+            tie_term += ties ** 3 - ties
+            i = j
+
+        mean = math.fsum(values[r] for r in present) / len(present) if present else math.nan
+        centred = array("d", bytes(8 * len(values)))
+        for r in present:
+            centred[r] = values[r] - mean
+
+        self._ranks.append(ranks)
+        self._centred.append(centred)
+        self._missing.append(missing)
+        self._counts.append(len(present))
+        self._means.append(mean)
+        self._sums_of_squares.append(math.fsum(value * value for value in centred))
+        self._tie_terms.append(tie_term)
+
+    @classmethod
+    def from_packed_database(cls, db: PackedDatabase) -> "MetricStatistics":
+        """
+        Indexes every metric column of a packed database.
+        """
+        header = db.header_rows
+        columns = [c for c in range(len(db.columns)) if db.kind(c) == KIND_FLOAT]
+        values = []
+        for c in columns:
+            view = db.floats(c)
+            values.append(view.tolist())
+            view.release()
+        return cls(
+            db.genes,
+            [header[0][c] for c in columns],
+            values,
+            names=[header[NAME_ROW][c] for c in columns],
+            groups=[header[GROUP_ROW][c] for c in columns])
+
+    @classmethod
+    def load(cls, path: str) -> "MetricStatistics":
+        """
+        Loads the statistics from a packed database file (see packed_database.py).
+        """
+        with PackedDatabase(path) as db:
+            return cls.from_packed_database(db)
+
+    def _mann_whitney(self, c: int, rank_sum: float, n1: int, n2: int) -> tuple[float, float]:
+        # Normal approximation with tie and continuity corrections, U of the gene list
+        n = n1 + n2
+        u1 = rank_sum - n1 * (n1 + 1) / 2
+        mean = n1 * n2 / 2
+        variance = n1 * n2 / 12 * ((n + 1) - self._tie_terms[c] / (n * (n - 1)))
+        if variance <= 0:
+            return u1, math.nan
+        z = (abs(u1 - mean) - 0.5) / math.sqrt(variance)
+        return u1, min(1.0, normal_two_sided(max(z, 0.0)))
+
+    def _welch(self, c: int, list_sum: float, list_squares: float, n1: int, n2: int) -> tuple[float, float]:
+        # Welch's unequal variances t-test, from sums of the values centred on the column mean
+        if n1 < 2 or n2 < 2:
+            return math.nan, math.nan
+        rest_sum = -list_sum
+        rest_squares = self._sums_of_squares[c] - list_squares
+        variance1 = max(0.0, list_squares - list_sum * list_sum / n1) / (n1 - 1)
+        variance2 = max(0.0, rest_squares - rest_sum * rest_sum / n2) / (n2 - 1)
+        error1 = variance1 / n1
+        error2 = variance2 / n2
+        if error1 + error2 == 0:
+            return math.nan, math.nan
+        t = (list_sum / n1 - rest_sum / n2) / math.sqrt(error1 + error2)
+        df = (error1 + error2) ** 2 / (error1 ** 2 / (n1 - 1) + error2 ** 2 / (n2 - 1))
+        return t, student_t_two_sided(t, df)
+
+    def compare(self, genes, columns=None) -> list[MetricResult]:
+        """
+        Compares the genes of a list with the rest of the genes (Mann-Whitney U and Welch's t-test),
+        for every metric column.
+
+        :param genes: The gene list.
+        :param columns: Optional column short names to test, by default all of them.
+        :return: One result per column, in column order. Genes without a value in a column are
+                 left out of it; statistics that cannot be computed are NaN.
+        """
+        rows = set()
+        unknown = []
+        for gene in genes:
+            r = self._gene_index.get(gene)
+            if r is None:
+                unknown.append(gene)
+            else:
+                rows.add(r)
+        if unknown:
+            logger.warning(f"{len(unknown)} genes are not in the database: {unknown[:10]}")
+        rows = sorted(rows)
+
+        if columns is None:
+            indices = range(len(self.columns))
+        else:
+            indices = [self.columns.index(column) for column in columns]
+
+        results = []
+        for c in indices:
+            missing = self._missing[c]
+            n1 = len(rows) - (sum(1 for r in rows if r in missing) if missing else 0)
+            n2 = self._counts[c] - n1
+            rank_sum = sum(map(self._ranks[c].__getitem__, rows))
+            centred = list(map(self._centred[c].__getitem__, rows))
+            list_sum = math.fsum(centred)
+            list_squares = math.fsum(value * value for value in centred)
+
+            if n1 and n2:
+                u, mann_whitney_p = self._mann_whitney(c, rank_sum, n1, n2)
+                t, t_test_p = self._welch(c, list_sum, list_squares, n1, n2)
+            else:
+                u = mann_whitney_p = t = t_test_p = math.nan
+            mean = self._means[c]
+            results.append(MetricResult(
+                column=self.columns[c], name=self.names[c], group=self.groups[c], list_size=n1, rest_size=n2,
+                list_mean=mean + list_sum / n1 if n1 else math.nan,
+                rest_mean=mean - list_sum / n2 if n2 else math.nan,
+                u_statistic=u, mann_whitney_p=mann_whitney_p, t_statistic=t, t_test_p=t_test_p))
+        return results
@@ -0,0 +1,60 @@
+import math
+import statistics
+import unittest
+from metric_stats import MetricStatistics, student_t_two_sided
+
+GENES = ['SPAC1F8.01', 'SPAC31A2.12', 'SPAC22F3.10c', 'SPAC1687.21', 'SPAC222.06', 'SPAC56F8.03',
+         'SPAC56F8.11', 'SPAC17A5.14', 'SPAC9G1.12', 'SPAC688.11']
+
+MASS = [12.7, 6.5, 30.2, 25.0, 6.5, 41.9, 18.3, 6.5, 55.0, 22.1]
+PI = [4.5, math.nan, 9.1, 7.7, 5.2, math.nan, 6.0, 7.7, 8.8, 5.0]
+
+def mann_whitney_u(sample, rest):
+    """U of the first sample, from mid-ranks of the pooled values."""
+    pooled = sorted(sample + rest)
+    rank = {value: (pooled.index(value) + 1 + len(pooled) - pooled[::-1].index(value)) / 2 for value in pooled}
+    return sum(rank[value] for value in sample) - len(sample) * (len(sample) + 1) / 2
+
+class TestMetricStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = MetricStatistics(GENES, ['Mass', 'pI'], [MASS, PI], groups=['Protein Features'] * 2)
+
+    def test_student_t(self):
+        """Closed forms of the t distribution with 1 and 2 degrees of freedom."""
+        for t in (0.0, 0.3, 1.0, 2.5, -4.0, 30.0):
+            self.assertAlmostEqual(student_t_two_sided(t, 1), 1 - 2 / math.pi * math.atan(abs(t)), places=12)
+            self.assertAlmostEqual(student_t_two_sided(t, 2), 1 - abs(t) / math.sqrt(2 + t * t), places=12)
+
+    def test_compare(self):
+        """Precomputed ranks and sums give the same statistics as recomputing them from the samples."""
+        selection = [0, 1, 4, 5, 8]
+        results = self.stats.compare([GENES[r] for r in selection] + ['SPXXX.01'])
+        self.assertEqual([result.column for result in results], ['Mass', 'pI'])
+
+        for result, values in zip(results, [MASS, PI]):
+            sample = [values[r] for r in selection if not math.isnan(values[r])]
+            rest = [values[r] for r in range(len(GENES)) if r not in selection and not math.isnan(values[r])]
+            self.assertEqual((result.list_size, result.rest_size), (len(sample), len(rest)))
+            self.assertAlmostEqual(result.list_mean, statistics.fmean(sample))
+            self.assertAlmostEqual(result.rest_mean, statistics.fmean(rest))
+            self.assertAlmostEqual(result.u_statistic, mann_whitney_u(sample, rest))
+
+            error = statistics.variance(sample) / len(sample) + statistics.variance(rest) / len(rest)
+            self.assertAlmostEqual(result.t_statistic, (statistics.fmean(sample) - statistics.fmean(rest)) / math.sqrt(error))
+            self.assertTrue(0 < result.t_test_p <= 1 and 0 < result.mann_whitney_p <= 1)
+
+    def test_missing_values(self):
+        """Genes without a value drop out, and tests that need more values are NaN."""
+        result = self.stats.compare([GENES[1], GENES[5], GENES[2]], columns=['pI'])[0]
+        self.assertEqual((result.list_size, result.rest_size), (1, 7))
+        self.assertEqual(result.list_mean, PI[2])
+        self.assertTrue(math.isnan(result.t_statistic))
+        self.assertFalse(math.isnan(result.mann_whitney_p))
+
+        result = self.stats.compare([GENES[1], GENES[5]], columns=['pI'])[0]
+        self.assertEqual(result.list_size, 0)
+        self.assertTrue(math.isnan(result.mann_whitney_p))
+
+if __name__ == '__main__':
+    unittest.main()
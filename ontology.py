@@ -0,0 +1,227 @@
+import gzip
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class OboTerm:
+    """
+    A single [Term] stanza from an OBO ontology file (e.g. go-basic.obo or fypo.obo).
+    Only the tags used by the AnGeLi database are kept.
+    """
+    term_id: str
+    name: str = ""
+    namespace: str = ""
+    is_obsolete: bool = False
+    replaced_by: list[str] = field(default_factory=list)
+    alt_ids: list[str] = field(default_factory=list)
+    is_a: list[str] = field(default_factory=list)
+    part_of: list[str] = field(default_factory=list)
+
+
+def _strip_comment(value: str) -> str:
+    """
+    Removes the trailing '! comment' that OBO puts after term references.
+    """
+    return value.split(" !", 1)[0].strip()
+
+
+def parse_obo(file_obj) -> dict[str, OboTerm]:
+    """
+    Parses an OBO text stream into an id -> OboTerm index.
+    Alternative ids (alt_id) are indexed as well and point at their primary term.
+
+    Args:
+        file_obj (Iterable[str]): The OBO file, one line per item.
+
+    Returns:
+        dict[str, OboTerm]: The terms keyed by id.
+    """
+    terms = {}
+    term = None
+
+    def finish(term):
+        if term is not None and term.term_id:
+            terms[term.term_id] = term
+
+    for line in file_obj:
+        line = line.strip()
+        if not line or line.startswith("!"):
+            continue
+
+        if line.startswith("["):
+            finish(term)
+            # Only [Term] stanzas are of interest, [Typedef] etc. are skipped
+            term = OboTerm(term_id="") if line == "[Term]" else None
+            continue
+
+        if term is None or ":" not in line:
+            continue
+
+        tag, value = line.split(":", 1)
+        value = value.strip()
+        if tag == "id":
+            term.term_id = value
+        elif tag == "name":
+            term.name = value
+        elif tag == "namespace":
+            term.namespace = value
+        elif tag == "is_obsolete":
+            term.is_obsolete = value == "true"
+        elif tag == "replaced_by":
+            term.replaced_by.append(_strip_comment(value))
+        elif tag == "alt_id":
+            term.alt_ids.append(_strip_comment(value))
+        elif tag == "is_a":
+            term.is_a.append(_strip_comment(value))
+        elif tag == "relationship":
+            relation, _, target = _strip_comment(value).partition(" ")
+            if relation == "part_of":
+                term.part_of.append(target.strip())
+
+    finish(term)
+
+    # Alternative ids resolve to the primary term, but never hide a real term
+    for term in list(terms.values()):
+        for alt_id in term.alt_ids:
+            terms.setdefault(alt_id, term)
+
+    return terms
+
+
+def load_obo(path: str) -> dict[str, OboTerm]:
+    """
+    Loads a local OBO file, gzip-compressed copies (.gz) are supported.
+
+    :param path: The path to the OBO file.
+    :return: The terms keyed by id.
+    """
+    logger.info(f"Loading ontology file {path}")
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        terms = parse_obo(f)
+
+    logger.info(f"Loaded {len(terms)} terms from {path}")
+    return terms
+
+
+class AncestorClosure:
+    """
+    The ancestors of ontology terms over the is_a and part_of relations, for the true-path rule:
+    a gene annotated to a term is also annotated to every ancestor of that term.
+
+    The closure of each term (the term and all its ancestors) is an int bitset computed once
+    and built from the memoized closures of its parents. Bits are given out as terms are
+    reached, so the bitsets only span the terms actually used, not the whole ontology.
+    """
+
+    def __init__(self, terms: dict[str, OboTerm]):
+        """
+        :param terms: The parsed ontology, see load_obo.
+        """
+        self.terms = terms
+        self.term_ids = []
+        self._bits = {}
+        self._closures = {}
+
+    def _bit(self, term_id: str) -> int:
+        bit = self._bits.get(term_id)
+        if bit is None:
+            bit = self._bits[term_id] = len(self.term_ids)
+            self.term_ids.append(term_id)
+        return bit
+
+    def parents(self, term_id: str) -> list[str]:
+        term = self.terms.get(term_id)
+        if term is None:
+            return []
+        # An alternative id stands for its primary term
+        if term.term_id != term_id:
+            return [term.term_id]
+        return term.is_a + term.part_of
+
+    def closure(self, term_id: str) -> int:
+        """
+        :return: The bitset of the term and all its ancestors, see term_ids for the bit positions.
+        """
+        closures = self._closures
+        bits = closures.get(term_id)
+        if bits is not None:
+            return bits
+
+        # Depth-first without recursion, a term is closed once all of its parents are
+        stack = [term_id]
+        visiting = set()
+        while stack:
+            current = stack[-1]
+            if current in closures:
+                stack.pop()
+                continue
+            parents = self.parents(current)
+            if current not in visiting:
+                visiting.add(current)
+                # Parents already being visited are part of a cycle, which OBO files should not have
+                pending = [parent for parent in parents if parent not in closures and parent not in visiting]
+                if pending:
+                    stack.extend(pending)
+                    continue
+            bits = 1 << self._bit(current)
+            for parent in parents:
+                bits |= closures.get(parent, 0)
+            closures[current] = bits
+            stack.pop()
+        return closures[term_id]
+
+    def ancestors(self, term_id: str) -> list[str]:
+        """
+        :return: The term and its ancestors.
+        """
+        return self.decode(self.closure(term_id))
+
+    def decode(self, bits: int) -> list[str]:
+        """
+        :return: The term ids of a bitset.
+        """
+        term_ids = self.term_ids
+        text = format(bits, "b")[::-1]
+        result = []
+        position = text.find("1")
+        while position != -1:
+            result.append(term_ids[position])
+            position = text.find("1", position + 1)
+        return result
+
+    def propagate(self, pairs) -> list[tuple[str, str]]:
+        """
+        Propagates (gene, term) annotation pairs to the ancestor terms.
+
+        The terms of each gene are ORed together as closure bitsets, so every ancestor is
+        visited once per gene rather than once per annotation. Terms that are not in the
+        ontology are kept as they are.
+
+        :param pairs: The direct (gene, term) pairs.
+        :return: The (gene, term) pairs of every gene with each of its terms and their ancestors,
+                 genes in order of first appearance.
+        """
+        gene_terms = {}
+        count = 0
+        for gene, term_id in pairs:
+            gene_terms.setdefault(gene, set()).add(term_id)
+            count += 1
+
+        unknown = set()
+        propagated = []
+        for gene, term_ids in gene_terms.items():
+            bits = 0
+            for term_id in term_ids:
+                if term_id not in self.terms:
+                    unknown.add(term_id)
+                bits |= self.closure(term_id)
+            propagated.extend((gene, term_id) for term_id in self.decode(bits))
+
+        if unknown:
+            logger.warning(f"{len(unknown)} annotated terms are not in the ontology and were not propagated: "
+                           f"{sorted(unknown)[:10]}")
+        logger.info(f"Propagated {count} annotations to {len(propagated)} over {len(self.term_ids)} terms")
+        return propagated
@@ -0,0 +1,86 @@
+import io
+import unittest
+from ontology import AncestorClosure, parse_obo
+
+OBO = """format-version: 1.2
+ontology: go
+
+[Term]
+id: GO:0000001
+name: mitochondrion inheritance
+namespace: biological_process
+alt_id: GO:0000009
+is_a: GO:0048308 ! organelle inheritance
+relationship: part_of GO:0007005 ! mitochondrion organization
+
+[Term]
+id: GO:0000005
+name: obsolete ribosomal chaperone activity
+namespace: molecular_function
+is_obsolete: true
+replaced_by: GO:0044183
+
+[Term]
+id: GO:0048308
+name: organelle inheritance
+namespace: biological_process
+is_a: GO:0008150 ! biological_process
+
+[Term]
+id: GO:0007005
+name: mitochondrion organization
+namespace: biological_process
+is_a: GO:0008150 ! biological_process
+
+[Term]
+id: GO:0008150
+name: biological_process
+namespace: biological_process
+
+[Typedef]
+id: part_of
+name: part of
+"""
+
+class TestOntology(unittest.TestCase):
+
+    def setUp(self):
+        self.terms = parse_obo(io.StringIO(OBO))
+
+    def test_term_fields(self):
+        term = self.terms["GO:0000001"]
+        self.assertEqual(term.name, "mitochondrion inheritance")
+        self.assertEqual(term.namespace, "biological_process")
+        self.assertEqual(term.is_a, ["GO:0048308"])
+        self.assertEqual(term.part_of, ["GO:0007005"])
+        self.assertIs(self.terms["GO:0000009"], term)
+        self.assertNotIn("part_of", self.terms)
+
+    def test_obsolete_term(self):
+        term = self.terms["GO:0000005"]
+        self.assertTrue(term.is_obsolete)
+        self.assertEqual(term.replaced_by, ["GO:0044183"])
+
+    def test_ancestor_closure(self):
+        """Ancestors follow is_a and part_of, alternative ids stand for their primary term."""
+        closure = AncestorClosure(self.terms)
+        self.assertEqual(sorted(closure.ancestors("GO:0000001")), ["GO:0000001", "GO:0007005", "GO:0008150", "GO:0048308"])
+        self.assertEqual(sorted(closure.ancestors("GO:0000009")), ["GO:0000001", "GO:0000009", "GO:0007005", "GO:0008150", "GO:0048308"])
+        self.assertEqual(closure.ancestors("GO:0000005"), ["GO:0000005"])
+
+    def test_propagate(self):
+        """Each gene gets its terms and their ancestors once, unknown terms are kept as they are."""
+        closure = AncestorClosure(self.terms)
+        pairs = closure.propagate([("SPAC1F8.01", "GO:0000001"), ("SPAC1F8.01", "GO:0048308"),
+                                   ("SPAC31A2.12", "GO:0007005"), ("SPAC31A2.12", "GO:9999999")])
+        self.assertEqual(sorted(pairs), [
+            ("SPAC1F8.01", "GO:0000001"), ("SPAC1F8.01", "GO:0007005"), ("SPAC1F8.01", "GO:0008150"),
+            ("SPAC1F8.01", "GO:0048308"), ("SPAC31A2.12", "GO:0007005"), ("SPAC31A2.12", "GO:0008150"),
+            ("SPAC31A2.12", "GO:9999999")])
+
+    def test_cycle(self):
+        terms = parse_obo(io.StringIO("[Term]\nid: X:1\nis_a: X:2\n\n[Term]\nid: X:2\nis_a: X:1\n"))
+        self.assertEqual(sorted(AncestorClosure(terms).ancestors("X:1")), ["X:1", "X:2"])
+
+if __name__ == '__main__':
+    unittest.main()
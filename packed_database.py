@@ -0,0 +1,474 @@
+import argparse
+import itertools
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from database_reader import HEADER_ROW_COUNT, AnGeLiDatabaseReader
+
+logger = logging.getLogger(__name__)
+
+# File preamble: magic, format version, length of the JSON metadata
+MAGIC = b"ANGELIPK"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sIQ")
+
+# Data sections start on 8 byte boundaries so the float arrays can be cast in place
+ALIGNMENT = 8
+
+# The header row holding the "Scale of measurement" of each column (ReferenceData.ROW_3)
+SCALE_ROW = 2
+
+KIND_BITS = "bits"
+KIND_FLOAT = "float"
+KIND_TEXT = "text"
+
+# bytes.translate tables turning a byte of packed bits into "1"/"0" for one bit position
+_BIT_TABLES = [bytes(ord("1") if value >> bit & 1 else ord("0") for value in range(256)) for bit in range(8)]
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def column_kind(scale: str) -> str:
+    """
+    :param scale: The "Scale of measurement" of a column.
+    :return: How the column is stored: Binary columns as bits, Metric columns as floats, anything else as text.
+    """
+    if scale == "Binary":
+        return KIND_BITS
+    if scale == "Metric":
+        return KIND_FLOAT
+    return KIND_TEXT
+
+
+def format_metric(value: float) -> str:
+    """
+    The canonical text of a metric value, NaN is written as NA and whole numbers without a decimal point.
+    Cells whose original text differs are kept as text overrides.
+    """
+    if math.isnan(value):
+        return "NA"
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(value)
+
+
+def _parse_metric(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def _quote(field: str) -> str:
+    # The same minimal quoting as csv.writer with a tab delimiter
+    if '"' in field or "\t" in field or "\n" in field or "\r" in field:
+        return '"' + field.replace('"', '""') + '"'
+    return field
+
+
+def write_packed_database(tsv_path: str, packed_path: str) -> dict:
+    """
+    Converts an AnGeLiDatabase.txt file into the packed binary store.
+
+    Binary columns are stored as bits, one bit-packed array per column. Metric
+    columns are stored as float64 arrays, with the text of any cell that does not
+    format back to the same string (e.g. "0.50" or padded values) kept as an
+    override, so the TSV can be restored exactly. The header rows and the text
+    columns (e.g. the gene ids) are kept in the JSON metadata.
+
+    :param tsv_path: The AnGeLiDatabase.txt file, e.g. as written by AnGeLi.regenerate_file.
+    :param packed_path: The packed file to write.
+    :return: The number of rows, bit, float and text columns and overrides written.
+    """
+    with AnGeLiDatabaseReader(tsv_path) as reader:
+        header_rows = reader.header_rows()
+        if len(header_rows) < HEADER_ROW_COUNT:
+            raise ValueError(f"{tsv_path} does not have the {HEADER_ROW_COUNT} header rows.")
+
+        width = len(header_rows[0])
+        if any(len(row) != width for row in header_rows):
+            raise ValueError(f"The header rows of {tsv_path} have different lengths.")
+
+        kinds = [column_kind(scale) for scale in header_rows[SCALE_ROW]]
+        columns = []
+        slots = {KIND_BITS: 0, KIND_FLOAT: 0}
+        for kind in kinds:
+            if kind == KIND_TEXT:
+                columns.append({"kind": kind})
+            else:
+                columns.append({"kind": kind, "slot": slots[kind]})
+                slots[kind] += 1
+
+        # Runs of adjacent bit columns are checked and scanned as one string per row
+        bit_runs = []
+        for column, kind in enumerate(kinds):
+            if kind != KIND_BITS:
+                continue
+            if bit_runs and bit_runs[-1][1] == column:
+                bit_runs[-1][1] += 1
+            else:
+                bit_runs.append([column, column + 1, columns[column]["slot"]])
+        float_columns = [(column, columns[column]["slot"]) for column, kind in enumerate(kinds) if kind == KIND_FLOAT]
+        text_columns = [column for column, kind in enumerate(kinds) if kind == KIND_TEXT]
+
+        row_count = len(reader) - HEADER_ROW_COUNT
+        stride = _align((row_count + 7) // 8)
+        bits = bytearray(stride * slots[KIND_BITS])
+        floats = array("d", [math.nan]) * (row_count * slots[KIND_FLOAT])
+        texts = {column: [] for column in text_columns}
+        overrides = {}
+
+        for r, (i, segments) in enumerate(reader.iter_rows(((0, None),))):
+            row = segments[0] if segments else []
+            if len(row) != width:
+                raise ValueError(f"Row {i} of {tsv_path} has {len(row)} columns, expected {width}.")
+
+            byte, mask = r >> 3, 1 << (r & 7)
+            for start, stop, slot in bit_runs:
+                joined = "".join(row[start:stop])
+                if len(joined) == stop - start and joined.count("0") + joined.count("1") == len(joined):
+                    position = joined.find("1")
+                    while position != -1:
+                        bits[(slot + position) * stride + byte] |= mask
+                        position = joined.find("1", position + 1)
+                    continue
+
+                for offset, value in enumerate(row[start:stop]):
+                    if value == "1":
+                        bits[(slot + offset) * stride + byte] |= mask
+                    elif value != "0":
+                        overrides.setdefault(start + offset, {})[r] = value
+
+            for column, slot in float_columns:
+                text = row[column]
+                value = _parse_metric(text)
+                floats[slot * row_count + r] = value
+                if format_metric(value) != text:
+                    overrides.setdefault(column, {})[r] = text
+
+            for column in text_columns:
+                texts[column].append(row[column])
+
+        metadata = {
+            "format_version": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "rows": row_count,
+            "line_terminator": reader.line_terminator,
+            "final_newline": reader.final_newline,
+            "header_rows": header_rows,
+            "columns": columns,
+            "bits": {"offset": 0, "stride": stride, "count": slots[KIND_BITS]},
+            "floats": {"offset": len(bits), "count": slots[KIND_FLOAT]},
+            "text": {str(column): values for column, values in texts.items()},
+            "overrides": {str(column): {str(r): text for r, text in cells.items()}
+                          for column, cells in overrides.items()},
+        }
+
+    encoded = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(encoded))
+
+    temp_path = packed_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        f.write(encoded)
+        f.write(bytes(data_start - f.tell()))
+        f.write(bits)
+        f.write(floats.tobytes())
+    os.replace(temp_path, packed_path)
+
+    summary = {
+        "rows": row_count,
+        "bit_columns": slots[KIND_BITS],
+        "float_columns": slots[KIND_FLOAT],
+        "text_columns": len(text_columns),
+        "overrides": sum(len(cells) for cells in overrides.values()),
+    }
+    logger.info(f"Packed {tsv_path} into {packed_path} ({os.path.getsize(packed_path)} bytes): {summary}")
+    return summary
+
+
+class PackedDatabase:
+    """
+    Read access to a packed AnGeLi database written by write_packed_database.
+
+    The file is memory-mapped, so opening it only parses the JSON metadata.
+    bits() and floats() return zero-copy views of a column; release them
+    before calling close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, metadata_length = _PREAMBLE.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"{path} is not a packed AnGeLi database.")
+
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a packed AnGeLi database.")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported packed database version {version} in {path}.")
+
+        metadata = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + metadata_length])
+        if metadata["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written on a {metadata['byteorder']} endian machine.")
+
+        self.header_rows = metadata["header_rows"]
+        self.line_terminator = metadata["line_terminator"]
+        self.final_newline = metadata["final_newline"]
+        self._rows = metadata["rows"]
+        self._columns = metadata["columns"]
+        self._stride = metadata["bits"]["stride"]
+        self._texts = {int(column): values for column, values in metadata["text"].items()}
+        self._overrides = {int(column): {int(r): text for r, text in cells.items()}
+                           for column, cells in metadata["overrides"].items()}
+
+        data_start = _align(_PREAMBLE.size + metadata_length)
+        view = memoryview(self._map)
+        bits_start = data_start + metadata["bits"]["offset"]
+        self._bits = view[bits_start:bits_start + self._stride * metadata["bits"]["count"]]
+        floats_start = data_start + metadata["floats"]["offset"]
+        self._floats = view[floats_start:floats_start + 8 * self._rows * metadata["floats"]["count"]].cast("d")
+        view.release()
+
+        # Names can repeat in the header, the first column wins like in the TSV lookups
+        self._index = {}
+        for column, name in enumerate(self.header_rows[0]):
+            self._index.setdefault(name, column)
+
+        # Runs of adjacent bit columns, rendered together when writing rows
+        self._bit_runs = []
+        for column, spec in enumerate(self._columns):
+            if spec["kind"] != KIND_BITS:
+                continue
+            if self._bit_runs and self._bit_runs[-1][1] == column:
+                self._bit_runs[-1][1] += 1
+            else:
+                self._bit_runs.append([column, column + 1, spec["slot"]])
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def columns(self) -> list[str]:
+        """
+        The short names of the columns (header row 1).
+        """
+        return self.header_rows[0]
+
+    @property
+    def genes(self) -> list[str]:
+        """
+        The gene ids of the rows, in file order.
+        """
+        return self._texts[0]
+
+    def column_index(self, column) -> int:
+        """
+        :param column: A column short name (e.g. 'GO:0005634') or index.
+        :return: The column index.
+        """
+        if isinstance(column, int):
+            if not 0 <= column < len(self._columns):
+                raise IndexError(f"Column {column} out of range.")
+            return column
+        try:
+            return self._index[column]
+        except KeyError:
+            raise KeyError(f"Unknown column {column}") from None
+
+    def kind(self, column) -> str:
+        """
+        :return: How the column is stored: KIND_BITS, KIND_FLOAT or KIND_TEXT.
+        """
+        return self._columns[self.column_index(column)]["kind"]
+
+    def _slot(self, column, kind) -> int:
+        spec = self._columns[self.column_index(column)]
+        if spec["kind"] != kind:
+            raise ValueError(f"Column {column} is stored as {spec['kind']}, not {kind}.")
+        return spec["slot"]
+
+    def bits(self, column) -> memoryview:
+        """
+        :return: A zero-copy view of the bit-packed values of a binary column, bit r (little endian) is row r.
+        """
+        slot = self._slot(column, KIND_BITS)
+        return self._bits[slot * self._stride:(slot + 1) * self._stride]
+
+    def bit_int(self, column) -> int:
+        """
+        :return: The values of a binary column as an int bitset, bit r is row r.
+        """
+        return int.from_bytes(self.bits(column), "little")
+
+    def floats(self, column) -> memoryview:
+        """
+        :return: A zero-copy view of the float64 values of a metric column, NaN where the value is not a number.
+        """
+        slot = self._slot(column, KIND_FLOAT)
+        return self._floats[slot * self._rows:(slot + 1) * self._rows]
+
+    def values(self, column) -> list[str]:
+        """
+        :return: The values of a column as they appear in the TSV file.
+        """
+        column = self.column_index(column)
+        kind = self._columns[column]["kind"]
+        if kind == KIND_TEXT:
+            return list(self._texts[column])
+
+        if kind == KIND_BITS:
+            packed = format(self.bit_int(column), f"0{self._stride * 8}b")[::-1]
+            values = list(packed[:self._rows])
+        else:
+            values = [format_metric(value) for value in self.floats(column)]
+
+        for r, text in self._overrides.get(column, {}).items():
+            values[r] = text
+        return values
+
+    def _bit_chars(self, r: int) -> str:
+        """
+        :return: "0"/"1" for every bit column of row r, in slot order.
+        """
+        column_bytes = self._bits[r >> 3::self._stride]
+        return column_bytes.tobytes().translate(_BIT_TABLES[r & 7]).decode("ascii")
+
+    def row(self, r: int) -> list[str]:
+        """
+        :param r: The gene row, 0 is the first row after the headers.
+        :return: Every column of the row as it appears in the TSV file.
+        """
+        if not 0 <= r < self._rows:
+            raise IndexError(f"Row {r} out of range.")
+
+        chars = self._bit_chars(r)
+        row = []
+        for column, spec in enumerate(self._columns):
+            kind = spec["kind"]
+            if kind == KIND_BITS:
+                row.append(chars[spec["slot"]])
+            elif kind == KIND_FLOAT:
+                row.append(format_metric(self._floats[spec["slot"] * self._rows + r]))
+            else:
+                row.append(self._texts[column][r])
+
+        for column, cells in self._overrides.items():
+            if r in cells:
+                row[column] = cells[r]
+        return row
+
+    def _line(self, r: int, run_starts: dict) -> str:
+        """
+        Renders row r as a TSV line, joining each run of bit columns in one go.
+        """
+        chars = self._bit_chars(r)
+        parts = []
+        column = 0
+        width = len(self._columns)
+        while column < width:
+            run = run_starts.get(column)
+            if run is not None:
+                start, stop, slot = run
+                parts.append("\t".join(chars[slot:slot + stop - start]))
+                column = stop
+                continue
+
+            cells = self._overrides.get(column)
+            spec = self._columns[column]
+            if cells is not None and r in cells:
+                parts.append(_quote(cells[r]))
+            elif spec["kind"] == KIND_BITS:
+                parts.append(chars[spec["slot"]])
+            elif spec["kind"] == KIND_FLOAT:
+                parts.append(format_metric(self._floats[spec["slot"] * self._rows + r]))
+            else:
+                parts.append(_quote(self._texts[column][r]))
+            column += 1
+        return "\t".join(parts)
+
+    def iter_rows(self):
+        """
+        :return: A generator of every gene row, see row().
+        """
+        for r in range(self._rows):
+            yield self.row(r)
+
+    def to_tsv(self, path: str):
+        """
+        Writes the database back to the TSV file it was packed from.
+        """
+        # Runs holding an overridden cell are rendered column by column, so the override is applied
+        override_columns = {column for column, spec in enumerate(self._columns)
+                            if spec["kind"] == KIND_BITS and column in self._overrides}
+        run_starts = {}
+        for start, stop, slot in self._bit_runs:
+            if not any(start <= column < stop for column in override_columns):
+                run_starts[start] = (start, stop, slot)
+            else:
+                for column in range(start, stop):
+                    if column not in override_columns:
+                        run_starts[column] = (column, column + 1, slot + column - start)
+
+        terminator = self.line_terminator
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="") as f:
+            # Each line is written as it is rendered, the terminator goes before every line but the first
+            lines = itertools.chain(("\t".join(_quote(field) for field in row) for row in self.header_rows),
+                                    (self._line(r, run_starts) for r in range(self._rows)))
+            for n, line in enumerate(lines):
+                if n:
+                    f.write(terminator)
+                f.write(line)
+            if self.final_newline:
+                f.write(terminator)
+        os.replace(temp_path, path)
+
+    def close(self):
+        for view in ("_floats", "_bits"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        try:
+            self._map.close()
+        except BufferError:
+            # A caller still holds a view of the file, the map is closed once it is released
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert between AnGeLiDatabase.txt and the packed binary store")
+    parser.add_argument("command", choices=["pack", "unpack"], help="pack a TSV file, or unpack a packed file to TSV")
+    parser.add_argument("source", type=str, help="Input file (including path)")
+    parser.add_argument("destination", type=str, help="Output file (including path)")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        write_packed_database(args.source, args.destination)
+    else:
+        with PackedDatabase(args.source) as db:
+            db.to_tsv(args.destination)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import csv
+import math
+import os
+import tempfile
+import unittest
+from packed_database import KIND_BITS, KIND_FLOAT, KIND_TEXT, PackedDatabase, write_packed_database
+
+HEADERS = [
+    ['Short name', 'Mass', 'NumberIntrons', 'GO:0005634', 'GO:0005737', 'Ortholog', 'FYPO:0000001'],
+    ['Long name', 'Molecular weight', 'Introns', 'nucleus', 'cytoplasm', 'Human ortholog', 'viable'],
+    ['Scale of measurement', 'Metric', 'Metric', 'Binary', 'Binary', 'Text', 'Binary'],
+    ['Group', 'Protein Features', 'Gene Features', 'GO Cellular Component', 'GO Cellular Component', 'Orthologs', 'Phenotypes (FYPO)'],
+    ['Source', 'Pombase', 'Pombase', 'GO', 'GO', 'Compara', 'FYPO'],
+    ['Author', 'DB', 'DB', 'Terms with >1 annotation', 'Terms with >1 annotation', 'DB', 'Terms with >1 annotation'],
+    ['Update', '16-10-2026', '16-10-2026', '16-10-2026', '16-10-2026', '16-10-2026', '16-10-2026'],
+    ['Link', 'http://www.pombase.org', 'http://www.pombase.org', 'http://www.ebi.ac.uk', 'http://www.ebi.ac.uk', '', 'http://www.pombase.org'],
+]
+
+ROWS = [
+    ['SPAC1F8.01', '12.66111', '3', '1', '0', 'ACE2', '1'],
+    ['SPAC31A2.12', '6.5', 'NA', '0', '1', 'say "hi"', '0'],
+    ['SPAC22F3.10c', '0.50', '     0.31', '1', '1', '', '1'],
+    ['SPAC1687.21', '-25', '15', '0', 'NA', 'tab\there', '0'],
+]
+
+class TestPackedDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tsv_path = os.path.join(self.directory.name, 'AnGeLiDatabase.txt')
+        self.packed_path = os.path.join(self.directory.name, 'AnGeLiDatabase.angeli')
+        # The TSV is written the same way as AnGeLi.regenerate_file
+        with open(self.tsv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerows(HEADERS)
+            writer.writerows(ROWS)
+        self.summary = write_packed_database(self.tsv_path, self.packed_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """Unpacking gives back the exact bytes of the TSV, including quoted fields and overridden cells."""
+        output_path = os.path.join(self.directory.name, 'restored.txt')
+        with PackedDatabase(self.packed_path) as db:
+            db.to_tsv(output_path)
+            self.assertEqual([db.row(r) for r in range(len(db))], ROWS)
+            self.assertEqual(db.header_rows, HEADERS)
+
+        with open(self.tsv_path, 'rb') as original, open(output_path, 'rb') as restored:
+            self.assertEqual(restored.read(), original.read())
+
+    def test_round_trip_without_final_newline(self):
+        with open(self.tsv_path, 'rb') as f:
+            content = f.read().rstrip(b'\r\n')
+        with open(self.tsv_path, 'wb') as f:
+            f.write(content)
+        write_packed_database(self.tsv_path, self.packed_path)
+        output_path = os.path.join(self.directory.name, 'restored.txt')
+        with PackedDatabase(self.packed_path) as db:
+            db.to_tsv(output_path)
+        with open(output_path, 'rb') as restored:
+            self.assertEqual(restored.read(), content)
+
+    def test_summary(self):
+        self.assertEqual(self.summary['rows'], 4)
+        self.assertEqual(self.summary['bit_columns'], 3)
+        self.assertEqual(self.summary['float_columns'], 2)
+        self.assertEqual(self.summary['text_columns'], 2)
+        # '0.50', 'NA' in a binary column and the padded '     0.31'
+        self.assertEqual(self.summary['overrides'], 3)
+
+    def test_column_access(self):
+        with PackedDatabase(self.packed_path) as db:
+            self.assertEqual(db.genes, [row[0] for row in ROWS])
+            self.assertEqual(db.kind('GO:0005634'), KIND_BITS)
+            self.assertEqual(db.kind('Mass'), KIND_FLOAT)
+            self.assertEqual(db.kind('Ortholog'), KIND_TEXT)
+
+            bits = db.bits('GO:0005634')
+            self.assertEqual(bits[0], 0b0101)
+            bits.release()
+            self.assertEqual(db.bit_int('FYPO:0000001'), 0b0101)
+            self.assertEqual(db.values('GO:0005737'), ['0', '1', '1', 'NA'])
+
+            floats = db.floats('NumberIntrons')
+            self.assertEqual(floats[0], 3.0)
+            self.assertTrue(math.isnan(floats[1]))
+            self.assertAlmostEqual(floats[2], 0.31)
+            floats.release()
+            self.assertEqual(db.values(2), ['3', 'NA', '     0.31', '15'])
+
+            with self.assertRaises(ValueError):
+                db.floats('GO:0005634')
+            with self.assertRaises(KeyError):
+                db.bits('GO:9999999')
+
+    def test_not_packed(self):
+        with self.assertRaises(ValueError):
+            PackedDatabase(self.tsv_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    One step of a pipeline. The function is called with the results of the required
+    stages as positional arguments, in the order they are listed.
+    """
+    name: str
+    function: Callable
+    requires: tuple = ()
+
+
+@dataclass
+class StageTiming:
+    start: float
+    seconds: float
+    thread: str = ""
+
+
+class StageError(RuntimeError):
+    """
+    A stage failed, the original exception is the __cause__.
+    """
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+
+
+@dataclass
+class Pipeline:
+    """
+    Runs stages on a thread pool as soon as the stages they require are done, so independent
+    chains (e.g. the GO and FYPO downloads, parsing and matrix builds) overlap instead of
+    running one after the other.
+
+    Threads suit the acquisition stages: downloads and decompression release the GIL, and the
+    parsed annotations are shared with the rest of the build without being copied between processes.
+    """
+    stages: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    # Optional Instrumentation recording every stage
+    instrumentation: object = None
+
+    def add(self, name: str, function: Callable, requires=()) -> "Pipeline":
+        self.stages.append(Stage(name, function, tuple(requires)))
+        return self
+
+    def _check(self):
+        names = [stage.name for stage in self.stages]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate stages: {duplicates}")
+        for stage in self.stages:
+            missing = [name for name in stage.requires if name not in names]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' requires unknown stages: {missing}")
+
+        # Kahn's algorithm, the stages left over are on a cycle
+        remaining = {stage.name: set(stage.requires) for stage in self.stages}
+        ready = [name for name, requires in remaining.items() if not requires]
+        while ready:
+            done = ready.pop()
+            del remaining[done]
+            for name, requires in remaining.items():
+                if done in requires:
+                    requires.discard(done)
+                    if not requires:
+                        ready.append(name)
+        if remaining:
+            raise ValueError(f"The stages have a dependency cycle: {sorted(remaining)}")
+
+    def _run_stage(self, stage: Stage, arguments: list):
+        start = time.perf_counter()
+        try:
+            with self.instrumentation.stage(stage.name) if self.instrumentation else nullcontext():
+                return stage.function(*arguments)
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[stage.name] = StageTiming(start, seconds, threading.current_thread().name)
+            logger.info(f"Stage {stage.name} finished in {seconds:.2f}s")
+
+    def run(self, max_workers: int = None) -> dict:
+        """
+        Runs every stage once its requirements are done.
+
+        :param max_workers: The number of threads, by default one per stage.
+        :return: Stage name -> result.
+        :raises StageError: When a stage raises. Stages that have not started are cancelled,
+                            the running ones are waited for.
+        """
+        self._check()
+        self.timings = {}
+        results = {}
+        pending = {stage.name: stage for stage in self.stages}
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(self.stages)),
+                                thread_name_prefix="stage") as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(required in results for required in stage.requires):
+                        arguments = [results[required] for required in stage.requires]
+                        running[executor.submit(self._run_stage, stage, arguments)] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        for other in running:
+                            other.cancel()
+                        raise StageError(name, error) from error
+                    results[name] = future.result()
+        return results
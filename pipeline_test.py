@@ -0,0 +1,48 @@
+import threading
+import time
+import unittest
+from pipeline import Pipeline, StageError
+
+class TestPipeline(unittest.TestCase):
+
+    def test_dependencies(self):
+        """Stages get the results of the stages they require, in the order they are listed."""
+        pipeline = (Pipeline()
+                    .add("listing", lambda: ["go.gaf.gz", "fypo.phaf.gz"])
+                    .add("go", lambda links: links[0], requires=["listing"])
+                    .add("fypo", lambda links: links[1], requires=["listing"])
+                    .add("assembly", lambda fypo, go: f"{go}+{fypo}", requires=["fypo", "go"]))
+        results = pipeline.run()
+        self.assertEqual(results["assembly"], "go.gaf.gz+fypo.phaf.gz")
+        self.assertEqual(set(pipeline.timings), {"listing", "go", "fypo", "assembly"})
+
+    def test_independent_stages_overlap(self):
+        """Two chains that both wait on a barrier can only finish if they run at the same time."""
+        barrier = threading.Barrier(2, timeout=5)
+        pipeline = (Pipeline()
+                    .add("go", barrier.wait)
+                    .add("fypo", barrier.wait)
+                    .add("done", lambda go, fypo: True, requires=["go", "fypo"]))
+        self.assertTrue(pipeline.run()["done"])
+
+    def test_failure(self):
+        ran = []
+        pipeline = (Pipeline()
+                    .add("go", lambda: 1 / 0)
+                    .add("go_matrix", lambda terms: ran.append(terms), requires=["go"]))
+        with self.assertRaises(StageError) as context:
+            pipeline.run()
+        self.assertEqual(context.exception.stage, "go")
+        self.assertIsInstance(context.exception.__cause__, ZeroDivisionError)
+        self.assertEqual(ran, [])
+
+    def test_invalid_stages(self):
+        with self.assertRaises(ValueError):
+            Pipeline().add("a", time.time, requires=["b"]).add("b", time.time, requires=["a"]).run()
+        with self.assertRaises(ValueError):
+            Pipeline().add("a", time.time, requires=["missing"]).run()
+        with self.assertRaises(ValueError):
+            Pipeline().add("a", time.time).add("a", time.time).run()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from ontology import load_obo
+from synthetic_data import config_arguments, config_from_arguments, dataset_paths, generate
+
+logger = logging.getLogger(__name__)
+
+# The hosts the stand-in replaces, see SessionProvider(url_rewrites=...)
+POMBASE_ORIGIN = "https://www.pombase.org"
+EBI_ORIGIN = "https://www.ebi.ac.uk"
+
+# The release directory scraped by AnGeLi._get_links
+RELEASE_PATH = "/data/releases/latest/"
+GO_API_PATH = "/QuickGO/services/ontology/go/terms/"
+FYPO_API_PATH = "/ols4/api/ontologies/fypo/terms/"
+
+# Request kinds, faults can be set per kind
+ROUTE_LISTING = "listing"
+ROUTE_FILE = "file"
+ROUTE_GO_API = "go_api"
+ROUTE_FYPO_API = "fypo_api"
+
+# Size of the writes of a bandwidth limited response
+_CHUNK_SIZE = 16 * 1024
+
+
+@dataclass
+class FaultProfile:
+    """
+    The network conditions of the stand-in server.
+
+    latency: Seconds before a response starts, plus a uniform random delay of up to `jitter`.
+    error_rate: Share of requests answered with `error_status` instead.
+    drop_rate: Share of requests whose connection is closed without any response.
+    bandwidth: Bytes per second of each response body, None for no limit.
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = HTTPStatus.SERVICE_UNAVAILABLE
+    drop_rate: float = 0.0
+    bandwidth: float = None
+
+
+class PomBaseStandIn(ThreadingHTTPServer):
+    """
+    A local stand-in for the PomBase release site and the EBI QuickGO and OLS APIs, so that
+    the network-bound part of a rebuild can be measured and tested reproducibly.
+
+    It serves:
+        GET /data/.../                     An HTML listing of the files in that directory.
+        GET /data/...                      The files, with ETag revalidation.
+        GET /QuickGO/.../go/terms/<id>     QuickGO-shaped JSON of a GO term.
+        GET /ols4/.../fypo/terms/<iri>     OLS-shaped JSON of a FYPO term.
+
+    The random faults are drawn from a seeded generator, the same requests in the same order
+    meet the same faults.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, files: dict = None, go_terms: dict = None, fypo_terms: dict = None,
+                 faults: FaultProfile = None, route_faults: dict = None, seed: int = 0):
+        """
+        :param address: (host, port) to listen on, port 0 picks a free one.
+        :param files: URL path -> content, e.g. '/data/releases/latest/pombase-2020-01-01.gaf.gz' -> gzip bytes.
+        :param go_terms: GO id -> OboTerm answered by the QuickGO API.
+        :param fypo_terms: FYPO id -> OboTerm answered by the OLS API.
+        :param faults: The FaultProfile of every request.
+        :param route_faults: Request kind (ROUTE_*) -> FaultProfile, overriding `faults` for that kind.
+        :param seed: The seed of the fault generator.
+        """
+        self.files = dict(files or {})
+        self.go_terms = go_terms or {}
+        self.fypo_terms = fypo_terms or {}
+        self.faults = faults or FaultProfile()
+        self.route_faults = dict(route_faults or {})
+        self.requests = Counter()
+        self.injected = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.etags = {path: '"' + hashlib.sha1(content).hexdigest() + '"' for path, content in self.files.items()}
+        super().__init__(address, PomBaseRequestHandler)
+
+    @classmethod
+    def from_synthetic(cls, address, paths: dict, release_date: str = "2020-01-01", **kwargs) -> "PomBaseStandIn":
+        """
+        Serves a data set written by synthetic_data.generate as the latest PomBase release.
+        """
+        files = {}
+        for name in ("gaf", "phaf"):
+            with open(paths[name], "rb") as f:
+                # mtime=0 keeps the compressed files, and so the ETags, the same for the same data
+                files[f"{RELEASE_PATH}pombase-{release_date}.{name}.gz"] = gzip.compress(f.read(), mtime=0)
+        with open(paths["peptides"], "rb") as f:
+            files["/data/Protein_data/PeptideStats.tsv"] = f.read()
+        return cls(address, files, load_obo(paths["go_obo"]), load_obo(paths["fypo_obo"]), **kwargs)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_rewrites(self) -> dict:
+        """
+        :return: The SessionProvider url_rewrites sending the PomBase and EBI requests here.
+        """
+        return {POMBASE_ORIGIN: self.url, EBI_ORIGIN: self.url}
+
+    def fault_profile(self, route: str) -> FaultProfile:
+        return self.route_faults.get(route, self.faults)
+
+    def draw_fault(self, route: str):
+        """
+        Counts a request and decides its fault.
+
+        :return: The FaultProfile, the seconds to wait before answering, and 'error', 'drop' or None.
+        """
+        profile = self.fault_profile(route)
+        with self._lock:
+            self.requests[route] += 1
+            draw = self._random.random()
+            delay = profile.latency + (self._random.uniform(0, profile.jitter) if profile.jitter else 0)
+            fault = None
+            if draw < profile.drop_rate:
+                fault = "drop"
+            elif draw < profile.drop_rate + profile.error_rate:
+                fault = "error"
+            if fault:
+                self.injected[fault] += 1
+        return profile, delay, fault
+
+    def listing(self, directory: str) -> bytes:
+        names = sorted(path[len(directory):] for path in self.files
+                       if path.startswith(directory) and "/" not in path[len(directory):])
+        links = "".join(f'<a href="{name}">{name}</a>\n' for name in names)
+        return (f"<html><head><title>Index of {directory}</title></head><body>\n"
+                f'<a href="../">../</a>\n{links}</body></html>\n').encode("utf-8")
+
+
+def go_term_json(term) -> dict:
+    """
+    :return: A QuickGO /ontology/go/terms response, no results for an unknown term like the real API.
+    """
+    if term is None:
+        return {"numberOfHits": 0, "results": [], "pageInfo": None}
+    return {"numberOfHits": 1, "pageInfo": None,
+            "results": [{"id": term.term_id, "isObsolete": term.is_obsolete, "name": term.name,
+                         "aspect": term.namespace}]}
+
+
+def fypo_term_json(term) -> dict:
+    """
+    :return: An OLS /ontologies/fypo/terms/<iri> response.
+    """
+    return {"iri": f"http://purl.obolibrary.org/obo/{term.term_id.replace(':', '_')}", "label": term.name,
+            "obo_id": term.term_id, "ontology_name": "fypo", "ontology_prefix": "FYPO",
+            "is_obsolete": term.is_obsolete}
+
+
+class PomBaseRequestHandler(BaseHTTPRequestHandler):
+
+    server_version = "PomBaseStandIn"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith(GO_API_PATH):
+            route = ROUTE_GO_API
+        elif path.startswith(FYPO_API_PATH):
+            route = ROUTE_FYPO_API
+        elif path.endswith("/"):
+            route = ROUTE_LISTING
+        else:
+            route = ROUTE_FILE
+
+        profile, delay, fault = self.server.draw_fault(route)
+        if delay:
+            time.sleep(delay)
+        if fault == "drop":
+            self.close_connection = True
+            return
+        if fault == "error":
+            self._send(profile.error_status, {"error": "Injected fault"})
+            return
+
+        if route == ROUTE_GO_API:
+            term_id = unquote(path[len(GO_API_PATH):])
+            self._send(HTTPStatus.OK, go_term_json(self.server.go_terms.get(term_id)), profile)
+        elif route == ROUTE_FYPO_API:
+            # The OLS term IRI is URL-encoded twice, e.g. http%253A%252F%252Fpurl.obolibrary.org%252Fobo%252FFYPO_0000001
+            iri = unquote(unquote(path[len(FYPO_API_PATH):]))
+            term_id = iri.rsplit("/", 1)[-1].replace("_", ":", 1)
+            term = self.server.fypo_terms.get(term_id)
+            if term is None:
+                self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown term {term_id}"})
+            else:
+                self._send(HTTPStatus.OK, fypo_term_json(term), profile)
+        elif route == ROUTE_LISTING:
+            self._send_bytes(HTTPStatus.OK, self.server.listing(path), "text/html", profile)
+        elif path in self.server.files:
+            etag = self.server.etags[path]
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            content_type = "application/gzip" if path.endswith(".gz") else "text/tab-separated-values"
+            self._send_bytes(HTTPStatus.OK, self.server.files[path], content_type, profile, etag)
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"})
+
+    def _send(self, status, body: dict, profile: FaultProfile = None):
+        self._send_bytes(status, json.dumps(body).encode("utf-8"), "application/json", profile)
+
+    def _send_bytes(self, status, data: bytes, content_type: str, profile: FaultProfile = None, etag: str = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+
+        bandwidth = profile.bandwidth if profile is not None else None
+        if not bandwidth:
+            self.wfile.write(data)
+            return
+
+        # Pace the body so that it never runs ahead of the bandwidth
+        start = time.monotonic()
+        for offset in range(0, len(data), _CHUNK_SIZE):
+            chunk = data[offset:offset + _CHUNK_SIZE]
+            self.wfile.write(chunk)
+            ahead = start + (offset + len(chunk)) / bandwidth - time.monotonic()
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the PomBase release site and the EBI term APIs")
+    parser.add_argument("directory", type=str, help="Synthetic data set to serve, see synthetic_data.py")
+    parser.add_argument("--generate", action="store_true", help="Generate the data set into the directory first")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8001, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum random seconds added to the latency")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of requests answered with --error_status")
+    parser.add_argument("--error_status", type=int, default=503, help="Status of the injected errors")
+    parser.add_argument("--drop_rate", type=float, default=0.0, help="Share of connections closed without a response")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second of each response")
+    parser.add_argument("--fault_seed", type=int, default=0, help="Seed of the injected faults")
+    config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if args.generate:
+        paths = generate(args.directory, config_from_arguments(args))
+    else:
+        paths = dataset_paths(args.directory)
+    faults = FaultProfile(args.latency, args.jitter, args.error_rate, args.error_status, args.drop_rate, args.bandwidth)
+    server = PomBaseStandIn.from_synthetic((args.host, args.port), paths, faults=faults, seed=args.fault_seed)
+    rewrites = " ".join(f"--url_rewrite {prefix}={target}" for prefix, target in server.url_rewrites().items())
+    logger.info(f"Serving {args.directory} on {server.url}, run angeli.py with {rewrites}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
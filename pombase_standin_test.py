@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from angeli import POMBASE_LATEST_URL, AnGeLi
+from download_cache import DownloadCache
+from fypo_data import FYPOData
+from go_data import GOData
+from http_session import SessionProvider
+from pombase_standin import ROUTE_FILE, ROUTE_GO_API, FaultProfile, PomBaseStandIn
+from synthetic_data import SyntheticConfig, generate
+from term_registry import TermRegistry
+
+SMALL = SyntheticConfig(genes=20, go_terms=40, fypo_terms=30, go_columns=50, fypo_columns=40, domain_columns=5)
+
+class TestPomBaseStandIn(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = generate(self.directory.name, SMALL)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def start(self, **kwargs):
+        self.server = PomBaseStandIn.from_synthetic(('127.0.0.1', 0), self.paths, **kwargs)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self, **kwargs):
+        return SessionProvider(backoff_factor=0, backoff_jitter=0, url_rewrites=self.server.url_rewrites(), **kwargs)
+
+    def test_release_and_apis(self):
+        """The release listing, annotation files and term APIs work with the unchanged AnGeLi code."""
+        self.start()
+        db = AnGeLi(session=self.session())
+        db.find_go_terms()
+        db.find_fypo_terms()
+        with open(self.paths['gaf'], encoding='utf-8') as f:
+            self.assertEqual(len(db.go_terms), sum(1 for line in f if not line.startswith('!')))
+        self.assertTrue(db.fypo_terms)
+
+        registry = TermRegistry()
+        db.resolve_new_terms(registry, ['GO:0000002', 'GO:9999999'], {}, GOData.from_api, GOData._EBI_API_URL_TEMPLATE)
+        db.resolve_new_terms(registry, ['FYPO:0000003'], {}, FYPOData.from_api, FYPOData._EBI_API_URL_TEMPLATE)
+        self.assertEqual(registry.get('GO:0000002').name, 'term GO:0000002')
+        self.assertEqual(registry.get('FYPO:0000003').name, 'term FYPO:0000003')
+        self.assertIsNone(registry.get('GO:9999999'))
+        self.assertEqual(self.server.requests[ROUTE_GO_API], 2)
+
+    def test_faults(self):
+        """Injected errors are retried by the session, latency and bandwidth slow the responses down."""
+        self.start(faults=FaultProfile(error_rate=0.5), route_faults={ROUTE_FILE: FaultProfile(latency=0.2, bandwidth=20000)})
+        session = self.session(retries=10)
+        for term_id in ('GO:0000001', 'GO:0000002', 'GO:0000003', 'GO:0000004'):
+            self.assertEqual(session.get(GOData._EBI_API_URL_TEMPLATE.format(GO_ID=term_id)).status_code, 200)
+        self.assertEqual(session.stats()['retries'], self.server.injected['error'])
+        self.assertGreater(self.server.injected['error'], 0)
+
+        start = time.monotonic()
+        response = session.get('https://www.pombase.org/data/Protein_data/PeptideStats.tsv')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2 + len(response.content) / 20000 * 0.9)
+
+        self.server.faults = FaultProfile(error_rate=1.0)
+        self.assertEqual(self.session(retries=0).get(POMBASE_LATEST_URL + '/').status_code, 503)
+
+    def test_revalidation(self):
+        """An unchanged release file is revalidated by its ETag and not downloaded again."""
+        self.start()
+        cache = DownloadCache(os.path.join(self.directory.name, 'cache'), http=self.session())
+        for _ in range(2):
+            db = AnGeLi(session=cache.http, download_cache=cache)
+            db.find_go_terms()
+            self.assertTrue(db.go_terms)
+        # The listing has no ETag and is downloaded again, the GAF file is not
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_api_matches_ontology(self):
+        """A term resolved through the API gets the same Group header as one found in the ontology file."""
+        self.start()
+        session = self.session()
+        go_term = GOData.from_api('GO:0000002', session=session)
+        fypo_term = FYPOData.from_api('FYPO:0000003', session=session)
+        self.assertEqual(go_term.namespace, GOData.from_obo(self.paths['go_obo'])['GO:0000002'].namespace)
+        self.assertEqual(fypo_term.namespace, FYPOData.from_obo(self.paths['fypo_obo'])['FYPO:0000003'].namespace)
+        self.assertEqual((go_term.namespace, fypo_term.namespace), ('GO Biological Process', 'Phenotypes (FYPO)'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+import argparse
+import csv
+import logging
+import os
+import random
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger(__name__)
+
+# The date written in every generated file, so that the same seed always gives the same bytes
+SYNTHETIC_DATE = "01-01-2020"
+
+# The chromosome prefixes of the generated systematic ids
+_CHROMOSOMES = ("SPAC", "SPBC", "SPCC")
+
+
+@dataclass
+class SyntheticConfig:
+    """
+    The scale of a generated data set.
+
+    The column counts default to the layout of the real AnGeLiDatabase.txt: 49 gene feature
+    columns, the GO columns, the 2 ortholog reference columns, the FYPO columns and the
+    protein domain columns.
+    """
+    genes: int = 1000
+    go_terms: int = 3000
+    fypo_terms: int = 2000
+    go_annotations_per_gene: int = 12
+    fypo_annotations_per_gene: int = 8
+    feature_columns: int = 49
+    go_columns: int = 6226
+    reference_columns: int = 2
+    fypo_columns: int = 4175
+    domain_columns: int = 1318
+    # Parents per ontology term, for the ancestor propagation
+    parents_per_term: int = 2
+    seed: int = 0
+
+    @property
+    def columns(self) -> int:
+        return (self.feature_columns + self.go_columns + self.reference_columns
+                + self.fypo_columns + self.domain_columns)
+
+
+def gene_ids(count: int) -> list[str]:
+    """
+    :return: Distinct PomBase-style systematic ids, e.g. SPAC1.01c.
+    """
+    return [f"{_CHROMOSOMES[n % 3]}{n // 30 + 1}.{n % 30 + 1:02d}{'c' if n % 2 else ''}" for n in range(count)]
+
+
+def go_ids(config: SyntheticConfig) -> list[str]:
+    return [f"GO:{n + 1:07d}" for n in range(max(config.go_terms, config.go_columns))]
+
+
+def fypo_ids(config: SyntheticConfig) -> list[str]:
+    return [f"FYPO:{n + 1:07d}" for n in range(max(config.fypo_terms, config.fypo_columns))]
+
+
+def _master_columns(config: SyntheticConfig) -> list[list[str]]:
+    """
+    :return: The 8 header values of every column of the master file.
+    """
+    columns = [["Short name", "Long name", "Scale of measurement", "Group", "Source", "Author", "Update", "Link"]]
+    for i in range(1, config.feature_columns):
+        columns.append([f"Feature{i}", f"Gene feature {i}", "Metric", "Protein Features", "Pombase", "DB",
+                        SYNTHETIC_DATE, "http://www.pombase.org"])
+    for term_id in go_ids(config)[:config.go_columns]:
+        columns.append([term_id, f"go term {term_id[3:]}", "Binary", "GO Biological Process", "GO",
+                        "Terms with >1 annotation", SYNTHETIC_DATE, f"http://www.ebi.ac.uk/QuickGO/GTerm?id={term_id}"])
+    for i in range(config.reference_columns):
+        columns.append([f"Ortholog{i + 1}", f"Ortholog reference {i + 1}", "Binary", "Orthologs", "Compara", "DB",
+                        SYNTHETIC_DATE, "http://www.pombase.org"])
+    for term_id in fypo_ids(config)[:config.fypo_columns]:
+        columns.append([term_id, f"fypo term {term_id[5:]}", "Binary", "Phenotypes (FYPO)", "FYPO",
+                        "Terms with >1 annotation", SYNTHETIC_DATE, f"http://www.pombase.org/term/{term_id}"])
+    for i in range(config.domain_columns):
+        columns.append([f"PF{i + 1:05d}", f"domain {i + 1}", "Binary", "Protein Domains (Pfam)", "Pfam", "DB",
+                        SYNTHETIC_DATE, "http://pfam.xfam.org"])
+    return columns
+
+
+def write_master(path: str, config: SyntheticConfig):
+    """
+    Writes an AnGeLiDatabase-shaped master file: 8 header rows, then one row per gene with
+    metric gene features and 0/1 term and domain columns.
+    """
+    rng = random.Random(f"master-{config.seed}")
+    columns = _master_columns(config)
+    binary_columns = len(columns) - config.feature_columns
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerows(zip(*columns))
+        for gene in gene_ids(config.genes):
+            features = [f"{rng.uniform(0, 100):.4f}" if rng.random() > 0.02 else "NA"
+                        for _ in range(config.feature_columns - 1)]
+            # Sparse like the real matrix, a few percent of the term columns are set
+            bits = ["1" if rng.random() < 0.01 else "0" for _ in range(binary_columns)]
+            writer.writerow([gene] + features + bits)
+
+
+def _annotations(rng, genes, term_ids, per_gene):
+    for gene in genes:
+        for term_id in rng.sample(term_ids, min(len(term_ids), rng.randint(0, 2 * per_gene))):
+            yield gene, term_id
+
+
+def write_gaf(path: str, config: SyntheticConfig):
+    """
+    Writes a GAF 2.2 file annotating the genes to config.go_terms distinct GO terms.
+    """
+    rng = random.Random(f"gaf-{config.seed}")
+    term_ids = go_ids(config)[:config.go_terms]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("!gaf-version: 2.2\n")
+        for gene, term_id in _annotations(rng, gene_ids(config.genes), term_ids, config.go_annotations_per_gene):
+            symbol = f"gen{gene[4:].replace('.', '')}".lower()
+            qualifier = "NOT|involved_in" if rng.random() < 0.01 else "involved_in"
+            f.write("\t".join(["PomBase", gene, symbol, qualifier, term_id, "PMID:1", "IDA", "", "P",
+                               f"{symbol} protein", f"{symbol}-1|{gene.lower()}", "protein", "taxon:4896",
+                               "20200101", "PomBase", "", ""]) + "\n")
+
+
+def write_phaf(path: str, config: SyntheticConfig):
+    """
+    Writes a PomBase PHAF file annotating the genes to config.fypo_terms distinct FYPO terms.
+    """
+    rng = random.Random(f"phaf-{config.seed}")
+    term_ids = fypo_ids(config)[:config.fypo_terms]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("#Database name\tGene systematic ID\tFYPO ID\n")
+        for gene, term_id in _annotations(rng, gene_ids(config.genes), term_ids, config.fypo_annotations_per_gene):
+            f.write("\t".join(["PomBase", gene, term_id, "deletion", "", "", "", "", "sym", f"{gene}delta", "",
+                               "deletion", "ECO:0000336", "", "", "", "", "PMID:1", "4896", "2020-01-01",
+                               "haploid"]) + "\n")
+
+
+def write_obo(path: str, term_ids: list[str], namespace: str, parents_per_term: int, seed: int):
+    """
+    Writes an OBO ontology over term_ids. Each term has is_a and part_of links to terms
+    listed before it, so the graph is a DAG rooted at the first term.
+    """
+    rng = random.Random(f"obo-{namespace}-{seed}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("format-version: 1.2\n")
+        for i, term_id in enumerate(term_ids):
+            f.write(f"\n[Term]\nid: {term_id}\nname: term {term_id}\nnamespace: {namespace}\n")
+            # Parents are drawn from the terms just before, which keeps the depth close to the real ontologies
+            candidates = term_ids[max(0, i // 2 - 50):i // 2 + 1] if i else []
+            for n, parent in enumerate(rng.sample(candidates, min(len(candidates), parents_per_term))):
+                if parent != term_id:
+                    f.write(f"is_a: {parent}\n" if n % 2 == 0 else f"relationship: part_of {parent}\n")
+
+
+def write_peptide_stats(path: str, config: SyntheticConfig):
+    """
+    Writes a PomBase PeptideStats.tsv-shaped file.
+    """
+    rng = random.Random(f"peptides-{config.seed}")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["Systematic_ID", "Mass (kDa)", "pI", "Charge", "Residues", "CAI"])
+        for gene in gene_ids(config.genes):
+            writer.writerow([gene, f"{rng.uniform(5, 300):.2f}", f"{rng.uniform(4, 12):.2f}",
+                             f"{rng.uniform(-30, 30):.1f}", rng.randint(50, 3000), f"{rng.random():.2f}"])
+
+
+def dataset_paths(directory: str) -> dict:
+    """
+    :return: Name -> path of the files of a data set: master, gaf, phaf, go_obo, fypo_obo and peptides.
+    """
+    return {
+        "master": os.path.join(directory, "AnGeLiDatabase_MASTER.txt"),
+        "gaf": os.path.join(directory, "pombase.gaf"),
+        "phaf": os.path.join(directory, "pombase.phaf"),
+        "go_obo": os.path.join(directory, "go.obo"),
+        "fypo_obo": os.path.join(directory, "fypo.obo"),
+        "peptides": os.path.join(directory, "PeptideStats.tsv"),
+    }
+
+
+def generate(directory: str, config: SyntheticConfig) -> dict:
+    """
+    Writes a complete synthetic data set into a directory.
+
+    :return: The dataset_paths of the directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = dataset_paths(directory)
+    write_master(paths["master"], config)
+    write_gaf(paths["gaf"], config)
+    write_phaf(paths["phaf"], config)
+    write_obo(paths["go_obo"], go_ids(config), "biological_process", config.parents_per_term, config.seed)
+    write_obo(paths["fypo_obo"], fypo_ids(config), "fission_yeast_phenotype", config.parents_per_term, config.seed)
+    write_peptide_stats(paths["peptides"], config)
+    logger.info(f"Generated {config.genes} genes x {config.columns} columns in {directory}")
+    return paths
+
+
+def config_arguments(parser: argparse.ArgumentParser):
+    """
+    Adds an option for every SyntheticConfig field.
+    """
+    for name, default in asdict(SyntheticConfig()).items():
+        parser.add_argument(f"--{name}", type=int, default=default, help=f"Default {default}")
+
+
+def config_from_arguments(args) -> SyntheticConfig:
+    return SyntheticConfig(**{name: getattr(args, name) for name in asdict(SyntheticConfig())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic AnGeLi data set")
+    parser.add_argument("directory", type=str, help="Output directory")
+    config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    for name, path in generate(args.directory, config_from_arguments(args)).items():
+        print(f"{name}\t{path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import csv
+import os
+import tempfile
+import unittest
+from ontology import parse_obo
+from synthetic_data import SyntheticConfig, generate
+
+SMALL = SyntheticConfig(genes=20, go_terms=40, fypo_terms=30, go_columns=50, fypo_columns=40, domain_columns=5)
+
+class TestSyntheticData(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_deterministic(self):
+        """The same seed gives the same bytes, another seed different data."""
+        first = generate(os.path.join(self.directory.name, 'a'), SMALL)
+        second = generate(os.path.join(self.directory.name, 'b'), SMALL)
+        other = generate(os.path.join(self.directory.name, 'c'), SyntheticConfig(**{**SMALL.__dict__, 'seed': 1}))
+        for name in first:
+            self.assertEqual(self.read(first[name]), self.read(second[name]), name)
+        self.assertNotEqual(self.read(first['gaf']), self.read(other['gaf']))
+
+    def test_master_shape(self):
+        paths = generate(self.directory.name, SMALL)
+        with open(paths['master'], encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f, delimiter='\t'))
+        self.assertEqual(len(rows), 8 + SMALL.genes)
+        self.assertEqual({len(row) for row in rows}, {SMALL.columns})
+        self.assertEqual(rows[0][SMALL.feature_columns], 'GO:0000001')
+        self.assertEqual(rows[0][SMALL.feature_columns + SMALL.go_columns + SMALL.reference_columns], 'FYPO:0000001')
+
+    def test_annotations(self):
+        """Every annotated term is in the generated ontology."""
+        paths = generate(self.directory.name, SMALL)
+        with open(paths['go_obo'], encoding='utf-8') as f:
+            terms = parse_obo(f)
+        with open(paths['gaf'], encoding='utf-8') as f:
+            annotated = {line.split('\t')[4] for line in f if not line.startswith('!')}
+        self.assertTrue(annotated)
+        self.assertLessEqual(annotated, set(terms))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Term metadata rarely changes between releases, a month is a sensible default
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 100000
+# Access times are written in batches rather than one transaction per hit
+ACCESS_FLUSH_SIZE = 1000
+
+
+class TermCache:
+    """
+    A persistent on-disk cache of resolved term metadata, stored in SQLite and keyed by term id.
+
+    Entries older than the TTL are stale: they are not returned by get() but are
+    kept, so they can be served if the API is unavailable and refreshed with
+    stale_ids(). When the cache grows past max_entries, the least recently used
+    entries are evicted. The access times of hits are kept in memory and written
+    in batches, before an eviction and on close().
+    """
+
+    def __init__(self, path: str = "term_cache.sqlite", ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param path: The SQLite file, created if it does not exist.
+        :param ttl: The number of seconds an entry stays fresh.
+        :param max_entries: The maximum number of entries kept on disk.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+        # The resolver calls the cache from several threads, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS terms ("
+            "term_id TEXT PRIMARY KEY, source TEXT, record TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS terms_accessed_at ON terms (accessed_at)")
+        self._connection.commit()
+        self._count = self._connection.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+        self._accessed = {}
+
+    def get(self, term_id: str, allow_stale: bool = False) -> dict:
+        """
+        Returns the cached record for a term.
+
+        :param term_id: The term id, e.g. GO:0005829.
+        :param allow_stale: Return the record even if it is older than the TTL.
+        :return: The record as a dict, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT record, fetched_at FROM terms WHERE term_id = ?", (term_id,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            record, fetched_at = row
+            if now - fetched_at > self.ttl and not allow_stale:
+                self.stale += 1
+                return None
+
+            self.hits += 1
+            self._accessed[term_id] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._connection.commit()
+
+        return json.loads(record)
+
+    def put(self, term_id: str, record: dict):
+        """
+        Stores or replaces the record for a term, evicting old entries if the cache is full.
+
+        :param term_id: The term id.
+        :param record: The term metadata, e.g. GOData.to_dict().
+        """
+        now = time.time()
+        with self._lock:
+            # Before the insert, so an older pending access time does not overwrite the new one
+            self._flush_accessed()
+            exists = self._connection.execute(
+                "SELECT 1 FROM terms WHERE term_id = ?", (term_id,)).fetchone() is not None
+            self._connection.execute(
+                "INSERT OR REPLACE INTO terms (term_id, source, record, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (term_id, record.get("source"), json.dumps(record), now, now))
+            if not exists:
+                self._count += 1
+            self._evict()
+            self._connection.commit()
+
+    def _flush_accessed(self):
+        """
+        Writes the pending access times, without committing. The caller holds the lock.
+        """
+        if not self._accessed:
+            return
+        self._connection.executemany("UPDATE terms SET accessed_at = ? WHERE term_id = ?",
+                                     [(accessed_at, term_id) for term_id, accessed_at in self._accessed.items()])
+        self._accessed.clear()
+
+    def _evict(self):
+        """
+        Removes the least recently used entries above max_entries. The caller holds the lock.
+        """
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+
+        self._connection.execute(
+            "DELETE FROM terms WHERE term_id IN (SELECT term_id FROM terms ORDER BY accessed_at ASC, rowid ASC LIMIT ?)",
+            (excess,))
+        self._count -= excess
+        logger.info(f"Evicted {excess} entries from the term cache")
+
+    def stale_ids(self, source: str = None) -> list[str]:
+        """
+        Lists the terms whose entries are older than the TTL.
+
+        :param source: Only list terms from this source, e.g. "GO" or "FYPO".
+        :return: The stale term ids.
+        """
+        cutoff = time.time() - self.ttl
+        query = "SELECT term_id FROM terms WHERE fetched_at < ?"
+        params = [cutoff]
+        if source is not None:
+            query += " AND source = ?"
+            params.append(source)
+
+        with self._lock:
+            return [row[0] for row in self._connection.execute(query + " ORDER BY term_id", params)]
+
+    def __len__(self):
+        return self._count
+
+    def log_stats(self):
+        """
+        Writes the hit/miss counts to the log.
+        """
+        logger.info(f"Term cache {self.path}: {self.hits} hits, {self.misses} misses, {self.stale} stale, {self._count} entries")
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._connection.commit()
+            self._connection.close()
@@ -0,0 +1,73 @@
+import dataclasses
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from go_data import GOData
+from term_cache import TermCache
+
+class TestTermCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "terms.sqlite")
+        self.term = GOData(
+            go_id="GO:0005829",
+            name="cytosol",
+            measurement="Binary",
+            namespace="Cellular Component",
+            source="GO",
+            terms_with_annotations="Terms with >1 annotation",
+            date="02-03-2020",
+            link="http://www.ebi.ac.uk/QuickGO/GTerm?id=GO:0005829"
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_from_api_uses_cache(self):
+        """A cached term is returned without calling the API, and survives reopening the file."""
+        cache = TermCache(self.path)
+        cache.put(self.term.go_id, self.term.to_dict())
+        cache.close()
+
+        cache = TermCache(self.path)
+        # The Update date is the date of the rebuild, not of the fetch
+        today = datetime.now().strftime("%d-%m-%Y")
+        self.assertEqual(GOData.from_api("GO:0005829", cache=cache), dataclasses.replace(self.term, date=today))
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        cache.close()
+
+    def test_stale_entries(self):
+        cache = TermCache(self.path, ttl=-1)
+        cache.put(self.term.go_id, self.term.to_dict())
+        self.assertIsNone(cache.get(self.term.go_id))
+        self.assertEqual(cache.get(self.term.go_id, allow_stale=True)["name"], "cytosol")
+        self.assertEqual(cache.stale_ids("GO"), ["GO:0005829"])
+        self.assertEqual(cache.stale_ids("FYPO"), [])
+        cache.close()
+
+    def test_eviction(self):
+        cache = TermCache(self.path, max_entries=2)
+        for go_id in ("GO:1", "GO:2", "GO:3"):
+            cache.put(go_id, self.term.to_dict())
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("GO:1"))
+        cache.close()
+
+    def test_access_times(self):
+        """The batched access times of hits decide the eviction, also after reopening the file."""
+        cache = TermCache(self.path, max_entries=2)
+        for go_id in ("GO:1", "GO:2"):
+            cache.put(go_id, self.term.to_dict())
+        cache.get("GO:1")
+        cache.close()
+
+        cache = TermCache(self.path, max_entries=2)
+        cache.put("GO:3", self.term.to_dict())
+        self.assertIsNotNone(cache.get("GO:1"))
+        self.assertIsNone(cache.get("GO:2"))
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Where the metadata of a term came from
+ORIGIN_ORIGINAL = "original"
+ORIGIN_ONTOLOGY = "ontology"
+ORIGIN_API = "api"
+ORIGIN_PREVIOUS = "previous"
+
+
+class TermRegistry:
+    """
+    The metadata of every GO/FYPO column, keyed by term id.
+
+    The registry is built once from the original AnGeLiDatabase.txt file and
+    extended with the terms resolved from the ontology files or the EBI APIs,
+    so every header lookup is a single dict access. It also records the origin
+    of each term's metadata.
+    """
+
+    def __init__(self):
+        self._terms = {}
+        self._origins = {}
+
+    def add(self, term, origin: str):
+        """
+        Adds a term, replacing any existing entry with the same id.
+
+        :param term: A GOData or FYPOData instance.
+        :param origin: Where the metadata came from, e.g. ORIGIN_ORIGINAL.
+        """
+        self._terms[term.term_id] = term
+        self._origins[term.term_id] = origin
+
+    def merge(self, terms: dict, origin: str):
+        """
+        Adds resolved terms. Ids that could not be resolved (None values) are skipped.
+
+        :param terms: term id -> GOData/FYPOData or None.
+        :param origin: Where the metadata came from.
+        """
+        for term_id, term in terms.items():
+            if term is not None:
+                self._terms[term_id] = term
+                self._origins[term_id] = origin
+
+    def get(self, term_id: str):
+        """
+        :return: The term metadata, or None if the term is unknown.
+        """
+        return self._terms.get(term_id)
+
+    def origin(self, term_id: str) -> str:
+        """
+        :return: Where the metadata of the term came from, or None if the term is unknown.
+        """
+        return self._origins.get(term_id)
+
+    def missing(self, term_ids) -> list[str]:
+        """
+        :return: The ids in term_ids that are not in the registry, in order.
+        """
+        return [term_id for term_id in term_ids if term_id not in self._terms]
+
+    def origin_counts(self) -> dict:
+        """
+        :return: origin -> number of terms.
+        """
+        return dict(Counter(self._origins.values()))
+
+    def __contains__(self, term_id):
+        return term_id in self._terms
+
+    def __len__(self):
+        return len(self._terms)
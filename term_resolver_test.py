@@ -0,0 +1,29 @@
+import time
+import unittest
+from term_resolver import TermResolver
+
+class TestTermResolver(unittest.TestCase):
+
+    def test_resolve_keeps_input_order(self):
+        """Results come back in the order the ids were given, whatever order the fetches finish in."""
+        def fetch(term_id):
+            time.sleep(0.01 * (5 - int(term_id[-1])))
+            return term_id.lower()
+
+        ids = ["GO:1", "GO:2", "GO:3", "GO:4"]
+        resolved = TermResolver(max_workers=4).resolve(ids, fetch, "https://example.org/{GO_ID}")
+        self.assertEqual(list(resolved.keys()), ids)
+        self.assertEqual(resolved["GO:3"], "go:3")
+
+    def test_failures_are_none(self):
+        """A fetch that raises is reported as a missing term rather than aborting the batch."""
+        def fetch(term_id):
+            if term_id == "GO:2":
+                raise RuntimeError("boom")
+            return term_id
+
+        resolved = TermResolver(max_workers=2).resolve(["GO:1", "GO:2"], fetch, "https://example.org/{GO_ID}")
+        self.assertEqual(resolved, {"GO:1": "GO:1", "GO:2": None})
+
+if __name__ == '__main__':
+    unittest.main()